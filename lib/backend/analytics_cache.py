@@ -0,0 +1,95 @@
+import threading
+
+class AnalyticsCache:
+    """
+    Resultados de análisis y pronósticos por ingrediente (p. ej. el ajuste de Prophet
+    o el coeficiente de seguridad predicho). Las entradas se guardan bajo
+    (tipo, ingrediente) y se invalidan por ingrediente cuando llega uso nuevo; las
+    entradas globales (ingrediente None) se invalidan con cualquier cambio.
+    Con un store compartido (shared_cache.SQLiteCacheStore) las entradas viven en el
+    store bajo `namespace` y las ven todos los procesos; sin él, en la memoria del proceso.
+    Un cálculo que empezó antes de invalidar su entrada no guarda su resultado.
+    """
+
+    def __init__(self, namespace=None, store=None):
+        self.namespace = str(namespace)
+        self._store = store
+        self._entries = {}
+        self._version = None
+        # Generación por ingrediente (None = entradas globales) y de la caché completa
+        self._generations = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _entry_generation(self, ingredient_id):
+        return self._generation, self._generations.get(ingredient_id, 0)
+
+    def _bump(self, ingredient_ids):
+        for ingredient_id in ingredient_ids:
+            self._generations[ingredient_id] = self._generations.get(ingredient_id, 0) + 1
+
+    def get(self, kind, ingredient_id=None, default=None):
+        if self._store is not None:
+            found, value = self._store.get(self.namespace, kind, ingredient_id)
+            return value if found else default
+        with self._lock:
+            return self._entries.get((kind, ingredient_id), default)
+
+    def set(self, kind, ingredient_id, value):
+        if self._store is not None:
+            return self._store.set(self.namespace, kind, ingredient_id, value)
+        with self._lock:
+            self._entries[(kind, ingredient_id)] = value
+        return value
+
+    def get_or_compute(self, kind, ingredient_id, compute):
+        """Devuelve el valor guardado o lo calcula con compute() y lo guarda"""
+        if self._store is not None:
+            return self._store.get_or_compute(self.namespace, kind, ingredient_id, compute)
+        key = (kind, ingredient_id)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            generation = self._entry_generation(ingredient_id)
+        # El cálculo (p. ej. ajustar un modelo) se hace fuera del lock
+        value = compute()
+        with self._lock:
+            # Si la entrada se invalidó mientras se calculaba, el resultado puede ser viejo
+            if self._entry_generation(ingredient_id) == generation:
+                self._entries[key] = value
+        return value
+
+    def invalidate(self, ingredient_ids=None, version=None):
+        """
+        Borra las entradas de los ingredientes indicados y todas las globales.
+        Sin ingredient_ids se vacía la caché completa. version es la versión de los
+        datos a la que corresponden las entradas que quedan. Devuelve cuántas entradas se borraron.
+        """
+        if self._store is not None:
+            return self._store.invalidate(self.namespace, ingredient_ids, version)
+        with self._lock:
+            if version is not None:
+                self._version = version
+            if ingredient_ids is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._generation += 1
+                return removed
+            ingredient_ids = {int(ingredient_id) for ingredient_id in ingredient_ids}
+            self._bump(ingredient_ids | {None})
+            stale = [key for key in self._entries if key[1] is None or key[1] in ingredient_ids]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def sync_version(self, version):
+        """Vacía la caché si sus entradas son de otra versión de los datos; devuelve True si la vació"""
+        if self._store is not None:
+            return self._store.sync_version(self.namespace, version)
+        with self._lock:
+            if self._version == version:
+                return False
+            self._entries.clear()
+            self._generation += 1
+            self._version = version
+            return True
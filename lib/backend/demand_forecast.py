@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from prophet import Prophet
+from menu_catalog import FOOD_INGREDIENTS
+
+# Días pronosticados por defecto
+FORECAST_HORIZON_DAYS = 30
+
+# Las órdenes canceladas no consumen ingredientes
+CANCELLED_STATUS = 'Cancelada'
+
+def build_bom_matrix(food_ingredients=FOOD_INGREDIENTS):
+    """
+    Receta de cada platillo como matriz dispersa platillos x ingredientes
+    (cantidad base de cada ingrediente por unidad vendida).
+    Devuelve (matriz CSR, food_ids, ingredient_ids), ambos ids ordenados.
+    """
+    food_ids = np.array(sorted(food_ingredients), dtype=np.int64)
+    ingredient_ids = np.array(sorted({ingredient_id
+                                      for ingredients in food_ingredients.values()
+                                      for ingredient_id, _ in ingredients}), dtype=np.int64)
+    rows, columns, quantities = [], [], []
+    for row, food_id in enumerate(food_ids):
+        for ingredient_id, base_quantity in food_ingredients[int(food_id)]:
+            rows.append(row)
+            columns.append(np.searchsorted(ingredient_ids, ingredient_id))
+            quantities.append(base_quantity)
+    bom = sparse.csr_matrix((quantities, (rows, columns)), shape=(len(food_ids), len(ingredient_ids)))
+    return bom, food_ids, ingredient_ids
+
+def daily_food_sales(pages, food_ids):
+    """
+    Unidades vendidas por platillo y día (platillos x días) a partir de páginas de
+    order items; las órdenes canceladas se ignoran. Devuelve (fechas, matriz).
+    """
+    food_parts, date_parts, quantity_parts = [], [], []
+    for page in pages:
+        page = [row for row in page if row['order_date'] and row['order_status'] != CANCELLED_STATUS]
+        food_parts.append(np.fromiter((row['food_id'] for row in page), dtype=np.int64, count=len(page)))
+        date_parts.append(np.array([str(row['order_date'])[:10] for row in page], dtype='datetime64[D]'))
+        quantity_parts.append(np.fromiter((row['quantity'] for row in page), dtype=np.float64, count=len(page)))
+
+    foods = np.concatenate(food_parts) if food_parts else np.zeros(0, dtype=np.int64)
+    dates = np.concatenate(date_parts) if date_parts else np.zeros(0, dtype='datetime64[D]')
+    quantities = np.concatenate(quantity_parts) if quantity_parts else np.zeros(0)
+
+    known = np.isin(foods, food_ids)
+    foods, dates, quantities = foods[known], dates[known], quantities[known]
+    if len(dates) == 0:
+        return np.zeros(0, dtype='datetime64[D]'), np.zeros((len(food_ids), 0))
+
+    start = dates.min()
+    num_days = int((dates.max() - start).astype(np.int64)) + 1
+    sales = np.zeros((len(food_ids), num_days))
+    np.add.at(sales, (np.searchsorted(food_ids, foods), (dates - start).astype(np.int64)), quantities)
+    return start + np.arange(num_days), sales
+
+def _prophet_forecast(dates, values, horizon):
+    """Pronóstico diario de una serie con Prophet; devuelve los `horizon` días siguientes"""
+    m = Prophet(yearly_seasonality=True, weekly_seasonality=True)
+    m.fit(pd.DataFrame({'ds': pd.to_datetime(dates), 'y': values}))
+    future = m.make_future_dataframe(periods=horizon)
+    return np.clip(m.predict(future)['yhat'].to_numpy()[-horizon:], 0, None)
+
+def calibration_factors(bom, ingredient_ids, dates, sales, usage_matrix):
+    """
+    Uso real / uso implícito por la receta de cada ingrediente en los días con datos
+    de ambos. Incorpora mermas y variaciones que la receta no contempla (1 si no hay datos).
+    """
+    factors = np.ones(len(ingredient_ids))
+    if usage_matrix is None or len(dates) == 0:
+        return factors
+    overlap = (dates >= usage_matrix.start_date) & (dates < usage_matrix.start_date + usage_matrix.num_days)
+    if not overlap.any():
+        return factors
+
+    implied = bom.T @ sales[:, overlap]
+    implied_totals = np.asarray(implied.sum(axis=1)).ravel()
+    day_positions = (dates[overlap] - usage_matrix.start_date).astype(np.int64)
+    for position, ingredient_id in enumerate(ingredient_ids):
+        if ingredient_id in usage_matrix and implied_totals[position] > 0:
+            actual = usage_matrix.row(ingredient_id)[day_positions].astype(np.float64).sum()
+            factors[position] = actual / implied_totals[position]
+    return factors
+
+def forecast_ingredient_demand(sales_pages, usage_matrix=None, horizon=FORECAST_HORIZON_DAYS,
+                               food_ingredients=FOOD_INGREDIENTS, forecaster=_prophet_forecast):
+    """
+    Pronostica la venta diaria de cada platillo (un ajuste por platillo) y la
+    convierte en demanda de ingredientes con un solo producto por la matriz de
+    recetas. Los ingredientes compartidos entre platillos quedan consistentes.
+    Devuelve fechas, ingredient_ids y la matriz ingredientes x días pronosticada.
+    """
+    bom, food_ids, ingredient_ids = build_bom_matrix(food_ingredients)
+    dates, sales = daily_food_sales(sales_pages, food_ids)
+    if len(dates) == 0:
+        raise ValueError("No hay ventas de platillos para pronosticar")
+
+    food_forecast = np.zeros((len(food_ids), horizon))
+    for row in range(len(food_ids)):
+        if sales[row].any():
+            food_forecast[row] = forecaster(dates, sales[row], horizon)
+
+    factors = calibration_factors(bom, ingredient_ids, dates, sales, usage_matrix)
+    ingredient_forecast = np.asarray(bom.T @ food_forecast) * factors[:, None]
+
+    return {
+        "dates": dates[-1] + 1 + np.arange(horizon),
+        "food_ids": food_ids,
+        "food_forecast": food_forecast,
+        "ingredient_ids": ingredient_ids,
+        "ingredient_forecast": ingredient_forecast,
+        "calibration": factors
+    }
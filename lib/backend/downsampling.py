@@ -0,0 +1,56 @@
+import os
+import numpy as np
+
+# Puntos máximos por serie en las gráficas del dashboard
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "500"))
+
+# LTTB conserva siempre el primer y el último punto y al menos uno intermedio
+MIN_CHART_POINTS = 3
+
+def lttb_indices(x, y, threshold):
+    """
+    Índices de los puntos elegidos por Largest-Triangle-Three-Buckets: conserva el
+    primer y el último punto y, de cada cubeta intermedia, el que forma el triángulo
+    de mayor área con el punto anterior elegido y el promedio de la cubeta siguiente.
+    threshold debe ser al menos MIN_CHART_POINTS.
+    """
+    if threshold < MIN_CHART_POINTS:
+        raise ValueError(f"threshold debe ser al menos {MIN_CHART_POINTS}")
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    edges = np.minimum((np.arange(threshold - 1) * every).astype(np.int64) + 1, n - 1)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+def downsample_frame(df, max_points=CHART_POINT_BUDGET, x='ds', y='y'):
+    """Reduce un DataFrame de una serie temporal a max_points filas con LTTB (None: sin reducir)"""
+    if max_points is None or len(df) <= max_points:
+        return df
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+    return df.iloc[lttb_indices(x_values, df[y].to_numpy(dtype=np.float64), max_points)]
@@ -0,0 +1,116 @@
+import os
+import json
+import gzip
+import glob
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional; NDJSON solo necesita la librería estándar
+    pa = None
+    pq = None
+
+# Tablas exportadas, en el orden en que deben cargarse (claves foráneas)
+EXPORT_TABLES = ('orders', 'order_items', 'ingredient_usage')
+
+# Tabla de Supabase correspondiente a cada tabla exportada
+SUPABASE_TABLES = {
+    'orders': 'order_table',
+    'order_items': 'order_items_table',
+    'ingredient_usage': 'ingredient_usage_table'
+}
+
+EXPORT_FORMATS = ('ndjson', 'parquet')
+
+FILE_EXTENSIONS = {
+    'ndjson': '.ndjson.gz',
+    'parquet': '.parquet'
+}
+
+MANIFEST_FILE = 'manifest.json'
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("El formato parquet requiere pyarrow (pip install pyarrow)")
+
+class ExportWriter:
+    """
+    Escribe los datos generados de forma incremental, un archivo por bloque y tabla:
+    <directorio>/<tabla>/part-<bloque>.ndjson.gz (NDJSON comprimido) o .parquet.
+    Cada parte se escribe a un archivo temporal y se renombra al terminar, así que
+    volver a escribir un bloque (p. ej. al reanudar una carga) lo reemplaza sin duplicarlo.
+    """
+
+    def __init__(self, directory, fmt='ndjson', compression=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {fmt}")
+        if fmt == 'parquet':
+            _require_pyarrow()
+
+        self.directory = directory
+        self.fmt = fmt
+        # gzip para NDJSON; para Parquet cualquier códec de pyarrow (zstd por defecto)
+        self.compression = compression or ('gzip' if fmt == 'ndjson' else 'zstd')
+
+        for table in EXPORT_TABLES:
+            os.makedirs(os.path.join(directory, table), exist_ok=True)
+        with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+            json.dump({'format': fmt, 'compression': self.compression, 'tables': list(EXPORT_TABLES)}, f)
+
+    def write_chunk(self, chunk_index, orders, order_items, ingredient_usage):
+        """Escribe las filas de un bloque en sus tres archivos de parte"""
+        for table, rows in zip(EXPORT_TABLES, (orders, order_items, ingredient_usage)):
+            path = os.path.join(self.directory, table, f"part-{chunk_index:05d}{FILE_EXTENSIONS[self.fmt]}")
+            tmp_path = f"{path}.tmp"
+            if self.fmt == 'ndjson':
+                self._write_ndjson(tmp_path, rows)
+            else:
+                pq.write_table(pa.Table.from_pylist(rows), tmp_path, compression=self.compression)
+            os.replace(tmp_path, path)
+
+    def _write_ndjson(self, path, rows):
+        opener = gzip.open if self.compression == 'gzip' else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+
+def _read_manifest(directory):
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"{directory} no contiene una exportación ({MANIFEST_FILE} no existe)")
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def iter_export(directory):
+    """
+    Recorre una exportación parte por parte, en orden de carga.
+    Produce (tabla, filas) sin cargar nunca más de una parte en memoria.
+    """
+    manifest = _read_manifest(directory)
+    fmt = manifest['format']
+    if fmt == 'parquet':
+        _require_pyarrow()
+
+    for table in manifest['tables']:
+        pattern = os.path.join(directory, table, f"part-*{FILE_EXTENSIONS[fmt]}")
+        for path in sorted(glob.glob(pattern)):
+            if fmt == 'parquet':
+                yield table, pq.read_table(path).to_pylist()
+                continue
+            opener = gzip.open if manifest.get('compression') == 'gzip' else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                yield table, [json.loads(line) for line in f if line.strip()]
+
+def replay_export(directory, load_rows):
+    """
+    Reproduce una exportación en cualquier backend sin regenerar los datos.
+    load_rows(tabla_supabase, filas) se llama una vez por parte, respetando el orden
+    órdenes -> items -> uso de ingredientes. Devuelve el número de filas por tabla.
+    """
+    totals = {table: 0 for table in EXPORT_TABLES}
+    for table, rows in iter_export(directory):
+        if rows:
+            load_rows(SUPABASE_TABLES[table], rows)
+        totals[table] += len(rows)
+    return totals
@@ -1,9 +1,11 @@
 from fastapi import FastAPI, HTTPException, Path, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 import plotly.graph_objects as go
 import plotly.express as px
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+import base64
 import pandas as pd
 from supabase import create_client, Client
 import os
@@ -11,14 +13,44 @@ from dotenv import load_dotenv
 from prophet import Prophet
 import json
 import logging
+import threading
+import time
 from inventory_queries import (
-    get_inventory_data, 
     get_ingredient_usage,
     generate_ingredient_history_report, 
+    build_ingredient_history_report,
     generate_inventory_report,
-    get_detailed_ingredient_data
+    get_inventory_item,
+    get_inventory_ids,
+    build_ingredient_history,
+    get_usage_matrix,
+    get_usage_rollups,
+    ReportContext,
+    iter_food_sales_pages,
+    get_inventory_items,
+    get_stock_ledger,
+    reconcile_stock_ledger,
+    ingest_usage_events,
+    apply_usage_events,
+    register_usage_listener,
+    location_state
 )
 from inventory_multi_agent import InventoryAnalysisSystem
+from usage_monitor import UsageMonitor
+from analytics_cache import AnalyticsCache
+from shared_cache import shared_cache_store
+from stock_events import StockBroadcaster
+from serialization import json_response
+from location_workers import LocationWorkerPool, in_worker_process
+from job_scheduler import JobScheduler
+from downsampling import CHART_POINT_BUDGET, MIN_CHART_POINTS, downsample_frame
+from usage_rollups import GRANULARITIES
+from demand_forecast import FORECAST_HORIZON_DAYS, forecast_ingredient_demand
+from scenario_simulation import DEFAULT_SIMULATION_DAYS, MAX_SIMULATION_DAYS, build_scenario_baseline, simulate_scenario
+from reorder_simulation import (
+    LEAD_TIME_DAYS, MAX_LEAD_TIME_DAYS, MAX_SERVICE_LEVEL, MIN_SERVICE_LEVEL, SERVICE_LEVEL,
+    SERVICE_LEVEL_DECIMALS, STOCKOUT_HORIZON_DAYS, simulate_reorder_points
+)
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import numpy as np
@@ -47,23 +79,351 @@ supabase: Client = create_client(supabase_url, supabase_key)
 
 inventory_ai = InventoryAnalysisSystem()
 
-def convert_to_serializable(obj):
-    """Convierte objetos NumPy a tipos nativos de Python"""
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, pd.DataFrame):
-        return obj.to_dict('records')
-    elif isinstance(obj, pd.Series):
-        return obj.to_dict()
-    return obj
-
-def predict_safety_coefficients(ingredients_data: Dict[str, Any]) -> Dict[str, float]:
+class LocationAnalytics:
+    """Monitor de uso, caché de análisis y difusión SSE de un local"""
+
+    def __init__(self, location_id=None):
+        # Estadísticas de uso en línea y alertas de anomalías por ingrediente
+        self.usage_monitor = UsageMonitor()
+        self.monitor_version = None
+        # Pronósticos y análisis ya calculados, invalidados por ingrediente al ingerir uso.
+        # Con ANALYTICS_CACHE_PATH se comparten entre todos los procesos del host
+        self.analytics_cache = AnalyticsCache(location_id, shared_cache_store)
+        # Difusión de cambios de stock a los clientes conectados (SSE)
+        self.stock_broadcaster = StockBroadcaster()
+
+_location_analytics = {}
+_location_analytics_lock = threading.Lock()
+
+def location_analytics(location_id=None):
+    """Estado de análisis del local (se crea al usarlo por primera vez)"""
+    with _location_analytics_lock:
+        analytics = _location_analytics.get(location_id)
+        if analytics is None:
+            analytics = _location_analytics[location_id] = LocationAnalytics(location_id)
+        return analytics
+
+# Procesos de análisis: cada local se atiende siempre en el mismo worker
+location_workers = LocationWorkerPool()
+
+# Trabajos que precalculan historial, estadísticas, pronósticos y análisis fuera de las peticiones.
+# Con la caché compartida los ejecuta solo el proceso de la API que tiene la concesión
+# del planificador; al caer ese proceso, otro la toma cuando vence.
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+
+def _hold_scheduler_lease():
+    return shared_cache_store.acquire_lease("scheduler", SCHEDULER_LEASE_SECONDS)
+
+scheduler = JobScheduler(leader=_hold_scheduler_lease if shared_cache_store is not None else None)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+NIGHTLY_REFRESH_CRON = os.getenv("NIGHTLY_REFRESH_CRON", "0 3 * * *")
+
+# Con la caché compartida, cada proceso de la API aplica los lotes ingeridos por los demás:
+# así los eventos de stock, las alertas y el libro de stock no dependen del proceso que
+# recibió el POST. Sin caché compartida la API debe correr con un solo proceso.
+USAGE_RELAY_POLL_SECONDS = float(os.getenv("USAGE_RELAY_POLL_SECONDS", "0.5"))
+_usage_relay_stop = threading.Event()
+_usage_relay = threading.local()
+
+def _relay_usage_events():
+    """Aplica en este proceso los lotes de uso que ingirieron los otros procesos de la API"""
+    after = shared_cache_store.last_event_id()
+    while not _usage_relay_stop.wait(USAGE_RELAY_POLL_SECONDS):
+        try:
+            after, events = shared_cache_store.events_after(after)
+            for location_id, rows, previous_version, version in events:
+                _usage_relay.active = True
+                try:
+                    apply_usage_events(rows, previous_version, version, location_id)
+                finally:
+                    _usage_relay.active = False
+        except Exception as e:
+            # Un lote perdido no deja datos viejos: la versión no coincidirá y se resincroniza
+            logger.error(f"Error aplicando lotes de uso de otros procesos: {str(e)}", exc_info=True)
+
+@app.on_event("startup")
+def _start_background_work():
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    if shared_cache_store is not None:
+        _usage_relay_stop.clear()
+        threading.Thread(target=_relay_usage_events, name="usage-relay", daemon=True).start()
+
+@app.on_event("shutdown")
+def _stop_background_work():
+    _usage_relay_stop.set()
+    scheduler.stop(wait=False)
+    if shared_cache_store is not None:
+        shared_cache_store.release_lease("scheduler")
+    location_workers.shutdown()
+
+def current_stock_states(ingredient_ids=None, location_id=None):
     """
-    Predice coeficientes de seguridad óptimos basados en patrones históricos
+    Estado de stock de cada ingrediente del local a partir del libro de stock y del
+    monitor de uso: stock actual, estado y pronóstico de uso diario (EWMA), redondeados
+    para que solo los cambios visibles generen eventos.
+    """
+    ledger = get_stock_ledger(location_id)
+    usage_monitor = location_analytics(location_id).usage_monitor
+    if ingredient_ids is None:
+        ingredient_ids = ledger.ingredient_ids
+    states = []
+    for ingredient_id in ingredient_ids:
+        state = ledger.status(ingredient_id)
+        usage_state = usage_monitor.state(ingredient_id)
+        forecast = usage_state['ewma_daily_usage'] if usage_state else None
+        states.append({
+            "ingredient_id": ingredient_id,
+            "stock_status": state['stock_status'],
+            "current_stock": round(state['current_stock'], 2),
+            "safe_threshold": round(state['safe_threshold'], 2),
+            "forecast_daily_usage": round(forecast, 2) if forecast is not None else None,
+            "days_until_empty": round(state['current_stock'] / forecast, 1) if forecast else None
+        })
+    return states
+
+def get_synced_usage_matrix(location_id=None):
+    """
+    Devuelve la matriz de uso del local. Si los datos cambiaron por fuera de la ingesta
+    (la versión no coincide), reinicia el monitor de uso y vacía las cachés de análisis
+    que no correspondan a la versión actual (con la caché compartida, solo el primer
+    proceso en notarlo la vacía).
+    """
+    analytics = location_analytics(location_id)
+    usage_matrix = get_usage_matrix(location_id)
+    # Una matriz sin versión (los datos cambiaron mientras se leía) no reinicia nada
+    if usage_matrix.version is not None and analytics.monitor_version != usage_matrix.version:
+        analytics.usage_monitor.seed_from_matrix(usage_matrix)
+        analytics.analytics_cache.sync_version(usage_matrix.version)
+        analytics.monitor_version = usage_matrix.version
+        analytics.stock_broadcaster.publish(current_stock_states(location_id=location_id))
+    return usage_matrix
+
+def get_usage_monitor(location_id=None) -> UsageMonitor:
+    """Devuelve el monitor de uso del local, inicializado con la historia de la matriz de uso"""
+    get_synced_usage_matrix(location_id)
+    return location_analytics(location_id).usage_monitor
+
+@register_usage_listener
+def _on_usage_ingested(rows, previous_version, version, location_id=None):
+    """Aplica un lote ingerido al monitor de uso e invalida las cachés de los ingredientes afectados"""
+    analytics = location_analytics(location_id)
+    if analytics.monitor_version == previous_version:
+        analytics.usage_monitor.record_many(sorted(rows, key=lambda row: row['usage_date']))
+        analytics.monitor_version = version
+    ingredient_ids = {row['ingredient_id'] for row in rows}
+    analytics.analytics_cache.invalidate(ingredient_ids, version=version)
+    if in_worker_process():
+        return
+    if shared_cache_store is not None and not getattr(_usage_relay, 'active', False):
+        shared_cache_store.publish_event((location_id, rows, previous_version, version))
+    analytics.stock_broadcaster.publish(current_stock_states(sorted(ingredient_ids), location_id))
+    if location_workers.workers:
+        # El worker del local aplica el mismo lote: solo invalida los ingredientes del lote
+        # en lugar de vaciar su caché al ver la versión nueva
+        location_workers.submit(location_id, apply_usage_job, location_id, rows, previous_version, version)
+    # Recalcula lo invalidado antes de que lo pida una petición
+    scheduler.notify_usage(location_id)
+
+def _fit_usage_forecast(df, periods=30):
+    """Ajusta Prophet al uso diario (columnas ds, y) y pronostica los próximos días"""
+    m = Prophet(yearly_seasonality=True, weekly_seasonality=True)
+    m.fit(df)
+    future = m.make_future_dataframe(periods=periods)
+    return m.predict(future)[['ds', 'yhat']]
+
+def _usage_frame(ingredient_id, data, usage_matrix=None, start=None, end=None):
+    """
+    Uso diario de un ingrediente como DataFrame (ds, y); calendario completo si hay
+    matriz de uso. start/end (YYYY-MM-DD, inclusivos) limitan el rango.
+    """
+    if usage_matrix is not None and int(ingredient_id) in usage_matrix:
+        usage_series = usage_matrix.series(int(ingredient_id), trim_leading=True, start=start, end=end)
+        return pd.DataFrame({'ds': usage_series.index, 'y': usage_series.to_numpy()})
+    df = pd.DataFrame(
+        [(day, usage) for day, usage in data['usage_history'].items()
+         if (start is None or day >= start) and (end is None or day <= end)],
+        columns=['ds', 'y']
+    )
+    df['ds'] = pd.to_datetime(df['ds'])
+    return df
+
+def _ingredient_forecast(ingredient_id, data, usage_matrix=None, start=None, location_id=None):
+    """
+    Pronóstico de Prophet de un ingrediente, ajustado sobre la historia completa y
+    cacheado hasta que llegue uso del ingrediente. start recorta lo que se grafica.
+    """
+    forecast = location_analytics(location_id).analytics_cache.get_or_compute(
+        'forecast', int(ingredient_id),
+        lambda: _fit_usage_forecast(_usage_frame(ingredient_id, data, usage_matrix))
+    )
+    if start is not None:
+        forecast = forecast[forecast['ds'] >= pd.Timestamp(start)]
+    return forecast
+
+# Modos de pronóstico: un Prophet por ingrediente o por platillo explotado con la receta
+FORECAST_MODES = ('ingredient', 'bom')
+
+def get_bom_forecast(usage_matrix=None, horizon=FORECAST_HORIZON_DAYS, location_id=None):
+    """
+    Pronóstico de demanda de todos los ingredientes del local a partir del pronóstico
+    por platillo y la matriz de recetas. Se cachea hasta que llegue uso nuevo.
+    """
+    return location_analytics(location_id).analytics_cache.get_or_compute(
+        f'bom_forecast_{horizon}', None,
+        lambda: forecast_ingredient_demand(iter_food_sales_pages(location_id=location_id), usage_matrix, horizon)
+    )
+
+def get_scenario_baseline(usage_matrix=None, location_id=None):
+    """Perfil semanal de ventas por platillo y calibración para /simulate; se cachea hasta que llegue uso nuevo"""
+    return location_analytics(location_id).analytics_cache.get_or_compute(
+        'scenario_baseline', None,
+        lambda: build_scenario_baseline(iter_food_sales_pages(location_id=location_id), usage_matrix)
+    )
+
+def _bom_forecast_frame(bom_forecast, ingredient_id):
+    """Pronóstico por receta de un ingrediente como DataFrame (ds, yhat), o None si no está en el menú"""
+    positions = np.flatnonzero(bom_forecast['ingredient_ids'] == int(ingredient_id))
+    if not len(positions):
+        return None
+    return pd.DataFrame({
+        'ds': pd.to_datetime(bom_forecast['dates']),
+        'yhat': bom_forecast['ingredient_forecast'][positions[0]]
+    })
+
+def _parse_date_range(start=None, end=None):
+    """Valida start/end (YYYY-MM-DD); responde 400 si no son fechas o el rango está invertido"""
+    try:
+        start = date.fromisoformat(start).isoformat() if start else None
+        end = date.fromisoformat(end).isoformat() if end else None
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="start y end deben ser fechas YYYY-MM-DD"
+        )
+    if start and end and start > end:
+        raise HTTPException(
+            status_code=400,
+            detail="start debe ser anterior o igual a end"
+        )
+    return start, end
+
+def _validate_points(points):
+    """Responde 400 si el máximo de puntos por serie no alcanza el mínimo de LTTB"""
+    if points < MIN_CHART_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"points debe ser al menos {MIN_CHART_POINTS}"
+        )
+
+def get_reorder_analysis(usage_matrix=None, lead_time=LEAD_TIME_DAYS, service_level=SERVICE_LEVEL, location_id=None):
+    """
+    Puntos de reorden, stock de seguridad, probabilidad de desabastecimiento y días
+    esperados hasta agotarse de todos los ingredientes (simulación Monte Carlo sobre
+    el stock del libro). Se cachea hasta que llegue uso nuevo.
+    """
+    service_level = round(float(service_level), SERVICE_LEVEL_DECIMALS)
+    if usage_matrix is None:
+        usage_matrix = get_synced_usage_matrix(location_id)
+    ingredient_ids = get_inventory_ids(location_id)
+    ledger = get_stock_ledger(location_id)
+    return location_analytics(location_id).analytics_cache.get_or_compute(
+        f'reorder_{lead_time}_{service_level}', None,
+        lambda: simulate_reorder_points(
+            usage_matrix,
+            {ingredient_id: ledger.current_stock(ingredient_id) for ingredient_id in ingredient_ids},
+            lead_time=lead_time, service_level=service_level
+        )
+    )
+
+def _stock_metrics(data, reorder=None):
+    """
+    Límite seguro, porcentaje de stock y días restantes de un ingrediente del historial.
+    Con el resultado de la simulación de reorden, los días restantes son los esperados
+    según la distribución de uso en lugar del stock entre el uso promedio.
+    """
+    safe_threshold = data['total_stock'] * (data['safe_factor'] / 100)
+    current_stock = data['current_stock']
+    metrics = {
+        "safe_threshold": safe_threshold,
+        "current_stock": current_stock,
+        "stock_percentage": (current_stock / data['total_stock']) * 100,
+        "days_until_empty": current_stock / data['average_daily_usage'] if data['average_daily_usage'] > 0 else float('inf'),
+        "reorder_point": None,
+        "stockout_probability": None
+    }
+    if reorder:
+        metrics["days_until_empty"] = reorder['expected_days_until_empty']
+        metrics["reorder_point"] = reorder['reorder_point']
+        metrics["stockout_probability"] = reorder['stockout_probability']
+    return metrics
+
+def _global_analysis_context(ingredients_data, usage_matrix=None, context=None):
+    """
+    Contexto del análisis global de IA con los datos de todos los ingredientes.
+    El prompt recibe el uso semanal (rollup) y las estadísticas salen de la matriz de
+    uso, así que el historial diario no se serializa. Los puntos de reorden y las
+    probabilidades de desabastecimiento son los de la simulación: el agente no los recalcula.
+    """
+    location_id = context.location_id if context else None
+    if usage_matrix is None:
+        usage_matrix = context.usage_matrix if context else get_usage_matrix()
+    weekly_rollup = (context.rollups if context else get_usage_rollups(usage_matrix))['week']
+    reorder = get_reorder_analysis(usage_matrix, location_id=location_id)
+    return {
+        "usage_matrix": usage_matrix,
+        "ingredients": [
+            {
+                "ingredient_id": ingredient_id,
+                "ingredient_name": data['ingredient_name'],
+                "current_stock": data['current_stock'],
+                "total_stock": data['total_stock'],
+                "unit": data['unit'],
+                "safe_factor": data['safe_factor'],
+                "weekly_usage": weekly_rollup.labeled(ingredient_id),
+                "average_daily_usage": data['average_daily_usage'],
+                "max_daily_usage": data['max_daily_usage'],
+                "stock_status": data['stock_status'],
+                "reorder": {
+                    key: reorder[ingredient_id][key]
+                    for key in ("reorder_point", "safety_stock", "stockout_probability", "expected_days_until_empty")
+                } if ingredient_id in reorder else None
+            }
+            for ingredient_id, data in ingredients_data.items()
+        ]
+    }
+
+def get_global_analysis(ingredients_data, usage_matrix=None, context=None):
+    """Análisis global de IA del local del contexto; se reutiliza hasta que llegue uso nuevo"""
+    location_id = context.location_id if context else None
+    return location_analytics(location_id).analytics_cache.get_or_compute(
+        'global_analysis', None,
+        lambda: inventory_ai.analyze_inventory_global(
+            _global_analysis_context(ingredients_data, usage_matrix, context)
+        )
+    )
+
+async def _read_json_body(request):
+    """Cuerpo JSON de la petición; responde 400 si no es JSON válido"""
+    try:
+        return await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="El cuerpo de la petición debe ser JSON válido"
+        )
+
+def get_safety_coefficients(ingredients_data, usage_matrix=None, location_id=None):
+    """Coeficientes de seguridad predichos para todo el inventario del local; se reutilizan hasta que llegue uso nuevo"""
+    return location_analytics(location_id).analytics_cache.get_or_compute(
+        'safety_coefficients', None,
+        lambda: predict_safety_coefficients(ingredients_data, usage_matrix)
+    )
+
+def predict_safety_coefficients(ingredients_data: Dict[str, Any], usage_matrix=None) -> Dict[str, float]:
+    """
+    Predice coeficientes de seguridad óptimos basados en patrones históricos.
+    Con usage_matrix se usa el uso diario alineado al calendario (días sin uso = 0).
     """
     try:
         predictions = {}
@@ -71,14 +431,16 @@ def predict_safety_coefficients(ingredients_data: Dict[str, Any]) -> Dict[str, f
         for ingredient_id, data in ingredients_data.items():
             # Preparar características para el modelo
             features = []
-            usage_history = data.get('usage_history', {})
+            if usage_matrix is not None and int(ingredient_id) in usage_matrix:
+                usage_values = usage_matrix.active_row(int(ingredient_id))
+            else:
+                # Convertir historial a series temporales
+                usage_history = data.get('usage_history', {})
+                dates = sorted(usage_history.keys())
+                usage_values = [usage_history[date] for date in dates]
             
-            if not usage_history:
+            if len(usage_values) == 0:
                 continue
-                
-            # Convertir historial a series temporales
-            dates = sorted(usage_history.keys())
-            usage_values = [usage_history[date] for date in dates]
             
             # Calcular características
             avg_usage = np.mean(usage_values)
@@ -138,17 +500,148 @@ def predict_safety_coefficients(ingredients_data: Dict[str, Any]) -> Dict[str, f
         logger.error(f"Error predicting safety coefficients: {str(e)}")
         return {}
 
+# Tareas pesadas de un local. Se ejecutan en el worker del local (location_workers),
+# que conserva su matriz de uso y sus cachés entre peticiones.
+
+def _ingredients_data_for(location_id):
+    """Matriz de uso, contexto e historial de los ingredientes del local; (None, None, None) sin inventario"""
+    usage_matrix = get_synced_usage_matrix(location_id)
+    context = ReportContext(location_id, usage_matrix=usage_matrix)
+    if not context.items:
+        return None, None, None
+    # Sin archivo JSON: este camino lo recorren el dashboard y los trabajos de precálculo
+    try:
+        ingredients_data = build_ingredient_history_report(context.items, context.ingredient_usage, context)
+    except Exception as e:
+        raise RuntimeError(f"Error generando el historial de ingredientes: {str(e)}")
+    if not ingredients_data:
+        raise RuntimeError("Error generando el historial de ingredientes")
+    return usage_matrix, context, ingredients_data
+
+def dashboard_html_job(location_id, start=None, end=None, max_points=CHART_POINT_BUDGET):
+    """HTML del dashboard del local, o None si no tiene inventario"""
+    usage_matrix, context, ingredients_data = _ingredients_data_for(location_id)
+    if context is None:
+        return None
+    return generate_dashboard_html(ingredients_data, usage_matrix, start, end, max_points, context)
+
+def dashboard_data_job(location_id, **options):
+    """Datos del dashboard del local (build_dashboard_data), o None si no tiene inventario"""
+    usage_matrix, context, ingredients_data = _ingredients_data_for(location_id)
+    if context is None:
+        return None
+    return build_dashboard_data(ingredients_data, usage_matrix, context=context, **options)
+
+def apply_usage_job(location_id, rows, previous_version, version):
+    """Aplica en el worker un lote de uso ingerido por la API (apply_usage_events)"""
+    apply_usage_events(rows, previous_version, version, location_id)
+
+def bom_forecast_job(location_id, horizon=FORECAST_HORIZON_DAYS):
+    return get_bom_forecast(get_synced_usage_matrix(location_id), horizon, location_id)
+
+def reorder_job(location_id, lead_time=LEAD_TIME_DAYS, service_level=SERVICE_LEVEL):
+    return get_reorder_analysis(get_synced_usage_matrix(location_id), lead_time, service_level, location_id)
+
+def simulation_job(location_id, scenario, start=None, days=DEFAULT_SIMULATION_DAYS):
+    """Simulación what-if sobre el stock actual del local (simulate_scenario)"""
+    baseline = get_scenario_baseline(get_synced_usage_matrix(location_id), location_id)
+    ingredient_ids = get_inventory_ids(location_id)
+    ledger = get_stock_ledger(location_id)
+    states = {ingredient_id: ledger.status(ingredient_id) for ingredient_id in ingredient_ids}
+    return simulate_scenario(
+        baseline,
+        {ingredient_id: state['current_stock'] for ingredient_id, state in states.items()},
+        {ingredient_id: state['safe_threshold'] for ingredient_id, state in states.items()},
+        scenario=scenario, start_date=start, days=days
+    )
+
+def warm_location_job(location_id):
+    """
+    Precalcula lo que sirven las peticiones del local: matriz y rollups de uso,
+    historial, estadísticas de uso, pronósticos por ingrediente y por receta,
+    coeficientes de seguridad, puntos de reorden y análisis global de IA. Lo ya
+    cacheado no se recalcula. Devuelve la duración de cada paso en segundos.
+    """
+    steps = {}
+    started = time.monotonic()
+    usage_stats = get_usage_monitor(location_id).state()
+    steps["usage_stats"] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    dashboard_data = dashboard_data_job(location_id)
+    steps["dashboard"] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    try:
+        get_bom_forecast(get_synced_usage_matrix(location_id), location_id=location_id)
+    except ValueError as e:
+        # Sin ventas de platillos no hay pronóstico por receta
+        logger.info(f"Pronóstico por receta omitido (local {location_id}): {str(e)}")
+    steps["bom_forecast"] = round(time.monotonic() - started, 3)
+
+    return {
+        "ingredients": len(dashboard_data['ingredients']) if dashboard_data else 0,
+        "ingredients_with_stats": len(usage_stats),
+        "steps": steps
+    }
+
+def nightly_refresh_job(location_id):
+    """Concilia el libro de stock, vuelve a leer el inventario y precalcula los análisis del local"""
+    report = reconcile_stock_ledger(location_id)
+    location_state(location_id).inventory_index.invalidate()
+    return dict(warm_location_job(location_id), ingredients_with_drift=report['ingredients_with_drift'])
+
+@scheduler.job("warmup", on_startup=True)
+def _warmup(location_id):
+    return location_workers.call(location_id, warm_location_job, location_id)
+
+@scheduler.job("usage_refresh", on_usage=True)
+def _usage_refresh(location_id):
+    return location_workers.call(location_id, warm_location_job, location_id)
+
+@scheduler.job("nightly_refresh", cron=NIGHTLY_REFRESH_CRON)
+def _nightly_refresh(location_id):
+    return location_workers.call(location_id, nightly_refresh_job, location_id)
+
+@app.get("/jobs")
+async def get_jobs_endpoint():
+    """Trabajos programados: disparadores, próxima corrida y estado y duración de la última por local"""
+    return {
+        "status": "success",
+        "data": {
+            "scheduler_running": scheduler.running,
+            "scheduler_leader": scheduler.leading,
+            "jobs": scheduler.status()
+        }
+    }
+
+@app.post("/jobs/{name}/run")
+async def run_job_endpoint(name: str, location_id: int = None):
+    """Encola una corrida inmediata de un trabajo programado para un local"""
+    try:
+        scheduler.run_now(name, location_id)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No existe el trabajo {name}"
+        )
+    return {
+        "status": "success",
+        "data": {"job": name, "location_id": location_id, "queued_at": datetime.now().isoformat()}
+    }
+
+# Los endpoints que consultan Supabase o calculan en línea son def (no async):
+# FastAPI los ejecuta en su pool de hilos y no bloquean el bucle de eventos.
+
 @app.get("/ingredient-usage/{ingredient_id}")
-async def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float):
+def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float, start: str = None, end: str = None,
+                                  location_id: int = None):
+    start, end = _parse_date_range(start, end)
     try:
         logger.info(f"Obteniendo datos para ingredient_id: {ingredient_id}")
         
-        # Obtener datos detallados que incluyen el historial de uso
-        detailed_data = await get_detailed_ingredient_data(ingredient_id)
-        
-        # Obtener datos del inventario
-        inventory_items, ingredient_usage = get_inventory_data()
-        item = next((item for item in inventory_items if item['ingredient_id'] == ingredient_id), None)
+        # Búsqueda O(1) en el índice del inventario (no depende del tamaño del inventario)
+        item = get_inventory_item(ingredient_id, location_id)
         
         if not item:
             raise HTTPException(
@@ -156,34 +649,16 @@ async def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float
                 detail=f"No se encontró el ingrediente con ID {ingredient_id}"
             )
 
-        # Obtener el historial de uso del formato correcto del JSON
-        usage_history = {}
-        if detailed_data and isinstance(detailed_data, dict):
-            ingredient_data = detailed_data.get(str(ingredient_id), {})
-            
-            # Actualizar el item con los campos exactos del JSON
-            item.update({
-                'ingredient_name': ingredient_data.get('ingredient_name'),
-                'ingredient_id': ingredient_data.get('ingredient_id'),
-                'unit': ingredient_data.get('unit'),
-                'total_stock': ingredient_data.get('total_stock'),
-                'safe_factor': ingredient_data.get('safe_factor'),
-                'usage_history': ingredient_data.get('usage_history', {}),
-                'total_usage': ingredient_data.get('total_usage'),
-                'average_daily_usage': ingredient_data.get('average_daily_usage'),
-                'max_daily_usage': ingredient_data.get('max_daily_usage'),
-                'days_with_usage': ingredient_data.get('days_with_usage'),
-                'first_usage_date': ingredient_data.get('first_usage_date'),
-                'last_usage_date': ingredient_data.get('last_usage_date'),
-                'current_stock': ingredient_data.get('current_stock'),
-                'safe_threshold': ingredient_data.get('safe_threshold'),
-                'stock_status': ingredient_data.get('stock_status')
-            })
+        # Historial y estado del ingrediente desde los rollups en memoria
+        usage_matrix = get_synced_usage_matrix(location_id)
+        ingredient_history = build_ingredient_history(item, get_usage_rollups(usage_matrix, location_id))
+        if ingredient_history:
+            item.update(ingredient_history)
             
         logger.info(f"Historial de uso encontrado para ingrediente {ingredient_id}: {len(item.get('usage_history', {}))} registros")
         
-        # Obtener datos de uso
-        usage_data = get_ingredient_usage(ingredient_id, current_stock)
+        # Obtener datos de uso (única consulta, solo de este ingrediente)
+        usage_data = get_ingredient_usage(ingredient_id, current_stock, start, end, location_id)
         
         if not usage_data:
             raise HTTPException(
@@ -192,7 +667,7 @@ async def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float
             )
 
         # Añadir predicciones de IA
-        safety_coefficients = predict_safety_coefficients({str(ingredient_id): item})
+        safety_coefficients = predict_safety_coefficients({str(ingredient_id): item}, usage_matrix)
         predicted_safety_coef = safety_coefficients.get(str(ingredient_id))
         
         if predicted_safety_coef:
@@ -204,14 +679,16 @@ async def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float
                 "ingredient": item,
                 "usage_data": usage_data,
                 "current_stock": current_stock,
-                "total_usage": ingredient_usage.get(ingredient_id, 0),
+                "total_usage": get_stock_ledger(location_id).total_usage(ingredient_id),
                 "ai_predictions": {
                     "predicted_safety_factor": predicted_safety_coef,
-                    "confidence_score": model.score(synthetic_X, synthetic_y) if 'model' in locals() else None
+                    "confidence_score": None
                 }
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo datos del ingrediente: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -219,13 +696,401 @@ async def get_ingredient_usage_endpoint(ingredient_id: int, current_stock: float
             detail=f"Error: {str(e)}"
         )
 
+@app.get("/usage-alerts")
+def get_usage_alerts_endpoint(since: str = None, level: str = None, location_id: int = None):
+    """Alertas de consumo anómalo (>2σ warning, >3σ critical) detectadas al registrar el uso"""
+    try:
+        alerts = get_usage_monitor(location_id).alerts(since=since, level=level)
+        return {
+            "status": "success",
+            "data": alerts
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo alertas de uso: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.get("/usage-stats")
+def get_usage_stats_endpoint(location_id: int = None):
+    """Estado actual de los acumuladores de uso de todos los ingredientes"""
+    try:
+        return {
+            "status": "success",
+            "data": get_usage_monitor(location_id).state()
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo estadísticas de uso: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.get("/usage-stats/{ingredient_id}")
+def get_ingredient_usage_stats_endpoint(ingredient_id: int, location_id: int = None):
+    """Media/varianza (Welford), ventanas móviles de 7 y 30 días y EWMA de un ingrediente"""
+    state = get_usage_monitor(location_id).state(ingredient_id)
+    if state is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No hay estadísticas de uso para el ingrediente {ingredient_id}"
+        )
+    return {
+        "status": "success",
+        "data": state
+    }
+
+@app.get("/usage-rollups/{ingredient_id}")
+def get_usage_rollup_endpoint(ingredient_id: int, granularity: str = 'week', start: str = None, end: str = None,
+                              location_id: int = None):
+    """Uso de un ingrediente agregado por día, semana ISO o mes (rollups mantenidos en memoria)"""
+    start, end = _parse_date_range(start, end)
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"granularity debe ser una de: {', '.join(GRANULARITIES)}"
+        )
+    try:
+        usage_matrix = get_synced_usage_matrix(location_id)
+        return {
+            "status": "success",
+            "data": {
+                "ingredient_id": ingredient_id,
+                "granularity": granularity,
+                "usage": get_usage_rollups(usage_matrix, location_id)[granularity].labeled(ingredient_id, start, end)
+            }
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo rollups de uso: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.get("/forecast/ingredients")
+async def get_ingredient_demand_forecast_endpoint(request: Request, horizon: int = FORECAST_HORIZON_DAYS,
+                                                  location_id: int = None):
+    """
+    Demanda diaria pronosticada de todos los ingredientes: un pronóstico por platillo
+    (order_items_table) multiplicado por la matriz de recetas, calibrado con el uso real.
+    """
+    if not 1 <= horizon <= 365:
+        raise HTTPException(
+            status_code=400,
+            detail="horizon debe estar entre 1 y 365 días"
+        )
+    try:
+        bom_forecast = await location_workers.run(location_id, bom_forecast_job, location_id, horizon)
+        return json_response(request, {
+            "status": "success",
+            "data": {
+                "dates": np.datetime_as_string(bom_forecast['dates']).tolist(),
+                "ingredients": [
+                    {
+                        "ingredient_id": ingredient_id,
+                        "forecast": bom_forecast['ingredient_forecast'][position],
+                        "calibration": bom_forecast['calibration'][position]
+                    }
+                    for position, ingredient_id in enumerate(bom_forecast['ingredient_ids'].tolist())
+                ],
+                "foods": [
+                    {"food_id": food_id, "forecast": bom_forecast['food_forecast'][position]}
+                    for position, food_id in enumerate(bom_forecast['food_ids'].tolist())
+                ]
+            }
+        })
+    except ValueError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error pronosticando demanda de ingredientes: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.get("/reorder-points")
+async def get_reorder_points(lead_time: int = LEAD_TIME_DAYS, service_level: float = SERVICE_LEVEL,
+                             location_id: int = None):
+    """Punto de reorden, stock de seguridad y riesgo de desabastecimiento por ingrediente"""
+    try:
+        if not 1 <= lead_time <= MAX_LEAD_TIME_DAYS or not MIN_SERVICE_LEVEL <= service_level <= MAX_SERVICE_LEVEL:
+            raise HTTPException(
+                status_code=400,
+                detail=f"lead_time debe estar entre 1 y {MAX_LEAD_TIME_DAYS} días y service_level "
+                       f"entre {MIN_SERVICE_LEVEL} y {MAX_SERVICE_LEVEL}"
+            )
+        reorder = await location_workers.run(location_id, reorder_job, location_id, lead_time, service_level)
+        return {
+            "status": "success",
+            "data": [
+                {"ingredient_id": ingredient_id, **result}
+                for ingredient_id, result in sorted(reorder.items())
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error simulando puntos de reorden: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.post("/simulate")
+async def simulate_endpoint(request: Request, location_id: int = None):
+    """
+    Simulación what-if: aplica multiplicadores de volumen, por día de la semana y por
+    platillo (o quita platillos del menú) al patrón de ventas reciente y proyecta el
+    stock de cada ingrediente a través de las recetas, junto a la proyección sin cambios.
+    Cuerpo: {"days", "start", "volume", "weekday_multipliers", "food_multipliers", "remove_foods"}.
+    """
+    body = await _read_json_body(request)
+    if not isinstance(body, dict):
+        raise HTTPException(
+            status_code=400,
+            detail="El escenario debe ser un objeto JSON"
+        )
+    start = body.get('start')
+    if start is not None and not isinstance(start, str):
+        raise HTTPException(
+            status_code=400,
+            detail="start debe ser una fecha YYYY-MM-DD"
+        )
+    start, _ = _parse_date_range(start)
+    days = body.get('days', DEFAULT_SIMULATION_DAYS)
+    # bool es subclase de int: true/false no son un número de días
+    if isinstance(days, bool) or not isinstance(days, int) or not 1 <= days <= MAX_SIMULATION_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"days debe ser un entero entre 1 y {MAX_SIMULATION_DAYS}"
+        )
+    try:
+        simulation = await location_workers.run(location_id, simulation_job, location_id, body, start, days)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error simulando escenario: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+    def projection(name, position):
+        projected = simulation[name]
+        days_until_safe_threshold = projected['days_until_safe_threshold'][position]
+        days_until_empty = projected['days_until_empty'][position]
+        return {
+            "total_demand": float(projected['demand'][position].sum()),
+            "stock": projected['stock'][position],
+            "days_until_safe_threshold": None if np.isnan(days_until_safe_threshold) else days_until_safe_threshold,
+            "days_until_empty": None if np.isnan(days_until_empty) else days_until_empty
+        }
+
+    return json_response(request, {
+        "status": "success",
+        "data": {
+            "dates": np.datetime_as_string(simulation['dates']).tolist(),
+            "multipliers": simulation['multipliers'],
+            "ingredients": [
+                {
+                    "ingredient_id": ingredient_id,
+                    "current_stock": simulation['current_stock'][position],
+                    "safe_threshold": simulation['safe_threshold'][position],
+                    "baseline": projection('baseline', position),
+                    "scenario": projection('scenario', position)
+                }
+                for position, ingredient_id in enumerate(simulation['ingredient_ids'].tolist())
+            ]
+        }
+    })
+
+@app.get("/stock")
+def get_stock_endpoint(location_id: int = None):
+    """Stock actual de cada ingrediente leído del libro de stock (sin sumar el historial)"""
+    try:
+        ledger = get_stock_ledger(location_id)
+        items = get_inventory_items(location_id)
+        return {
+            "status": "success",
+            "data": [
+                {
+                    "ingredient_id": item['ingredient_id'],
+                    "ingredient_name": item['ingredient_name'],
+                    "unit": item['unit'],
+                    "total_stock": item['total_stock'],
+                    "total_usage": ledger.total_usage(item['ingredient_id']),
+                    "current_stock": ledger.current_stock(item['ingredient_id'])
+                }
+                for item in items
+            ],
+            "last_reconciliation": ledger.last_reconciliation
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo stock actual: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.post("/stock-ledger/reconcile")
+def reconcile_stock_ledger_endpoint(location_id: int = None):
+    """Recalcula el uso total desde el historial y reporta las diferencias con el libro de stock"""
+    try:
+        return {
+            "status": "success",
+            "data": reconcile_stock_ledger(location_id)
+        }
+    except Exception as e:
+        logger.error(f"Error conciliando el libro de stock: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+@app.post("/usage-events")
+async def ingest_usage_events_endpoint(request: Request, location_id: int = None):
+    """
+    Recibe lotes de registros de uso (mismo formato que generate_orders), ya sea
+    como lista o como {"events": [...]}. Valida el lote completo, lo inserta y
+    actualiza en el mismo paso el stock, las estadísticas y las cachés de análisis.
+    """
+    started_at = datetime.now().isoformat()
+    body = await _read_json_body(request)
+    events = body.get('events') if isinstance(body, dict) else body
+
+    try:
+        # La inserción y la actualización de los agregados son bloqueantes: fuera del bucle de eventos
+        result = await run_in_threadpool(ingest_usage_events, events, location_id=location_id)
+    except Exception as e:
+        logger.error(f"Error ingiriendo registros de uso: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+    if result["errors"]:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Registros de uso inválidos", "errors": result["errors"]}
+        )
+
+    return {
+        "status": "success",
+        "data": {
+            "accepted": result["accepted"],
+            "alerts": location_analytics(location_id).usage_monitor.alerts(since=started_at)
+        }
+    }
+
+@app.get("/stock-events")
+def stock_events_endpoint(location_id: int = None):
+    """
+    Canal server-sent events con el estado del stock del local. Envía un snapshot inicial
+    y luego solo los ingredientes cuyo estado, stock actual o pronóstico cambiaron.
+    Con varios procesos de la API (API_WORKERS > 1) requiere ANALYTICS_CACHE_PATH, que
+    reparte los lotes ingeridos a todos los procesos.
+    """
+    stock_broadcaster = location_analytics(location_id).stock_broadcaster
+    try:
+        get_inventory_items(location_id)
+        get_synced_usage_matrix(location_id)
+        stock_broadcaster.publish(current_stock_states(location_id=location_id))
+    except Exception as e:
+        logger.error(f"Error preparando eventos de stock: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+    return StreamingResponse(
+        stock_broadcaster.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Ingredientes por página de /inventory-report
+REPORT_PAGE_SIZE = 100
+MAX_REPORT_PAGE_SIZE = 1000
+
+# Campos que siempre se incluyen al proyectar el historial de un ingrediente
+REPORT_KEY_FIELDS = ('ingredient_id', 'ingredient_name')
+
+def _encode_cursor(ingredient_id):
+    return base64.urlsafe_b64encode(json.dumps({"after": ingredient_id}).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise ValueError("cursor inválido")
+    return after
+
+def paginate_ingredients(items, after=None, limit=REPORT_PAGE_SIZE):
+    """
+    Página de ingredientes ordenados por ingredient_id posteriores a `after`
+    (paginación por clave: estable aunque se agreguen ingredientes).
+    Devuelve (página, cursor siguiente o None).
+    """
+    items = sorted(items, key=lambda item: item['ingredient_id'])
+    if after is not None:
+        items = [item for item in items if item['ingredient_id'] > after]
+    page = items[:limit]
+    next_cursor = _encode_cursor(page[-1]['ingredient_id']) if len(items) > limit else None
+    return page, next_cursor
+
+def project_history(history, fields=None, since=None):
+    """
+    Aplica fields (lista de campos, o 'summary' para todo excepto usage_history)
+    y since (solo días de usage_history desde esa fecha) al historial de un ingrediente.
+    Los totales y promedios siguen calculados sobre la historia completa.
+    """
+    if since and 'usage_history' in history:
+        history = dict(history, usage_history={
+            day: usage for day, usage in history['usage_history'].items() if day >= since
+        })
+    if not fields:
+        return history
+    if fields == ['summary']:
+        return {key: value for key, value in history.items() if key != 'usage_history'}
+    return {key: value for key, value in history.items() if key in fields or key in REPORT_KEY_FIELDS}
+
 @app.get("/inventory-report")
-async def get_inventory_report_endpoint(request: Request):
+def get_inventory_report_endpoint(request: Request, cursor: str = None, limit: int = REPORT_PAGE_SIZE,
+                                  fields: str = None, since: str = None, location_id: int = None):
+    """
+    Reporte de inventario paginado por ingredientes. cursor/limit recorren las páginas
+    (next_cursor es None en la última), fields proyecta los campos de cada historial
+    (p. ej. fields=summary omite usage_history) y since filtra usage_history por fecha.
+    El reporte general se incluye solo en la primera página.
+    """
+    try:
+        if not 1 <= limit <= MAX_REPORT_PAGE_SIZE:
+            raise ValueError(f"limit debe estar entre 1 y {MAX_REPORT_PAGE_SIZE}")
+        if since:
+            since = date.fromisoformat(since).isoformat()
+        field_list = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+
     try:
         logger.info("Iniciando generación de reporte de inventario...")
         
-        # Usar las funciones de queries directamente
-        inventory_items, ingredient_usage = get_inventory_data()
+        # Datos de la petición: cada consulta e índice se obtiene una sola vez
+        context = ReportContext(location_id, usage_matrix=get_synced_usage_matrix(location_id))
+        inventory_items, ingredient_usage = context.items, context.ingredient_usage
         
         if not inventory_items:
             raise HTTPException(
@@ -233,23 +1098,31 @@ async def get_inventory_report_endpoint(request: Request):
                 detail="No se encontraron datos de inventario"
             )
 
-        # Generar reporte histórico usando la función de queries
-        history_data = generate_ingredient_history_report(inventory_items, ingredient_usage)
+        # Generar reporte histórico solo para los ingredientes de la página
+        page_items, next_cursor = paginate_ingredients(inventory_items, after, limit)
+        history_data = generate_ingredient_history_report(page_items, ingredient_usage, context)
+        history_data = {
+            ingredient_id: project_history(history, field_list, since)
+            for ingredient_id, history in history_data.items()
+        }
         
-        # Generar reporte general usando la función de queries
-        report_data = generate_inventory_report(inventory_items, ingredient_usage)
+        # Generar reporte general usando la función de queries (solo en la primera página)
+        report_data = generate_inventory_report(inventory_items, ingredient_usage, context) if not cursor else None
 
         logger.info("Reporte generado exitosamente")
         
-        return {
+        return json_response(request, {
             "status": "success",
             "message": "Reporte generado exitosamente",
             "data": {
                 "report": report_data,
-                "history": history_data
+                "history": history_data,
+                "next_cursor": next_cursor
             }
-        }
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generando reporte de inventario: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -258,30 +1131,24 @@ async def get_inventory_report_endpoint(request: Request):
         )
 
 @app.get("/dashboard", response_class=HTMLResponse)
-async def get_dashboard():
+async def get_dashboard(start: str = None, end: str = None, points: int = CHART_POINT_BUDGET,
+                        location_id: int = None):
+    start, end = _parse_date_range(start, end)
+    _validate_points(points)
     try:
-        # Obtener datos del inventario usando las funciones de queries
-        inventory_items, ingredient_usage = get_inventory_data()
-        
-        if not inventory_items:
+        # El dashboard se genera en el worker del local
+        dashboard_html = await location_workers.run(
+            location_id, dashboard_html_job, location_id, start, end, points
+        )
+        if dashboard_html is None:
             raise HTTPException(
                 status_code=404,
                 detail="No se encontraron datos de inventario"
             )
-            
-        # Generar el historial usando la función de queries
-        ingredients_data = generate_ingredient_history_report(inventory_items, ingredient_usage)
-        
-        if not ingredients_data:
-            raise HTTPException(
-                status_code=500,
-                detail="Error generando el historial de ingredientes"
-            )
-
-        # Generate dashboard HTML
-        dashboard_html = generate_dashboard_html(ingredients_data)
         return dashboard_html
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating dashboard: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -289,33 +1156,139 @@ async def get_dashboard():
             detail=f"Error generating dashboard: {str(e)}"
         )
 
-def generate_dashboard_html(ingredients_data):
-    # Add global AI analysis at the top
-    try:
-        # Prepare context with all ingredients data
-        all_ingredients_context = {
-            "ingredients": [
-                {
-                    "ingredient_name": data['ingredient_name'],
-                    "current_stock": data['current_stock'],
-                    "total_stock": data['total_stock'],
-                    "unit": data['unit'],
-                    "safe_factor": data['safe_factor'],
-                    "history": [
-                        {"created_at": date, "quantity": usage, "type": "usage"} 
-                        for date, usage in data['usage_history'].items()
-                    ],
-                    "average_daily_usage": data['average_daily_usage'],
-                    "max_daily_usage": data['max_daily_usage'],
-                    "stock_status": data['stock_status']
+def build_dashboard_data(ingredients_data, usage_matrix=None, include_forecast=True, include_analysis=True,
+                         start=None, end=None, max_points=CHART_POINT_BUDGET, granularity='day', context=None,
+                         forecast_mode='ingredient', location_id=None):
+    """
+    Mismas métricas, pronósticos y predicciones del dashboard HTML como datos.
+    Las series se devuelven como arrays NumPy (el serializador las maneja sin copiarlas a listas),
+    limitadas a start/end y reducidas con LTTB a max_points puntos. Con granularity
+    'week' o 'month' la serie de uso sale del rollup correspondiente. Con forecast_mode
+    'bom' los pronósticos salen de la demanda por platillo explotada con las recetas.
+    Sin context, los datos son los del local location_id.
+    """
+    if context is None:
+        context = ReportContext(location_id, usage_matrix=usage_matrix) if usage_matrix is not None \
+            else ReportContext(location_id)
+    location_id = context.location_id
+    rollup = context.rollups[granularity] if granularity != 'day' else None
+    bom_forecast = get_bom_forecast(usage_matrix, location_id=location_id) \
+        if include_forecast and forecast_mode == 'bom' else None
+    safety_coefficients = get_safety_coefficients(ingredients_data, usage_matrix, location_id)
+    reorder = get_reorder_analysis(usage_matrix, location_id=location_id)
+
+    ingredients = []
+    for ingredient_id, data in ingredients_data.items():
+        try:
+            if rollup is not None:
+                usage_series = rollup.series(ingredient_id, start, end)
+                df = pd.DataFrame({'ds': usage_series.index, 'y': usage_series.to_numpy()})
+            else:
+                df = _usage_frame(ingredient_id, data, usage_matrix, start, end)
+            df = downsample_frame(df, max_points)
+            metrics = _stock_metrics(data, reorder.get(ingredient_id))
+            ingredient = {
+                "ingredient_id": ingredient_id,
+                "ingredient_name": data['ingredient_name'],
+                "unit": data['unit'],
+                "total_stock": data['total_stock'],
+                "safe_factor": data['safe_factor'],
+                "stock_status": data['stock_status'],
+                "current_stock": metrics['current_stock'],
+                "safe_threshold": metrics['safe_threshold'],
+                "stock_percentage": metrics['stock_percentage'],
+                "days_until_empty": min(metrics['days_until_empty'], 999),
+                "reorder_point": metrics['reorder_point'],
+                "stockout_probability": metrics['stockout_probability'],
+                "average_daily_usage": data['average_daily_usage'],
+                "max_daily_usage": data['max_daily_usage'],
+                "predicted_safety_factor": safety_coefficients.get(ingredient_id),
+                "usage": {
+                    "granularity": granularity,
+                    "dates": df['ds'].dt.strftime('%Y-%m-%d').tolist(),
+                    "values": df['y'].to_numpy()
                 }
-                for ingredient_id, data in ingredients_data.items()
-            ]
-        }
+            }
+            forecast = None
+            if bom_forecast is not None:
+                forecast = _bom_forecast_frame(bom_forecast, ingredient_id)
+            elif include_forecast and data['usage_history']:
+                forecast = _ingredient_forecast(ingredient_id, data, usage_matrix, start, location_id)
+            if forecast is not None:
+                forecast = downsample_frame(forecast, max_points, y='yhat')
+                ingredient["forecast"] = {
+                    "dates": forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
+                    "yhat": forecast['yhat'].to_numpy()
+                }
+            ingredients.append(ingredient)
+        except Exception as e:
+            logger.error(f"Error preparando datos del ingrediente {ingredient_id}: {str(e)}")
+
+    dashboard_data = {
+        "generated_at": datetime.now().isoformat(),
+        "ingredients": ingredients
+    }
+    if include_analysis:
+        global_analysis = get_global_analysis(ingredients_data, usage_matrix, context)
+        dashboard_data["global_analysis"] = global_analysis.get('analysis')
+    return dashboard_data
+
+@app.get("/dashboard/data")
+async def get_dashboard_data(request: Request, forecast: bool = True, analysis: bool = True,
+                             start: str = None, end: str = None, points: int = CHART_POINT_BUDGET,
+                             granularity: str = 'day', forecast_mode: str = 'ingredient', location_id: int = None):
+    """
+    Datos del dashboard en JSON compacto (para la app), comprimido con brotli o gzip
+    según Accept-Encoding. forecast/analysis permiten omitir pronósticos y análisis de IA;
+    start/end limitan las series, points fija el máximo de puntos por serie y
+    granularity (day, week, month) elige el rollup de la serie de uso y forecast_mode
+    (ingredient, bom) el tipo de pronóstico.
+    """
+    start, end = _parse_date_range(start, end)
+    _validate_points(points)
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"granularity debe ser una de: {', '.join(GRANULARITIES)}"
+        )
+    if forecast_mode not in FORECAST_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"forecast_mode debe ser uno de: {', '.join(FORECAST_MODES)}"
+        )
+    try:
+        dashboard_data = await location_workers.run(
+            location_id, dashboard_data_job, location_id,
+            include_forecast=forecast, include_analysis=analysis,
+            start=start, end=end, max_points=points, granularity=granularity, forecast_mode=forecast_mode
+        )
+        if dashboard_data is None:
+            raise HTTPException(
+                status_code=404,
+                detail="No se encontraron datos de inventario"
+            )
+
+        return json_response(request, {
+            "status": "success",
+            "data": dashboard_data
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generando datos del dashboard: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
 
+def generate_dashboard_html(ingredients_data, usage_matrix=None, start=None, end=None,
+                            max_points=CHART_POINT_BUDGET, context=None):
+    location_id = context.location_id if context else None
+    # Add global AI analysis at the top
+    try:
         # Get global AI analysis - solo una vez para todos los ingredientes
-        inventory_ai = InventoryAnalysisSystem()
-        global_analysis = inventory_ai.analyze_inventory_global(all_ingredients_context)
+        global_analysis = get_global_analysis(ingredients_data, usage_matrix, context)
 
         # Format AI insights
         def clean_ai_text(text):
@@ -571,16 +1544,15 @@ def generate_dashboard_html(ingredients_data):
         logger.error(f"Error generating global analysis: {str(e)}")
         global_analysis_html = "<div>Error generating global analysis</div>"
 
+    # Puntos de reorden y días restantes simulados (cacheados hasta que llegue uso)
+    reorder = get_reorder_analysis(usage_matrix, location_id=location_id)
+
     # Continue with individual ingredient sections (solo gráficas y métricas, sin análisis de IA)
     ingredient_sections = []
     for ingredient_id, data in ingredients_data.items():
         try:
-            # Create usage history dataframe
-            df = pd.DataFrame(
-                [(date, usage) for date, usage in data['usage_history'].items()],
-                columns=['ds', 'y']
-            )
-            df['ds'] = pd.to_datetime(df['ds'])
+            # Create usage history dataframe (rango pedido, reducido con LTTB al presupuesto de puntos)
+            df = downsample_frame(_usage_frame(ingredient_id, data, usage_matrix, start, end), max_points)
 
             # 1. Historical Usage Plot
             usage_fig = px.line(df, x='ds', y='y', 
@@ -588,11 +1560,10 @@ def generate_dashboard_html(ingredients_data):
                               labels={'ds': 'Fecha', 'y': f"Uso ({data['unit']})"})
             usage_fig.update_layout(showlegend=False)
             
-            # 2. Generate Prophet predictions
-            m = Prophet(yearly_seasonality=True, weekly_seasonality=True)
-            m.fit(df)
-            future = m.make_future_dataframe(periods=30)
-            forecast = m.predict(future)
+            # 2. Generate Prophet predictions (cacheadas hasta que llegue uso del ingrediente)
+            forecast = downsample_frame(
+                _ingredient_forecast(ingredient_id, data, usage_matrix, start, location_id), max_points, y='yhat'
+            )
             
             pred_fig = go.Figure()
             pred_fig.add_trace(go.Scatter(x=df['ds'], y=df['y'], name='Histórico'))
@@ -600,10 +1571,11 @@ def generate_dashboard_html(ingredients_data):
             pred_fig.update_layout(title="Pronóstico de Uso")
 
             # Calculate metrics
-            safe_threshold = data['total_stock'] * (data['safe_factor'] / 100)
-            current_stock = data['current_stock']
-            stock_percentage = (current_stock / data['total_stock']) * 100
-            days_until_empty = current_stock / data['average_daily_usage'] if data['average_daily_usage'] > 0 else float('inf')
+            metrics = _stock_metrics(data, reorder.get(ingredient_id))
+            safe_threshold = metrics['safe_threshold']
+            current_stock = metrics['current_stock']
+            stock_percentage = metrics['stock_percentage']
+            days_until_empty = metrics['days_until_empty']
             
             status_color = (
                 '#e74c3c' if current_stock < safe_threshold else
@@ -642,7 +1614,7 @@ def generate_dashboard_html(ingredients_data):
                     <div class="metric-card">
                         <h3>Días Restantes</h3>
                         <p>{min(days_until_empty, 999):.1f} días</p>
-                        <small>Al ritmo actual de uso</small>
+                        <small>Esperados según la simulación de uso</small>
                     </div>
                     <div class="metric-card">
                         <h3>Promedio Diario</h3>
@@ -796,6 +1768,84 @@ def generate_dashboard_html(ingredients_data):
         }
     """
 
+    # Generar tabla de predicciones de IA
+    safety_coefficients = get_safety_coefficients(ingredients_data, usage_matrix, location_id)
+    
+    ai_predictions_table = f"""
+    <div class="ai-predictions-section">
+        <h2>Predicciones de IA - Coeficientes de Seguridad</h2>
+        <div class="table-container">
+            <table class="analysis-table">
+                <thead>
+                    <tr>
+                        <th>Ingrediente</th>
+                        <th>Coeficiente Actual</th>
+                        <th>Coeficiente Recomendado</th>
+                        <th>Punto de Reorden</th>
+                        <th>Prob. Desabasto ({STOCKOUT_HORIZON_DAYS} días)</th>
+                        <th>Estado</th>
+                    </tr>
+                </thead>
+                <tbody>
+    """
+    
+    for ingredient_id, data in ingredients_data.items():
+        predicted_coef = safety_coefficients.get(ingredient_id)
+        current_coef = data.get('safe_factor', 0)
+        ingredient_reorder = reorder.get(ingredient_id)
+        
+        if predicted_coef:
+            difference = abs(predicted_coef - current_coef)
+            status = (
+                '<span class="status-critical">Ajuste Necesario</span>' if difference > 10
+                else '<span class="status-warning">Revisar</span>' if difference > 5
+                else '<span class="status-good">Óptimo</span>'
+            )
+            
+            ai_predictions_table += f"""
+                <tr>
+                    <td>{data['ingredient_name']}</td>
+                    <td>{current_coef:.1f}%</td>
+                    <td>{predicted_coef:.1f}%</td>
+                    <td>{f"{ingredient_reorder['reorder_point']:.2f} {data['unit']}" if ingredient_reorder else '-'}</td>
+                    <td>{f"{ingredient_reorder['stockout_probability'] * 100:.0f}%" if ingredient_reorder else '-'}</td>
+                    <td>{status}</td>
+                </tr>
+            """
+    
+    ai_predictions_table += """
+                </tbody>
+            </table>
+        </div>
+    </div>
+    """
+    
+    # Estilos de la tabla de predicciones
+    additional_styles += """
+        .ai-predictions-section {
+            margin: 32px 0;
+            padding: 24px;
+            background: white;
+            border-radius: 12px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        
+        .status-critical {
+            color: #e74c3c;
+            font-weight: 600;
+        }
+        
+        .status-warning {
+            color: #f39c12;
+            font-weight: 600;
+        }
+        
+        .status-good {
+            color: #2ecc71;
+            font-weight: 600;
+        }
+    """
+    
     # Add the additional_styles to your existing dashboard HTML template
     dashboard_html = f"""
     <!DOCTYPE html>
@@ -957,6 +2007,7 @@ def generate_dashboard_html(ingredients_data):
         <div class="content">
             <h1>Dashboard de Análisis de Inventario</h1>
             {global_analysis_html}
+            {ai_predictions_table}
             {''.join(ingredient_sections)}
         </div>
 
@@ -1062,87 +2113,13 @@ def generate_dashboard_html(ingredients_data):
     </html>
     """
     
-    # Generar tabla de predicciones de IA
-    safety_coefficients = predict_safety_coefficients(ingredients_data)
-    
-    ai_predictions_table = """
-    <div class="ai-predictions-section">
-        <h2>Predicciones de IA - Coeficientes de Seguridad</h2>
-        <div class="table-container">
-            <table class="analysis-table">
-                <thead>
-                    <tr>
-                        <th>Ingrediente</th>
-                        <th>Coeficiente Actual</th>
-                        <th>Coeficiente Recomendado</th>
-                        <th>Estado</th>
-                    </tr>
-                </thead>
-                <tbody>
-    """
-    
-    for ingredient_id, data in ingredients_data.items():
-        predicted_coef = safety_coefficients.get(str(ingredient_id))
-        current_coef = data.get('safe_factor', 0)
-        
-        if predicted_coef:
-            difference = abs(predicted_coef - current_coef)
-            status = (
-                '<span class="status-critical">Ajuste Necesario</span>' if difference > 10
-                else '<span class="status-warning">Revisar</span>' if difference > 5
-                else '<span class="status-good">Óptimo</span>'
-            )
-            
-            ai_predictions_table += f"""
-                <tr>
-                    <td>{data['ingredient_name']}</td>
-                    <td>{current_coef:.1f}%</td>
-                    <td>{predicted_coef:.1f}%</td>
-                    <td>{status}</td>
-                </tr>
-            """
-    
-    ai_predictions_table += """
-                </tbody>
-            </table>
-        </div>
-    </div>
-    """
-    
-    # Add these styles to the additional_styles
-    additional_styles += """
-        .ai-predictions-section {
-            margin: 32px 0;
-            padding: 24px;
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        
-        .status-critical {
-            color: #e74c3c;
-            font-weight: 600;
-        }
-        
-        .status-warning {
-            color: #f39c12;
-            font-weight: 600;
-        }
-        
-        .status-good {
-            color: #2ecc71;
-            font-weight: 600;
-        }
-    """
-    
-    # Insert the AI predictions table after the global analysis section
-    dashboard_html = dashboard_html.replace(
-        '{global_analysis_html}',
-        f'{global_analysis_html}\n{ai_predictions_table}'
-    )
-    
     return dashboard_html
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # Con varios workers, ANALYTICS_CACHE_PATH comparte los análisis calculados y reparte
+    # los lotes ingeridos; sin él cada proceso tendría su propio stock, alertas y eventos
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1 and shared_cache_store is None:
+        raise SystemExit("API_WORKERS > 1 requiere ANALYTICS_CACHE_PATH")
+    uvicorn.run("inventory_analytics:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers) 
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+
+# Segundos que el índice se considera vigente antes de volver a leer inventory_table
+INVENTORY_INDEX_TTL = float(os.getenv("INVENTORY_INDEX_TTL", "60"))
+
+class InventoryIndex:
+    """
+    Vista del inventario indexada por ingredient_id. Las filas se leen con loader()
+    y se vuelven a leer al vencer el TTL o tras invalidate(); entre medias, buscar
+    un ingrediente es O(1) y no depende del tamaño del inventario.
+    """
+
+    def __init__(self, loader, ttl=INVENTORY_INDEX_TTL):
+        self._loader = loader
+        self.ttl = ttl
+        self._items = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            items = self._loader()
+            self._items = {item['ingredient_id']: item for item in items}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Fuerza una nueva lectura en el próximo acceso (p. ej. tras editar inventory_table)"""
+        with self._lock:
+            self._loaded_at = None
+
+    def get(self, ingredient_id):
+        """Copia de la fila del ingrediente, o None si no existe"""
+        self._ensure_fresh()
+        item = self._items.get(ingredient_id)
+        return dict(item) if item is not None else None
+
+    def __contains__(self, ingredient_id):
+        self._ensure_fresh()
+        return ingredient_id in self._items
+
+    def ids(self):
+        self._ensure_fresh()
+        return set(self._items)
+
+    def items(self):
+        self._ensure_fresh()
+        return [dict(item) for item in self._items.values()]
@@ -8,11 +8,8 @@ from pydantic import Field
 import logging
 import os
 from dotenv import load_dotenv
-import numpy as np
-from scipy import stats
-import pandas as pd
-from statsmodels.tsa.seasonal import seasonal_decompose
-import json
+from serialization import dumps_text
+from usage_statistics import compute_usage_statistics, usage_frame_from_histories
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -25,16 +22,6 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY no está configurada en las variables de entorno")
 
-def convert_numpy_types(obj):
-    """Convierte tipos de NumPy a tipos nativos de Python"""
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    return obj
-
 class InventoryAnalysisSystem(Workflow):
     analyst: Optional[Agent] = Field(default=None)
 
@@ -54,11 +41,9 @@ class InventoryAnalysisSystem(Workflow):
                 description="Analizo patrones críticos de consumo y genero alertas tempranas de desabastecimiento",
                 instructions=[
                     "Identificar INMEDIATAMENTE cualquier riesgo de desabastecimiento",
-                    "Calcular agresivamente puntos de reorden y niveles críticos de stock",
                     "Detectar y reportar urgentemente patrones anormales de consumo",
                     "Generar alertas cuando el consumo supere 2 desviaciones estándar",
                     "Priorizar análisis de ingredientes con mayor impacto en operaciones",
-                    "Calcular probabilidades específicas de desabastecimiento",
                     "Proporciona una tabla con los datos de los ingredientes y las recomendaciones.",
                     "Identificar desperdicios y sobrestock con métricas precisas",
                     "Agregar niveles de urgencia (🔴CRÍTICO, 🟡PRECAUCIÓN, 🟢NORMAL) a cada hallazgo",
@@ -68,6 +53,7 @@ class InventoryAnalysisSystem(Workflow):
                     "Detectar comportamientos anómalos usando métricas estadísticas",
                     "no ejemplos de codigo o ejemplos de implementaciones.",
                     "Usar los datos proporcionados para realizar los calculos matematicos y estadisticos.",
+                    "Usar los puntos de reorden y probabilidades de desabastecimiento proporcionados, sin recalcularlos.",
                     "genera algunas tablas con tus hallazgos y recomendaciones."
                 ],
                 tools=[PythonTools()]
@@ -80,57 +66,38 @@ class InventoryAnalysisSystem(Workflow):
             logger.error(f"Error en inicialización: {str(e)}", exc_info=True)
             raise
 
-    def _perform_statistical_analysis(self, history_data: list) -> dict:
-        """Realiza análisis estadístico detallado de los datos históricos"""
+    def _perform_statistical_analysis(self, ingredients: list, usage_matrix=None) -> list:
+        """
+        Calcula las estadísticas de todos los ingredientes en una sola pasada vectorizada.
+        Con usage_matrix, cada serie cubre todos los días desde su primer uso (días sin uso = 0).
+        """
         try:
-            # Convertir datos históricos a DataFrame
-            df = pd.DataFrame(history_data)
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            df = df.set_index('created_at').sort_index()
-            
-            # Análisis de series temporales
-            usage_series = df['quantity']
-            
-            # Descomposición de la serie temporal
-            decomposition = seasonal_decompose(usage_series, period=7, model='additive')
-            
-            # Calcular estadísticas descriptivas
-            stats_analysis = {
-                "mean": usage_series.mean(),
-                "median": usage_series.median(),
-                "std": usage_series.std(),
-                "cv": usage_series.std() / usage_series.mean() * 100,
-                "skewness": stats.skew(usage_series),
-                "kurtosis": stats.kurtosis(usage_series),
-                "trend_slope": np.polyfit(range(len(usage_series)), usage_series, 1)[0],
-                "seasonality_strength": np.std(decomposition.seasonal) / np.std(usage_series),
-                "autocorrelation": usage_series.autocorr(),
-            }
-            
-            # Detección de anomalías
-            z_scores = np.abs(stats.zscore(usage_series))
-            anomalies = (z_scores > 3).sum()
-            stats_analysis["anomalies_count"] = anomalies
-            
-            return stats_analysis
+            if usage_matrix is not None:
+                usage_frame = usage_matrix.to_frame(
+                    [int(ingredient['ingredient_id']) for ingredient in ingredients],
+                    trim_leading=True
+                )
+                usage_frame.columns = range(len(ingredients))
+            else:
+                usage_frame = usage_frame_from_histories({
+                    index: ingredient['history'] for index, ingredient in enumerate(ingredients)
+                })
+            statistics = compute_usage_statistics(usage_frame)
+            return [statistics.get(index, {}) for index in range(len(ingredients))]
             
         except Exception as e:
             logger.error(f"Error en análisis estadístico: {str(e)}", exc_info=True)
-            return {}
+            return [{} for _ in ingredients]
 
     def analyze_inventory_global(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Ejecuta el workflow de análisis global de inventario"""
         try:
             # Calcular estadísticas globales
-            all_stats = []
-            for ingredient in context['ingredients']:
-                stats = self._perform_statistical_analysis(ingredient['history'])
+            all_stats = self._perform_statistical_analysis(
+                context['ingredients'], context.get('usage_matrix')
+            )
+            for stats, ingredient in zip(all_stats, context['ingredients']):
                 stats['ingredient_name'] = ingredient['ingredient_name']
-                all_stats.append(stats)
-
-            # Convertir a tipos nativos de Python
-            all_stats = [{k: convert_numpy_types(v) for k, v in stats.items()} 
-                        for stats in all_stats]
 
             analysis_prompt = f"""
             ANÁLISIS GLOBAL DEL INVENTARIO
@@ -141,18 +108,19 @@ class InventoryAnalysisSystem(Workflow):
             - Ingredientes en estado normal: {sum(1 for i in context['ingredients'] if i['stock_status'] == 'normal')}
 
             ESTADÍSTICAS POR INGREDIENTE:
-            {json.dumps(all_stats, indent=2)}
+            {dumps_text(all_stats, indent=True)}
 
             DATOS DE INVENTARIO ACTUAL:
-            {json.dumps([{
+            {dumps_text([{
                 'nombre': i['ingredient_name'],
                 'stock_actual': i['current_stock'],
                 'stock_total': i['total_stock'],
                 'unidad': i['unit'],
                 'uso_promedio': i['average_daily_usage'],
                 'uso_máximo': i['max_daily_usage'],
-                'historial': i['history']
-            } for i in context['ingredients']], indent=2)}
+                **({'uso_semanal': i['weekly_usage']} if 'weekly_usage' in i else {'historial': i['history']}),
+                **({'reorden_simulado': i['reorder']} if i.get('reorder') else {})
+            } for i in context['ingredients']], indent=True)}
             Realiza un análisis global del inventario para los próximos 7 días
             """
 
@@ -1,9 +1,17 @@
 from supabase import create_client, Client
+from postgrest import ReturnMethod
 import os
 from dotenv import load_dotenv
 import pandas as pd
 from datetime import datetime
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from usage_matrix import DailyUsageMatrix
+from usage_rollups import UsageRollups
+from stock_ledger import StockLedger, stock_status
+from inventory_index import InventoryIndex
 
 # Cargar variables de entorno
 load_dotenv()
@@ -13,49 +21,109 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_ANON_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
 
-def get_inventory_data():
+def for_location(query, location_id, column="location_id"):
     """
-    Obtiene los datos del inventario incluyendo el uso de ingredientes
-    Replica exacta de la consulta en inventory_screen.dart
+    Filtra una consulta por local. location_id=None no filtra: es el modo de un solo
+    restaurante, en el que las tablas no necesitan la columna location_id.
+    """
+    return query.eq(column, location_id) if location_id is not None else query
+
+class LocationState:
+    """
+    Estado en memoria de un local: libro de stock, índice de inventario y la matriz y
+    rollups de uso con su versión. Cada local tiene el suyo, así que los datos de un
+    local nunca se mezclan con los de otro.
+    """
+
+    def __init__(self, location_id):
+        self.location_id = location_id
+        # Uso acumulado por ingrediente, mantenido de forma incremental
+        self.stock_ledger = StockLedger()
+        # Inventario indexado por ingredient_id para búsquedas de un solo ingrediente
+        self.inventory_index = InventoryIndex(lambda: get_inventory_items(location_id))
+        self.usage_matrix_cache = {"version": None, "matrix": None}
+        self.usage_rollups_cache = {"rollups": None}
+        self.usage_matrix_lock = threading.Lock()
+        self.ingest_lock = threading.Lock()
+
+_location_states = {}
+_location_states_lock = threading.Lock()
+
+def location_state(location_id=None):
+    """Estado en memoria del local (se crea al usarlo por primera vez)"""
+    with _location_states_lock:
+        state = _location_states.get(location_id)
+        if state is None:
+            state = _location_states[location_id] = LocationState(location_id)
+        return state
+
+def get_inventory_items(location_id=None):
+    """Obtiene las filas de inventory_table del local (sin el historial de uso)"""
+    query = for_location(supabase.from_('inventory_table').select('*'), location_id)
+    items = query.order('ingredient_name').execute().data
+    location_state(location_id).stock_ledger.load_inventory(items)
+    return items
+
+def get_inventory_item(ingredient_id, location_id=None):
+    """Fila de inventory_table de un ingrediente (búsqueda O(1) en el índice), o None"""
+    return location_state(location_id).inventory_index.get(ingredient_id)
+
+def get_inventory_ids(location_id=None):
+    """Ids de inventory_table desde el índice (al refrescarse, el libro de stock recibe el stock inicial)"""
+    return sorted(location_state(location_id).inventory_index.ids())
+
+def compute_usage_totals(location_id=None):
+    """Recalcula desde cero el uso total por ingrediente sumando todo el historial (página por página)"""
+    totals = {}
+    for page in iter_usage_pages(location_id=location_id):
+        page_totals = pd.DataFrame(page).groupby('ingredient_id')['quantity_used'].sum()
+        for ingredient_id, quantity in page_totals.items():
+            totals[ingredient_id] = totals.get(ingredient_id, 0.0) + quantity
+    return totals
+
+def get_stock_ledger(location_id=None):
+    """
+    Devuelve el libro de stock del local. Solo se recalcula por completo si los datos
+    de uso cambiaron por fuera del libro (la versión de los datos no coincide).
+    """
+    stock_ledger = location_state(location_id).stock_ledger
+    version = get_usage_data_version(location_id)
+    if stock_ledger.version != version:
+        usage_totals = compute_usage_totals(location_id)
+        version = _unchanged_version(location_id, version)
+        if stock_ledger.initialized:
+            report = stock_ledger.reconcile(usage_totals, version)
+            print(f"Libro de stock desactualizado, recalculado: {report['ingredients_with_drift']} ingredientes con diferencias")
+        else:
+            stock_ledger.reset(usage_totals, version)
+    return stock_ledger
+
+def reconcile_stock_ledger(location_id=None):
+    """Compara el libro de stock con un recálculo completo y devuelve el reporte de desviaciones"""
+    version = get_usage_data_version(location_id)
+    usage_totals = compute_usage_totals(location_id)
+    report = location_state(location_id).stock_ledger.reconcile(usage_totals, _unchanged_version(location_id, version))
+    print(f"Conciliación del libro de stock: {report['ingredients_with_drift']} de "
+          f"{report['ingredients_checked']} ingredientes con diferencias")
+    return report
+
+def get_inventory_data(location_id=None):
+    """
+    Obtiene los datos del inventario del local incluyendo el uso total de cada ingrediente.
+    El uso total sale del libro de stock, sin descargar el historial de uso.
     """
     try:
         print("Iniciando get_inventory_data()...")
         
         print("Ejecutando consulta a Supabase...")
-        response = supabase.from_('inventory_table').select('''
-            *,
-            ingredient_usage_table(
-                quantity_used,
-                usage_date
-            )
-        ''').order('ingredient_name').execute()
+        items = get_inventory_items(location_id)
 
         print("Consulta ejecutada exitosamente")
-        items = response.data
-        ingredient_usage = {}
-
-        print("Procesando datos de uso de ingredientes...")
-        # Calcular uso total por ingrediente
-        for item in items:
-            try:
-                ingredient_id = item['ingredient_id']
-                # Verificar si ingredient_usage_table existe y tiene datos
-                usage_list = item.get('ingredient_usage_table', [])
-                if usage_list is None:
-                    usage_list = []
-                
-                total_usage = 0
-                for usage in usage_list:
-                    total_usage += usage['quantity_used']
-                
-                ingredient_usage[ingredient_id] = total_usage
-                
-            except Exception as e:
-                print(f"Error procesando ingrediente {item.get('ingredient_id', 'desconocido')}: {e}")
-                # Si hay error, establecer uso en 0
-                ingredient_id = item.get('ingredient_id')
-                if ingredient_id:
-                    ingredient_usage[ingredient_id] = 0
+        ledger = get_stock_ledger(location_id)
+        ingredient_usage = {
+            item['ingredient_id']: ledger.total_usage(item['ingredient_id'])
+            for item in items
+        }
 
         print("\n=== Datos del Inventario ===")
         print(f"Total de ingredientes: {len(items)}")
@@ -83,21 +151,22 @@ def get_inventory_data():
         print(f"Tipo de error: {type(e).__name__}")
         return [], {}
 
-def get_ingredient_usage(ingredient_id: int, current_stock: float):
+def get_ingredient_usage(ingredient_id: int, current_stock: float, start_date=None, end_date=None, location_id=None):
     """
     Obtiene el historial de uso de un ingrediente específico
     Replica exacta de la consulta en inventory_analytics.py
+    start_date/end_date limitan el rango de fechas en la consulta
     """
     try:
         print(f"\nIniciando get_ingredient_usage() para ingrediente {ingredient_id}...")
         
         print("Ejecutando consulta de uso...")
-        response = supabase.table("ingredient_usage_table") \
-            .select("quantity_used, usage_date") \
-            .eq("ingredient_id", ingredient_id) \
-            .execute()
-
-        usage_data = response.data
+        usage_data = [
+            row
+            for page in iter_usage_pages("quantity_used, usage_date", ingredient_id=ingredient_id,
+                                         start_date=start_date, end_date=end_date, location_id=location_id)
+            for row in page
+        ]
         print(f"Datos obtenidos: {len(usage_data)} registros")
 
         if not usage_data:
@@ -134,10 +203,396 @@ def get_ingredient_usage(ingredient_id: int, current_stock: float):
         print(f"Tipo de error: {type(e).__name__}")
         return []
 
-def generate_inventory_report(items, ingredient_usage):
+# Filas por página al leer ingredient_usage_table (no mayor que max-rows de PostgREST)
+USAGE_PAGE_SIZE = int(os.getenv("USAGE_PAGE_SIZE", "1000"))
+
+USAGE_COLUMNS = "ingredient_id, quantity_used, usage_date"
+
+def _fetch_usage_page(columns, after, page_size, ingredient_id=None, start_date=None, end_date=None,
+                     location_id=None):
+    """Una página de uso ordenada por (usage_date, id), posterior a la clave `after`"""
+    query = for_location(supabase.table("ingredient_usage_table").select(columns), location_id)
+    if ingredient_id is not None:
+        query = query.eq("ingredient_id", ingredient_id)
+    if start_date is not None:
+        query = query.gte("usage_date", str(start_date))
+    if end_date is not None:
+        query = query.lte("usage_date", str(end_date))
+    if after is not None:
+        usage_date, row_id = after
+        query = query.or_(f"usage_date.gt.{usage_date},and(usage_date.eq.{usage_date},id.gt.{row_id})")
+    return query.order("usage_date").order("id").limit(page_size).execute().data
+
+def iter_usage_pages(columns=USAGE_COLUMNS, ingredient_id=None, page_size=USAGE_PAGE_SIZE, prefetch=True,
+                     start_date=None, end_date=None, location_id=None):
+    """
+    Recorre ingredient_usage_table página por página con paginación por clave
+    (usage_date, id), así que el resultado es completo sin importar el límite de
+    filas de PostgREST y solo hay una página en memoria. Con prefetch la página
+    siguiente se pide mientras se procesa la actual. Las filas incluyen id y usage_date.
+    start_date/end_date (inclusivos) y location_id se filtran en la consulta.
+    """
+    filters = {"ingredient_id": ingredient_id, "start_date": start_date, "end_date": end_date,
+               "location_id": location_id}
+    selected = [column.strip() for column in columns.split(',')]
+    for column in ('usage_date', 'id'):
+        if column not in selected:
+            selected.append(column)
+    columns = ', '.join(selected)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        page = _fetch_usage_page(columns, None, page_size, **filters)
+        # Un lote más corto que page_size no garantiza el final (max-rows puede recortarlo)
+        while page:
+            last = page[-1]
+            after = (last['usage_date'], last['id'])
+            if executor is not None:
+                next_page = executor.submit(_fetch_usage_page, columns, after, page_size, **filters)
+                yield page
+                page = next_page.result()
+            else:
+                yield page
+                page = _fetch_usage_page(columns, after, page_size, **filters)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+def iter_food_sales_pages(page_size=USAGE_PAGE_SIZE, location_id=None):
+    """
+    Recorre order_items_table por clave (order_item_id) con la fecha y el estado de
+    su orden. Produce páginas de {food_id, quantity, order_date, order_status}.
+    Con location_id solo se leen los items de las órdenes del local.
+    """
+    # El join interno permite filtrar los items por el local de su orden
+    order_columns = "order_table(order_date, order_status)" if location_id is None \
+        else "order_table!inner(order_date, order_status, location_id)"
+    after = None
+    while True:
+        query = supabase.table("order_items_table") \
+            .select(f"order_item_id, food_id, quantity, {order_columns}")
+        query = for_location(query, location_id, "order_table.location_id")
+        if after is not None:
+            query = query.gt("order_item_id", after)
+        page = query.order("order_item_id").limit(page_size).execute().data
+        if not page:
+            return
+        after = page[-1]['order_item_id']
+        yield [
+            {
+                'food_id': row['food_id'],
+                'quantity': row['quantity'],
+                'order_date': (row.get('order_table') or {}).get('order_date'),
+                'order_status': (row.get('order_table') or {}).get('order_status')
+            }
+            for row in page
+        ]
+
+def fetch_usage_rows(ingredient_id=None, location_id=None):
+    """Obtiene todas las filas de uso (ingredient_id, quantity_used, usage_date)"""
+    return [row for page in iter_usage_pages(ingredient_id=ingredient_id, location_id=location_id) for row in page]
+
+def get_usage_data_version(location_id=None):
+    """
+    Versión de los datos de uso del local, mantenida por triggers en usage_data_version
+    (sql/usage_data_version.sql): aumenta en 1 con cada sentencia que inserta, actualiza
+    o borra registros de uso. Es la lectura de una fila por clave primaria, así que no
+    depende del tamaño del historial.
+    """
+    scope = 'all' if location_id is None else str(location_id)
+    response = supabase.table("usage_data_version") \
+        .select("version") \
+        .eq("scope", scope) \
+        .limit(1) \
+        .execute()
+    return response.data[0]['version'] if response.data else 0
+
+def _unchanged_version(location_id, version):
+    """
+    Devuelve version si los datos no cambiaron durante un recorrido completo del historial;
+    si cambiaron, None. Una ingesta confirmada durante el recorrido puede haber quedado
+    leída o no: el resultado sin versión no recibe ese lote otra vez en _apply_usage_events
+    y se recalcula en la próxima lectura.
+    """
+    current = get_usage_data_version(location_id)
+    if current != version:
+        print(f"Los datos de uso cambiaron durante el recálculo (versión {version} -> {current}, local {location_id})")
+        return None
+    return version
+
+def get_usage_matrix(location_id=None):
+    """
+    Devuelve la DailyUsageMatrix compartida (solo lectura) con el uso diario de
+    todos los ingredientes del local. Solo se reconstruye cuando cambia la versión de los datos.
+    """
+    state = location_state(location_id)
+    with state.usage_matrix_lock:
+        version = get_usage_data_version(location_id)
+        if state.usage_matrix_cache["matrix"] is not None and state.usage_matrix_cache["version"] == version:
+            return state.usage_matrix_cache["matrix"]
+
+        print(f"Construyendo matriz de uso diario (local {location_id}, versión {version})...")
+        matrix = DailyUsageMatrix.from_usage_pages(iter_usage_pages(location_id=location_id))
+        matrix.version = _unchanged_version(location_id, version)
+        if matrix.version is not None:
+            state.usage_matrix_cache.update(version=version, matrix=matrix)
+        print(f"Matriz de uso: {matrix.values.shape[0]} ingredientes x {matrix.num_days} días")
+        return matrix
+
+def get_usage_rollups(usage_matrix=None, location_id=None):
+    """
+    Rollups de uso por ingrediente a nivel día, semana ISO y mes. Se construyen desde
+    la matriz de uso del local cuando cambia la versión de los datos y la ingesta los
+    actualiza de forma incremental.
+    """
+    state = location_state(location_id)
+    usage_matrix = usage_matrix or get_usage_matrix(location_id)
+    with state.usage_matrix_lock:
+        rollups = state.usage_rollups_cache["rollups"]
+        if usage_matrix.version is None:
+            return UsageRollups.from_matrix(usage_matrix)
+        if rollups is None or rollups.version != usage_matrix.version:
+            rollups = state.usage_rollups_cache["rollups"] = UsageRollups.from_matrix(usage_matrix)
+        return rollups
+
+class ReportContext:
+    """
+    Datos de una petición compartidos por todos los generadores de reportes.
+    Cada consulta e índice se calcula una sola vez, la primera vez que se usa;
+    los valores ya obtenidos pueden pasarse al construirlo (p. ej. usage_matrix).
+    Todas las consultas se limitan al local location_id.
+    """
+
+    def __init__(self, location_id=None, **preloaded):
+        self.location_id = location_id
+        self._values = dict(preloaded)
+        self._histories = {}
+
+    def _memo(self, key, compute):
+        if key not in self._values:
+            self._values[key] = compute()
+        return self._values[key]
+
+    @property
+    def items(self):
+        return self._memo('items', lambda: get_inventory_items(self.location_id))
+
+    @property
+    def ingredient_usage(self):
+        """Uso total por ingrediente (libro de stock)"""
+        def compute():
+            ledger = get_stock_ledger(self.location_id)
+            return {item['ingredient_id']: ledger.total_usage(item['ingredient_id']) for item in self.items}
+        return self._memo('ingredient_usage', compute)
+
+    @property
+    def usage_matrix(self):
+        return self._memo('usage_matrix', lambda: get_usage_matrix(self.location_id))
+
+    @property
+    def rollups(self):
+        return self._memo('rollups', lambda: get_usage_rollups(self.usage_matrix, self.location_id))
+
+    @property
+    def by_id(self):
+        return self._memo('by_id', lambda: {item['ingredient_id']: item for item in self.items})
+
+    @property
+    def by_unit(self):
+        def compute():
+            index = {}
+            for item in self.items:
+                index.setdefault(item['unit'], []).append(item)
+            return index
+        return self._memo('by_unit', compute)
+
+    def item(self, ingredient_id):
+        return self.by_id.get(ingredient_id)
+
+    def history(self, ingredient_id):
+        """Historial del ingrediente (build_ingredient_history), calculado una vez por petición"""
+        if ingredient_id not in self._histories:
+            item = self.item(ingredient_id)
+            self._histories[ingredient_id] = build_ingredient_history(item, self.rollups) if item else None
+        return self._histories[ingredient_id]
+
+    @property
+    def by_status(self):
+        """ingredient_id de los ingredientes con uso, agrupados por stock_status"""
+        def compute():
+            index = {}
+            for item in self.items:
+                history = self.history(item['ingredient_id'])
+                if history:
+                    index.setdefault(history['stock_status'], []).append(item['ingredient_id'])
+            return index
+        return self._memo('by_status', compute)
+
+# Columnas de un registro de uso, como las produce generate_orders
+USAGE_EVENT_FIELDS = ('order_id', 'order_item_id', 'food_id', 'ingredient_id', 'quantity_used', 'usage_date')
+REQUIRED_USAGE_EVENT_FIELDS = ('ingredient_id', 'quantity_used', 'usage_date')
+OPTIONAL_ID_FIELDS = ('order_id', 'order_item_id', 'food_id')
+
+# Filas por petición al insertar registros de uso
+INGEST_CHUNK_SIZE = int(os.getenv("USAGE_INGEST_CHUNK_SIZE", "1000"))
+
+# Funciones llamadas tras cada ingesta: callback(filas, versión anterior, versión nueva, local)
+_usage_listeners = []
+
+def register_usage_listener(callback):
+    """Registra una función que se llama con cada lote de uso ingerido"""
+    _usage_listeners.append(callback)
+    return callback
+
+def validate_usage_events(rows, known_ingredient_ids=None):
+    """
+    Valida en bloque registros de uso. Devuelve (filas normalizadas, errores); cada
+    error indica el índice de la fila y el motivo. Las fechas se normalizan a YYYY-MM-DD.
+    """
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return [], [{"index": None, "error": "Se esperaba una lista de registros"}]
+    if not rows:
+        return [], []
+
+    df = pd.DataFrame(rows)
+    errors = []
+    invalid = pd.Series(False, index=df.index)
+
+    def flag(mask, message):
+        nonlocal invalid
+        mask = mask & ~invalid
+        errors.extend({"index": int(index), "error": message} for index in df.index[mask])
+        invalid |= mask
+
+    for field in REQUIRED_USAGE_EVENT_FIELDS:
+        if field not in df:
+            df[field] = None
+        flag(df[field].isna(), f"Falta {field}")
+
+    ingredient_ids = pd.to_numeric(df['ingredient_id'], errors='coerce')
+    flag(ingredient_ids.isna() | (ingredient_ids % 1 != 0), "ingredient_id debe ser un entero")
+    if known_ingredient_ids is not None:
+        flag(~ingredient_ids.isin(list(known_ingredient_ids)), "ingredient_id no existe en el inventario")
+
+    quantities = pd.to_numeric(df['quantity_used'], errors='coerce')
+    flag(quantities.isna() | ~np.isfinite(quantities) | (quantities < 0),
+         "quantity_used debe ser un número mayor o igual a 0")
+
+    usage_dates = pd.to_datetime(df['usage_date'].astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    flag(usage_dates.isna(), "usage_date debe ser una fecha YYYY-MM-DD")
+
+    optional_ids = {}
+    for field in OPTIONAL_ID_FIELDS:
+        if field not in df:
+            continue
+        values = pd.to_numeric(df[field], errors='coerce')
+        flag(df[field].notna() & (values.isna() | (values % 1 != 0)), f"{field} debe ser un entero")
+        optional_ids[field] = values
+
+    if errors:
+        return [], sorted(errors, key=lambda error: error['index'])
+
+    columns = {
+        'ingredient_id': ingredient_ids.astype('int64').tolist(),
+        'quantity_used': quantities.astype('float64').tolist(),
+        'usage_date': usage_dates.dt.strftime('%Y-%m-%d').tolist()
+    }
+    for field, values in optional_ids.items():
+        columns[field] = [None if pd.isna(value) else int(value) for value in values.tolist()]
+
+    names = [field for field in USAGE_EVENT_FIELDS if field in columns]
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))], []
+
+def ingest_usage_events(rows, chunk_size=INGEST_CHUNK_SIZE, location_id=None):
+    """
+    Ingesta de registros de uso de un local: valida el lote completo contra el
+    inventario del local, lo inserta en lotes y en el mismo paso actualiza el libro
+    de stock, la matriz de uso y los listeners (monitor de uso, cachés de análisis).
+    Si alguna fila es inválida no se inserta nada.
+    """
+    state = location_state(location_id)
+    known_ingredient_ids = state.inventory_index.ids()
+    events, errors = validate_usage_events(rows, known_ingredient_ids)
+    if errors:
+        return {"accepted": 0, "errors": errors}
+    if not events:
+        return {"accepted": 0, "errors": []}
+
+    with state.ingest_lock:
+        # Asegura que los agregados en memoria correspondan a la versión actual
+        ledger = get_stock_ledger(location_id)
+        previous_version = ledger.version
+
+        statements = 0
+        try:
+            for start in range(0, len(events), chunk_size):
+                chunk = events[start:start + chunk_size]
+                if location_id is not None:
+                    chunk = [dict(event, location_id=location_id) for event in chunk]
+                supabase.table("ingredient_usage_table") \
+                    .insert(chunk, returning=ReturnMethod.minimal) \
+                    .execute()
+                statements += 1
+        except Exception:
+            # Parte del lote pudo quedar insertada: los agregados se recalculan en la próxima lectura
+            ledger.version = None
+            state.usage_matrix_cache.update(version=None, matrix=None)
+            state.usage_rollups_cache["rollups"] = None
+            raise
+
+        # Cada insert sube la versión en 1; si otro proceso escribió a la vez, la versión real
+        # no coincidirá y la próxima lectura recalcula los agregados
+        version = previous_version + statements if previous_version is not None else None
+        ingredient_count = _apply_usage_events(state, events, previous_version, version, location_id)
+
+    print(f"Ingesta de uso: {len(events)} registros de {ingredient_count} ingredientes "
+          f"(local {location_id}, versión {version})")
+    return {"accepted": len(events), "errors": [], "version": version}
+
+def apply_usage_events(events, previous_version, version, location_id=None):
+    """
+    Aplica a los agregados en memoria de este proceso un lote de uso que ya insertó
+    otro proceso (p. ej. la API, para los workers de análisis del local). Lo que no esté
+    en previous_version no se toca y se recalcula en su próxima lectura.
+    """
+    state = location_state(location_id)
+    with state.ingest_lock:
+        _apply_usage_events(state, events, previous_version, version, location_id)
+
+def _apply_usage_events(state, events, previous_version, version, location_id):
+    """
+    Suma un lote al libro de stock, la matriz y los rollups que estén en previous_version
+    y avisa a los listeners. Devuelve el número de ingredientes del lote.
+    """
+    usage_totals = pd.DataFrame(events).groupby('ingredient_id')['quantity_used'].sum()
+    ledger = state.stock_ledger
+    if previous_version is not None and ledger.version == previous_version:
+        for ingredient_id, quantity in usage_totals.items():
+            ledger.record_usage(int(ingredient_id), quantity)
+        ledger.version = version
+
+    with state.usage_matrix_lock:
+        matrix = state.usage_matrix_cache["matrix"]
+        if matrix is not None and previous_version is not None \
+                and state.usage_matrix_cache["version"] == previous_version:
+            state.usage_matrix_cache.update(version=version, matrix=matrix.with_usage_rows(events, version=version))
+        rollups = state.usage_rollups_cache["rollups"]
+        if rollups is not None and previous_version is not None and rollups.version == previous_version:
+            state.usage_rollups_cache["rollups"] = rollups.with_usage_rows(events, version=version)
+
+    for listener in _usage_listeners:
+        try:
+            listener(events, previous_version, version, location_id)
+        except Exception as e:
+            print(f"Error notificando la ingesta de uso: {e}")
+    return len(usage_totals)
+
+def generate_inventory_report(items, ingredient_usage, context=None, location_id=None):
     """
     Genera un informe detallado del inventario para análisis de AI
+    context (ReportContext) comparte los datos e índices ya obtenidos en la petición
     """
+    context = context or ReportContext(location_id, items=items, ingredient_usage=ingredient_usage)
     try:
         print("\n========= REPORTE DE INVENTARIO PARA ANÁLISIS DE AI =========\n")
         
@@ -149,10 +604,7 @@ def generate_inventory_report(items, ingredient_usage):
         
         # Análisis por unidades
         print("\n=== ANÁLISIS POR UNIDADES DE MEDIDA ===")
-        units_count = {}
-        for item in items:
-            unit = item['unit']
-            units_count[unit] = units_count.get(unit, 0) + 1
+        units_count = {unit: len(unit_items) for unit, unit_items in context.by_unit.items()}
         for unit, count in units_count.items():
             print(f"Ingredientes medidos en {unit}: {count}")
 
@@ -160,7 +612,7 @@ def generate_inventory_report(items, ingredient_usage):
         print("\n=== TOP 10 INGREDIENTES MÁS UTILIZADOS ===")
         sorted_usage = sorted(ingredient_usage.items(), key=lambda x: x[1], reverse=True)
         for ingredient_id, usage in sorted_usage[:10]:
-            item = next((item for item in items if item['ingredient_id'] == ingredient_id), None)
+            item = context.item(ingredient_id)
             if item:
                 print(f"- {item['ingredient_name']}: {usage} {item['unit']}")
 
@@ -185,16 +637,13 @@ def generate_inventory_report(items, ingredient_usage):
         for item in critical_stock:
             print(f"- {item['name']}: {item['available']} {item['unit']} disponibles")
 
-        # Análisis temporal de uso
+        # Análisis temporal de uso (desde el rollup diario, sin releer los registros)
         print("\n=== ANÁLISIS TEMPORAL DE USO ===")
         for item in items[:5]:  # Analizamos los primeros 5 ingredientes como muestra
             ingredient_id = item['ingredient_id']
-            usage_data = get_ingredient_usage(ingredient_id, 0)
+            daily_usage = context.rollups.daily_usage(ingredient_id)
             
-            if usage_data:
-                df = pd.DataFrame(usage_data)
-                df['usage_date'] = pd.to_datetime(df['usage_date'])
-                daily_usage = df.groupby('usage_date')['quantity_used'].sum()
+            if not daily_usage.empty:
                 
                 print(f"\nIngrediente: {item['ingredient_name']}")
                 print(f"Días con registros de uso: {len(daily_usage)}")
@@ -230,95 +679,116 @@ def generate_inventory_report(items, ingredient_usage):
         print(f"Tipo de error: {type(e).__name__}")
         return None
 
-def generate_ingredient_history_report(items, ingredient_usage):
+def build_ingredient_history(item, rollups=None):
     """
-    Genera un reporte histórico detallado para cada ingrediente
+    Historial de uso y estado del stock de un ingrediente a partir del rollup diario
+    (sin rollups, los del local de la fila). Devuelve None si el ingrediente no tiene uso registrado.
     """
-    try:
-        print("\n=== GENERANDO HISTÓRICO DE USO POR INGREDIENTE ===")
-        
-        all_ingredients_history = {}
-        
-        for item in items:
-            try:
-                ingredient_id = item['ingredient_id']
-                ingredient_name = item['ingredient_name']
-                unit = item['unit']
-                total_stock = item['total_stock']
-                safe_factor = item['safe_factor']
-                
-                print(f"\nProcesando ingrediente: {ingredient_name} (ID: {ingredient_id})")
+    rollups = rollups or get_usage_rollups(location_id=item.get('location_id'))
+    daily_usage = rollups.daily_usage(item['ingredient_id'])
+    if daily_usage.empty:
+        return None
+
+    total_stock = item['total_stock']
+    safe_factor = item['safe_factor']
+
+    # Crear diccionario con el historial del ingrediente
+    ingredient_history = {
+        'ingredient_name': item['ingredient_name'],
+        'ingredient_id': item['ingredient_id'],
+        'unit': item['unit'],
+        'total_stock': float(total_stock),
+        'safe_factor': float(safe_factor),
+        'usage_history': {
+            str(date.date()): float(quantity)
+            for date, quantity in daily_usage.items()
+        },
+        'total_usage': float(daily_usage.sum()),
+        'average_daily_usage': float(daily_usage.mean()),
+        'max_daily_usage': float(daily_usage.max()),
+        'days_with_usage': len(daily_usage),
+        'first_usage_date': str(daily_usage.index.min().date()),
+        'last_usage_date': str(daily_usage.index.max().date())
+    }
+
+    # Calcular stock actual y estado
+    current_stock = total_stock - float(daily_usage.sum())
+    safe_threshold = total_stock * (safe_factor / 100)
+
+    # Agregar información de estado del stock
+    ingredient_history['current_stock'] = float(current_stock)
+    ingredient_history['safe_threshold'] = float(safe_threshold)
+    ingredient_history['stock_status'] = stock_status(current_stock, total_stock, safe_threshold)
+    return ingredient_history
+
+def build_ingredient_history_report(items, ingredient_usage, context=None, location_id=None):
+    """
+    Construye el reporte histórico detallado de cada ingrediente, sin escribir archivos
+    context (ReportContext) comparte los datos e índices ya obtenidos en la petición
+    """
+    context = context or ReportContext(location_id, items=items, ingredient_usage=ingredient_usage)
+    print("\n=== GENERANDO HISTÓRICO DE USO POR INGREDIENTE ===")
+    
+    all_ingredients_history = {}
+    
+    for item in items:
+        try:
+            ingredient_id = item['ingredient_id']
+            ingredient_name = item['ingredient_name']
+            unit = item['unit']
+            safe_factor = item['safe_factor']
+            
+            print(f"\nProcesando ingrediente: {ingredient_name} (ID: {ingredient_id})")
+            
+            # Obtener historial de uso (rollup diario)
+            ingredient_history = context.history(ingredient_id) if context.item(ingredient_id) \
+                else build_ingredient_history(item, context.rollups)
+            
+            if ingredient_history:
+                all_ingredients_history[ingredient_id] = ingredient_history
                 
-                # Obtener historial de uso
-                usage_data = get_ingredient_usage(ingredient_id, 0)
+                print(f"✓ Historial procesado: {ingredient_history['days_with_usage']} días de uso registrados")
+                print(f"  Stock actual: {ingredient_history['current_stock']:.2f} {unit}")
+                print(f"  Límite seguro ({safe_factor}%): {ingredient_history['safe_threshold']:.2f} {unit}")
+                print(f"  Estado: {ingredient_history['stock_status'].upper()}")
+            else:
+                print("✗ No se encontraron datos de uso")
                 
-                if usage_data:
-                    df = pd.DataFrame(usage_data)
-                    df['usage_date'] = pd.to_datetime(df['usage_date'])
-                    daily_usage = df.groupby('usage_date')['quantity_used'].sum()
-                    
-                    # Crear diccionario con el historial del ingrediente
-                    ingredient_history = {
-                        'ingredient_name': ingredient_name,
-                        'ingredient_id': ingredient_id,
-                        'unit': unit,
-                        'total_stock': float(total_stock),
-                        'safe_factor': float(safe_factor),
-                        'usage_history': {
-                            str(date.date()): float(quantity)
-                            for date, quantity in daily_usage.items()
-                        },
-                        'total_usage': float(daily_usage.sum()),
-                        'average_daily_usage': float(daily_usage.mean()),
-                        'max_daily_usage': float(daily_usage.max()),
-                        'days_with_usage': len(daily_usage),
-                        'first_usage_date': str(daily_usage.index.min().date()),
-                        'last_usage_date': str(daily_usage.index.max().date())
-                    }
-                    
-                    # Calcular stock actual y estado
-                    current_stock = total_stock - float(daily_usage.sum())
-                    safe_threshold = total_stock * (safe_factor / 100)
-                    
-                    # Agregar información de estado del stock
-                    ingredient_history['current_stock'] = float(current_stock)
-                    ingredient_history['safe_threshold'] = float(safe_threshold)
-                    ingredient_history['stock_status'] = (
-                        'critical' if current_stock < safe_threshold
-                        else 'warning' if current_stock < (total_stock * 0.3)
-                        else 'good'
-                    )
-                    
-                    all_ingredients_history[ingredient_id] = ingredient_history
-                    
-                    print(f"✓ Historial procesado: {len(daily_usage)} días de uso registrados")
-                    print(f"  Stock actual: {current_stock:.2f} {unit}")
-                    print(f"  Límite seguro ({safe_factor}%): {safe_threshold:.2f} {unit}")
-                    print(f"  Estado: {ingredient_history['stock_status'].upper()}")
-                else:
-                    print("✗ No se encontraron datos de uso")
-                    
-            except Exception as e:
-                print(f"Error procesando ingrediente {item.get('ingredient_name', 'desconocido')}: {e}")
-                continue
-        
-        # Guardar el historial en un archivo JSON
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        report_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-            "lib", "backend", "inventory_data",
-            datetime.now().strftime('%Y-%m-%d')
-        )
-        os.makedirs(report_path, exist_ok=True)
-        report_file = os.path.join(report_path, f"ingredients_history_{timestamp}.json")
-        
-        print(f"\nGuardando historial en: {report_file}")
-        
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(all_ingredients_history, f, ensure_ascii=False, indent=2)
-        
-        print(f"✓ Historial guardado exitosamente")
-        
+        except Exception as e:
+            print(f"Error procesando ingrediente {item.get('ingredient_name', 'desconocido')}: {e}")
+            continue
+    
+    return all_ingredients_history
+
+def save_ingredient_history_report(all_ingredients_history, location_id=None):
+    """Guarda el historial de ingredientes en un archivo JSON y devuelve su ruta"""
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    report_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "lib", "backend", "inventory_data",
+        *([f"location_{location_id}"] if location_id is not None else []),
+        datetime.now().strftime('%Y-%m-%d')
+    )
+    os.makedirs(report_path, exist_ok=True)
+    report_file = os.path.join(report_path, f"ingredients_history_{timestamp}.json")
+    
+    print(f"\nGuardando historial en: {report_file}")
+    
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(all_ingredients_history, f, ensure_ascii=False, indent=2)
+    
+    print(f"✓ Historial guardado exitosamente")
+    return report_file
+
+def generate_ingredient_history_report(items, ingredient_usage, context=None, location_id=None):
+    """
+    Genera el reporte histórico detallado de cada ingrediente y lo guarda en un archivo JSON
+    context (ReportContext) comparte los datos e índices ya obtenidos en la petición
+    """
+    context = context or ReportContext(location_id, items=items, ingredient_usage=ingredient_usage)
+    try:
+        all_ingredients_history = build_ingredient_history_report(items, ingredient_usage, context)
+        save_ingredient_history_report(all_ingredients_history, context.location_id)
         return all_ingredients_history
         
     except Exception as e:
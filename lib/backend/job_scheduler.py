@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Segundos de espera tras una ingesta antes de refrescar (agrupa lotes seguidos en una sola corrida)
+USAGE_JOB_DELAY_SECONDS = float(os.getenv("USAGE_JOB_DELAY_SECONDS", "10"))
+
+# Tareas que pueden ejecutarse a la vez (de distintos trabajos o locales)
+SCHEDULER_THREADS = int(os.getenv("SCHEDULER_THREADS", "2"))
+
+# Locales para los trabajos de arranque y programados ("" = instalación de un solo restaurante)
+SCHEDULED_LOCATIONS = [int(location_id) for location_id in os.getenv("SCHEDULED_LOCATIONS", "").split(',')
+                       if location_id.strip()] or [None]
+
+# Cada cuántos segundos un planificador con líder renueva o intenta tomar el liderazgo
+LEADER_CHECK_SECONDS = float(os.getenv("SCHEDULER_LEADER_CHECK_SECONDS", "10"))
+
+# Rango de valores de cada campo cron: minuto, hora, día del mes, mes, día de la semana (0 = domingo)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+def _parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        value_range, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if value_range == '*':
+            start, end = low, high
+        elif '-' in value_range:
+            start, end = (int(value) for value in value_range.split('-'))
+        else:
+            start = int(value_range)
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Campo cron fuera de rango: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    """Expresión cron de 5 campos (minuto hora día mes día-semana) con *, listas, rangos y pasos"""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+        )
+        # Como en cron, si día del mes y día de la semana están restringidos basta con que coincida uno
+        self._any_day = fields[2] == '*' or fields[4] == '*'
+
+    def matches(self, moment):
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_matches = moment.day in self.days
+        weekday_matches = (moment.weekday() + 1) % 7 in self.weekdays
+        return day_matches and weekday_matches if self._any_day else day_matches or weekday_matches
+
+    def next_after(self, moment):
+        """Próximo minuto posterior a moment que cumple la expresión"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Un año y un día cubre cualquier expresión satisfacible
+        for _ in range(366 * 24 * 60):
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"La expresión cron nunca se cumple: {self.expression}")
+
+class ScheduledJob:
+    """Trabajo del planificador: fn(location_id) y sus disparadores"""
+
+    def __init__(self, name, fn, cron=None, on_startup=False, on_usage=False):
+        self.name = name
+        self.fn = fn
+        self.schedule = CronSchedule(cron) if cron else None
+        self.on_startup = on_startup
+        self.on_usage = on_usage
+        self.next_run = None
+        # Estado de la última corrida por local
+        self.runs = {}
+
+class JobScheduler:
+    """
+    Planificador en proceso que precalcula resultados fuera de las peticiones.
+    Cada trabajo se ejecuta por local y puede dispararse al arrancar, según una
+    expresión cron o tras una ingesta de uso (con una espera que agrupa lotes
+    seguidos). Un trabajo que ya está corriendo para un local no se lanza dos veces:
+    la petición queda pendiente y se ejecuta al terminar. status() expone la última
+    corrida, su duración y su error de cada trabajo y local.
+    Con leader (función sin argumentos que devuelve True si este proceso es el líder),
+    solo el proceso líder ejecuta trabajos; los demás descartan lo que se les encole,
+    salvo las corridas pedidas con run_now.
+    Los trabajos de arranque corren al tomar el liderazgo.
+    """
+
+    def __init__(self, locations=None, usage_delay=USAGE_JOB_DELAY_SECONDS, threads=SCHEDULER_THREADS,
+                 leader=None):
+        self.usage_delay = usage_delay
+        self.leader = leader
+        self.leading = leader is None
+        self._leader_checked_at = None
+        self._locations = list(locations if locations is not None else SCHEDULED_LOCATIONS)
+        self._jobs = {}
+        self._pending = {}
+        self._manual = set()
+        self._running = set()
+        self._rerun = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scheduler")
+
+    def add_job(self, name, fn, cron=None, on_startup=False, on_usage=False):
+        job = ScheduledJob(name, fn, cron, on_startup, on_usage)
+        with self._lock:
+            self._jobs[name] = job
+        return job
+
+    def job(self, name, cron=None, on_startup=False, on_usage=False):
+        """Decorador equivalente a add_job"""
+        def register(fn):
+            self.add_job(name, fn, cron, on_startup, on_usage)
+            return fn
+        return register
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Arranca el hilo del planificador y encola los trabajos de arranque"""
+        if self.running:
+            return
+        self._stopping.clear()
+        now = datetime.now()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.schedule:
+                    job.next_run = job.schedule.next_after(now)
+        if self.leader is None:
+            self._queue_startup_jobs()
+        self._thread = threading.Thread(target=self._loop, name="job-scheduler", daemon=True)
+        self._thread.start()
+
+    def _queue_startup_jobs(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.on_startup:
+                    for location_id in self._locations:
+                        self._pending[(job.name, location_id)] = time.monotonic()
+
+    def _check_leader(self):
+        """Renueva o intenta tomar el liderazgo cada LEADER_CHECK_SECONDS"""
+        monotonic_now = time.monotonic()
+        if self._leader_checked_at is not None and monotonic_now - self._leader_checked_at < LEADER_CHECK_SECONDS:
+            return
+        self._leader_checked_at = monotonic_now
+        try:
+            leading = bool(self.leader())
+        except Exception as e:
+            print(f"Error verificando el liderazgo del planificador: {e}")
+            leading = False
+        if leading and not self.leading:
+            self.leading = True
+            self._queue_startup_jobs()
+        self.leading = leading
+
+    def stop(self, wait=True):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=wait)
+
+    def notify_usage(self, location_id=None):
+        """Avisa que llegó uso nuevo del local: los trabajos on_usage corren tras usage_delay segundos"""
+        due = time.monotonic() + self.usage_delay
+        with self._lock:
+            if location_id not in self._locations:
+                self._locations.append(location_id)
+            for job in self._jobs.values():
+                if job.on_usage:
+                    # Una ingesta posterior no retrasa una corrida ya programada
+                    self._pending.setdefault((job.name, location_id), due)
+        self._wake.set()
+
+    def run_now(self, name, location_id=None):
+        """Encola una corrida inmediata de un trabajo; KeyError si no existe"""
+        with self._lock:
+            if name not in self._jobs:
+                raise KeyError(name)
+            self._pending[(name, location_id)] = time.monotonic()
+            self._manual.add((name, location_id))
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            # Se limpia antes de revisar: un aviso que llegue durante la revisión no se pierde
+            self._wake.clear()
+            if self.leader is not None:
+                self._check_leader()
+            now = datetime.now()
+            with self._lock:
+                if not self.leading:
+                    # Los trabajos los ejecuta el proceso líder
+                    self._pending = {key: due_at for key, due_at in self._pending.items() if key in self._manual}
+                for job in self._jobs.values():
+                    if job.next_run is not None and job.next_run <= now:
+                        if self.leading:
+                            for location_id in self._locations:
+                                self._pending.setdefault((job.name, location_id), time.monotonic())
+                        job.next_run = job.schedule.next_after(now)
+
+                monotonic_now = time.monotonic()
+                due = [key for key, due_at in self._pending.items() if due_at <= monotonic_now]
+                for key in due:
+                    del self._pending[key]
+                    self._manual.discard(key)
+                    if key in self._running:
+                        self._rerun.add(key)
+                    else:
+                        self._running.add(key)
+                        self._executor.submit(self._run, *key)
+
+                # Dormir hasta el próximo minuto, la próxima corrida pendiente o un aviso
+                timeout = 60 - now.second - now.microsecond / 1e6
+                if self._pending:
+                    timeout = min(timeout, max(0.0, min(self._pending.values()) - monotonic_now))
+                if self.leader is not None:
+                    timeout = min(timeout, LEADER_CHECK_SECONDS)
+            self._wake.wait(timeout)
+
+    def _run(self, name, location_id):
+        job = self._jobs[name]
+        run = {"status": "running", "started_at": datetime.now().isoformat(), "finished_at": None,
+               "duration_seconds": None, "error": None, "result": None}
+        with self._lock:
+            previous = job.runs.get(location_id, {})
+            run["runs"] = previous.get("runs", 0)
+            run["last_success_at"] = previous.get("last_success_at")
+            job.runs[location_id] = run
+        started = time.monotonic()
+        try:
+            result = job.fn(location_id)
+            run.update(status="success", result=result, last_success_at=datetime.now().isoformat())
+        except Exception as e:
+            print(f"Error en el trabajo {name} (local {location_id}): {e}")
+            run.update(status="error", error=f"{type(e).__name__}: {e}")
+        finally:
+            run.update(
+                finished_at=datetime.now().isoformat(),
+                duration_seconds=round(time.monotonic() - started, 3),
+                runs=run["runs"] + 1
+            )
+            with self._lock:
+                self._running.discard((name, location_id))
+                if (name, location_id) in self._rerun:
+                    self._rerun.discard((name, location_id))
+                    self._pending[(name, location_id)] = time.monotonic()
+            self._wake.set()
+
+    def status(self):
+        """Estado de cada trabajo: disparadores, próxima corrida y última corrida por local"""
+        with self._lock:
+            return [
+                {
+                    "name": job.name,
+                    "cron": job.schedule.expression if job.schedule else None,
+                    "on_startup": job.on_startup,
+                    "on_usage": job.on_usage,
+                    "next_run": job.next_run.isoformat() if job.next_run else None,
+                    "pending": sorted(
+                        (location_id for name, location_id in self._pending if name == job.name),
+                        key=lambda location_id: (location_id is not None, location_id or 0)
+                    ),
+                    "locations": [
+                        {"location_id": location_id, **dict(run)}
+                        for location_id, run in job.runs.items()
+                    ]
+                }
+                for job in self._jobs.values()
+            ]
@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Procesos de análisis entre los que se reparten los locales (0 = todo en el proceso de la API)
+LOCATION_WORKERS = int(os.getenv("LOCATION_WORKERS", "0"))
+
+# True dentro de los procesos de análisis (los crea el pool con _mark_worker_process)
+_worker_process = False
+
+def _mark_worker_process():
+    global _worker_process
+    _worker_process = True
+
+def in_worker_process():
+    """True si el código se ejecuta en un proceso de análisis y no en el de la API"""
+    return _worker_process
+
+def location_shard(location_id, num_shards):
+    """
+    Shard de un local. Es estable entre procesos y reinicios (hash() de str no lo es),
+    así que un local siempre cae en el mismo worker.
+    """
+    return zlib.crc32(str(location_id).encode()) % num_shards
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error en una tarea del worker de análisis: {future.exception()}")
+
+class LocationWorkerPool:
+    """
+    Reparte los locales entre procesos de un solo worker. Las tareas pesadas de un
+    local (dashboard, pronósticos, simulaciones) se ejecutan siempre en el proceso de
+    su shard, que conserva en memoria la matriz de uso y las cachés de ese local; un
+    análisis lento solo hace esperar a los locales de su mismo shard y nunca bloquea
+    el bucle de eventos de la API. Con workers=0 las tareas se ejecutan en el proceso
+    de la API (run las pasa al pool de hilos del bucle de eventos).
+    """
+
+    def __init__(self, workers=LOCATION_WORKERS):
+        self.workers = workers
+        self._executors = [None] * workers
+        self._lock = threading.Lock()
+
+    def _executor(self, shard):
+        with self._lock:
+            executor = self._executors[shard]
+            if executor is None:
+                # spawn: los procesos no heredan los hilos ni las conexiones abiertas de la API
+                executor = self._executors[shard] = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_mark_worker_process
+                )
+            return executor
+
+    def _discard(self, shard, executor):
+        """Descarta el executor de un shard cuyo proceso murió; el siguiente uso crea uno nuevo"""
+        with self._lock:
+            if self._executors[shard] is executor:
+                self._executors[shard] = None
+        executor.shutdown(wait=False)
+
+    async def run(self, location_id, fn, *args, **kwargs):
+        """
+        Ejecuta fn(*args, **kwargs) en el worker del local. fn debe ser una función de
+        nivel de módulo, y sus argumentos y resultado deben poder serializarse con pickle.
+        """
+        if not self.workers:
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+        shard = location_shard(location_id, self.workers)
+        executor = self._executor(shard)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(fn, *args, **kwargs)
+            )
+        except BrokenProcessPool:
+            self._discard(shard, executor)
+            raise
+
+    def call(self, location_id, fn, *args, **kwargs):
+        """Como run, pero bloqueante: para hilos fuera del bucle de eventos (p. ej. el planificador)"""
+        if not self.workers:
+            return fn(*args, **kwargs)
+        shard = location_shard(location_id, self.workers)
+        executor = self._executor(shard)
+        try:
+            return executor.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            self._discard(shard, executor)
+            raise
+
+    def submit(self, location_id, fn, *args, **kwargs):
+        """
+        Encola fn en el worker del local sin esperar el resultado; los errores se registran.
+        Las tareas de un local se ejecutan en el orden en que se encolan.
+        """
+        if not self.workers:
+            return fn(*args, **kwargs)
+        shard = location_shard(location_id, self.workers)
+        executor = self._executor(shard)
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._discard(shard, executor)
+            raise
+        future.add_done_callback(_log_failure)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            executors, self._executors = self._executors, [None] * self.workers
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
@@ -0,0 +1,31 @@
+# Catálogo del menú: receta (bill of materials) y precio de cada platillo.
+# Lo comparten el generador de datos y el pronóstico de demanda por platillo.
+
+FOOD_INGREDIENTS = {
+    1: [(1, 150.0), (2, 50.0), (3, 30.0)],  # Food 1 usa ingredientes 1, 2, 3
+    2: [(6, 70.0), (7, 30.0), (8, 10.0)],   # Food 2 usa ingredientes 6, 7, 8
+    3: [(4, 200.0), (5, 50.0)],             # Food 3 usa ingredientes 4, 5
+    4: [(9, 250.0), (12, 70.0)],            # Food 4 usa ingredientes 9, 12
+    5: [(10, 120.0), (11, 50.0)],           # Food 5 usa ingredientes 10, 11
+    6: [(13, 100.0), (14, 40.0)],           # Food 6 usa ingredientes 13, 14
+    7: [(19, 120.0), (20, 50.0)],           # Food 7 usa ingredientes 19, 20
+    8: [(15, 200.0), (16, 60.0)],           # Food 8 usa ingredientes 15, 16
+    9: [(17, 100.0), (18, 40.0)],           # Food 9 usa ingredientes 17, 18
+    10: [(15, 200.0), (16, 60.0)]           # Food 10 usa ingredientes 15, 16
+}
+
+# Definir patrones de uso por día de la semana (multiplicadores)
+WEEKDAY_PATTERNS = {
+    0: 0.7,  # Lunes
+    1: 0.8,  # Martes
+    2: 0.9,  # Miércoles
+    3: 1.0,  # Jueves
+    4: 1.3,  # Viernes
+    5: 1.5,  # Sábado
+    6: 1.2   # Domingo
+}
+
+FOOD_PRICES = {
+    1: 25.00, 2: 18.50, 3: 20.50, 4: 28.75, 5: 12.00,
+    6: 20.00, 7: 29.50, 8: 36.60, 9: 12.20, 10: 30.00
+}
@@ -1,9 +1,18 @@
 from supabase import create_client, Client
+from postgrest import ReturnMethod
 import os
 from dotenv import load_dotenv
 import random
+import numpy as np
 from datetime import datetime, timedelta
 import json
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
+from generated_data_export import ExportWriter, EXPORT_FORMATS, replay_export
+from menu_catalog import FOOD_INGREDIENTS, FOOD_PRICES, WEEKDAY_PATTERNS
 
 # Cargar variables de entorno
 load_dotenv()
@@ -13,39 +22,36 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_ANON_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
 
-# Configuración de datos
-FOOD_INGREDIENTS = {
-    1: [(1, 150.0), (2, 50.0), (3, 30.0)],  # Food 1 usa ingredientes 1, 2, 3
-    2: [(6, 70.0), (7, 30.0), (8, 10.0)],   # Food 2 usa ingredientes 6, 7, 8
-    3: [(4, 200.0), (5, 50.0)],             # Food 3 usa ingredientes 4, 5
-    4: [(9, 250.0), (12, 70.0)],            # Food 4 usa ingredientes 9, 12
-    5: [(10, 120.0), (11, 50.0)],           # Food 5 usa ingredientes 10, 11
-    6: [(13, 100.0), (14, 40.0)],           # Food 6 usa ingredientes 13, 14
-    7: [(19, 120.0), (20, 50.0)],           # Food 7 usa ingredientes 19, 20
-    8: [(15, 200.0), (16, 60.0)],           # Food 8 usa ingredientes 15, 16
-    9: [(17, 100.0), (18, 40.0)],           # Food 9 usa ingredientes 17, 18
-    10: [(15, 200.0), (16, 60.0)]           # Food 10 usa ingredientes 15, 16
-}
+# Filas por petición en las inserciones masivas
+DEFAULT_CHUNK_SIZE = int(os.getenv("POPULATE_CHUNK_SIZE", "1000"))
+
+PAYMENT_METHODS = ['Tarjeta', 'Efectivo']
+ORDER_STATUS = ['Completada', 'Pendiente', 'Cancelada']
+STATUS_WEIGHTS = [0.7, 0.2, 0.1]  # 70% Completada, 20% Pendiente, 10% Cancelada
 
-# Definir patrones de uso por día de la semana (multiplicadores)
-WEEKDAY_PATTERNS = {
-    0: 0.7,  # Lunes
-    1: 0.8,  # Martes
-    2: 0.9,  # Miércoles
-    3: 1.0,  # Jueves
-    4: 1.3,  # Viernes
-    5: 1.5,  # Sábado
-    6: 1.2   # Domingo
+# Columna de conflicto de cada tabla para los upserts que ignoran duplicados
+CONFLICT_KEYS = {
+    'order_table': 'order_id',
+    'order_items_table': 'order_item_id',
+    'ingredient_usage_table': 'id'
 }
 
-FOOD_PRICES = {
-    1: 25.00, 2: 18.50, 3: 20.50, 4: 28.75, 5: 12.00,
-    6: 20.00, 7: 29.50, 8: 36.60, 9: 12.20, 10: 30.00
+# Reintentos de cada petición ante errores transitorios
+DEFAULT_RETRIES = int(os.getenv("POPULATE_RETRIES", "5"))
+
+# Códigos de error (PostgREST, Postgres y HTTP) que se consideran transitorios
+TRANSIENT_ERROR_CODES = {
+    'PGRST000', 'PGRST001', 'PGRST002',  # Sin conexión con la base de datos
+    '40001', '40P01',                    # Serialización / deadlock
+    '53300', '57014', '57P01',           # Demasiadas conexiones / cancelación / apagado
+    '408', '429', '500', '502', '503', '504'
 }
 
-PAYMENT_METHODS = ['Tarjeta', 'Efectivo']
-ORDER_STATUS = ['Completada', 'Pendiente', 'Cancelada']
-STATUS_WEIGHTS = [0.7, 0.2, 0.1]  # 70% Completada, 20% Pendiente, 10% Cancelada
+# Marcador de ID ausente en las columnas NumPy (se exporta como None)
+MISSING_ID = -1
+
+# Primeros IDs (orden, item, cliente, uso) cuando solo se genera (--no-load): no se reserva nada en la base de datos
+LOCAL_ID_START = (1, 1, 1, 1)
 
 NOTES = [
     'Sin cebolla', 'Con extra aguacate', 'Sin salsa picante', 'Con doble carne',
@@ -80,6 +86,27 @@ def get_max_ids():
         # Usar valores por defecto altos si hay error
         return 50000, 50000, 50000
 
+def reserve_id_blocks(num_orders, num_order_items, num_customers, num_usage_rows):
+    """
+    Reserva rangos de IDs no solapados para órdenes, items, clientes y registros de uso
+    en una sola llamada. Usa la función reserve_id_blocks de la base de datos
+    (sql/reserve_id_blocks.sql), que serializa las reservas concurrentes. Devuelve el
+    primer ID de cada rango.
+    """
+    params = {
+        'p_orders': int(num_orders),
+        'p_order_items': int(num_order_items),
+        'p_customers': int(num_customers),
+        'p_usage_rows': int(num_usage_rows)
+    }
+    # Un reintento tras un timeout ambiguo solo deja un hueco de IDs, nunca un solapamiento
+    response = with_retries(supabase.rpc('reserve_id_blocks', params).execute)
+    if not response.data:
+        raise RuntimeError("reserve_id_blocks no devolvió ningún bloque de IDs")
+    block = response.data[0]
+    return (block['order_id_start'], block['order_item_id_start'], block['customer_id_start'],
+            block['usage_id_start'])
+
 def generate_orders(start_date, end_date):
     current_date = start_date
     # Obtener IDs iniciales seguros
@@ -179,46 +206,250 @@ def generate_orders(start_date, end_date):
     
     return orders, order_items, ingredient_usage
 
-def insert_data_to_supabase(orders, order_items, ingredient_usage):
+def _build_bom_arrays():
+    """Aplana FOOD_INGREDIENTS en arreglos tipo CSR indexados por food_id"""
+    max_food_id = max(FOOD_INGREDIENTS)
+    counts = np.zeros(max_food_id + 1, dtype=np.int64)
+    ingredient_ids = []
+    base_quantities = []
+    for food_id in range(max_food_id + 1):
+        ingredients = FOOD_INGREDIENTS.get(food_id, [])
+        counts[food_id] = len(ingredients)
+        for ingredient_id, base_quantity in ingredients:
+            ingredient_ids.append(ingredient_id)
+            base_quantities.append(base_quantity)
+
+    offsets = np.zeros(max_food_id + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)[:-1]
+    return counts, offsets, np.array(ingredient_ids, dtype=np.int64), np.array(base_quantities)
+
+def _explode_bom(food_ids, counts, offsets):
+    """
+    Expande cada fila a una fila por ingrediente de su platillo.
+    Devuelve el índice de la fila de origen y la posición dentro de los arreglos del BOM.
+    """
+    per_row = counts[food_ids]
+    source_rows = np.repeat(np.arange(len(food_ids)), per_row)
+    group_starts = np.repeat(np.cumsum(per_row) - per_row, per_row)
+    within_group = np.arange(per_row.sum()) - group_starts
+    return source_rows, offsets[food_ids][source_rows] + within_group
+
+def generate_orders_vectorized(start_date, end_date, seed=None, id_start=None, locations=None):
+    """
+    Versión vectorizada de generate_orders con NumPy.
+    Devuelve órdenes, items y uso de ingredientes como diccionarios de columnas (arreglos),
+    reproducibles para una misma semilla. Si se pasan locations, se generan órdenes
+    para cada local y las filas incluyen la columna location_id.
+    Sin id_start, los rangos de IDs se reservan con reserve_id_blocks.
+    """
+    rng = np.random.default_rng(seed)
+
+    days = np.arange(
+        np.datetime64(start_date.date()),
+        np.datetime64(end_date.date()) + 1,
+        dtype='datetime64[D]'
+    )
+    # 1970-01-01 fue jueves (weekday 3)
+    weekdays = (days.astype(np.int64) + 3) % 7
+    weekday_factors = np.array([WEEKDAY_PATTERNS[day] for day in range(7)])
+
+    location_ids = np.asarray(locations) if locations is not None else None
+    num_locations = len(location_ids) if location_ids is not None else 1
+
+    # Un "slot" es un par (día, local)
+    num_slots = len(days) * num_locations
+    slot_day = np.repeat(np.arange(len(days)), num_locations)
+    slot_location = np.tile(np.arange(num_locations), len(days))
+
+    # Órdenes por día según el patrón semanal (misma regla que get_daily_order_count)
+    base_orders = rng.integers(8, 16, size=num_slots)
+    orders_per_slot = (base_orders * weekday_factors[weekdays[slot_day]]).astype(np.int64)
+    num_orders = int(orders_per_slot.sum())
+    order_slot = np.repeat(np.arange(num_slots), orders_per_slot)
+
+    hours = rng.integers(8, 23, size=num_orders)
+    minutes = rng.integers(0, 60, size=num_orders)
+    order_dates = (
+        days[slot_day[order_slot]].astype('datetime64[s]')
+        + (hours * 3600 + minutes * 60).astype('timedelta64[s]')
+    )
+
+    status_weights = np.array(STATUS_WEIGHTS)
+    status_idx = rng.choice(len(ORDER_STATUS), size=num_orders, p=status_weights / status_weights.sum())
+    payment_idx = rng.integers(0, len(PAYMENT_METHODS), size=num_orders)
+    note_idx = rng.integers(0, len(NOTES), size=num_orders)
+
+    # Items (1-4 por orden)
+    items_per_order = rng.integers(1, 5, size=num_orders)
+    item_order = np.repeat(np.arange(num_orders), items_per_order)
+    num_items = len(item_order)
+
+    # generate_orders sortea pesos i.i.d. uniform(0.8, 1.2) por item antes de elegir el platillo;
+    # por simetría la distribución resultante es uniforme, así que se sortea directamente.
+    food_catalog = np.array(sorted(FOOD_PRICES), dtype=np.int64)
+    food_ids = food_catalog[rng.integers(0, len(food_catalog), size=num_items)]
+    quantities = rng.integers(1, 4, size=num_items)
+    price_lookup = np.zeros(food_catalog.max() + 1)
+    price_lookup[food_catalog] = [FOOD_PRICES[food_id] for food_id in food_catalog]
+    prices = price_lookup[food_ids]
+    total_prices = prices * quantities
+    variations = rng.uniform(0.9, 1.1, size=num_items)
+
+    total_amounts = np.bincount(item_order, weights=total_prices, minlength=num_orders)
+
+    # Uso de ingredientes de órdenes no canceladas
+    counts, offsets, bom_ingredients, bom_quantities = _build_bom_arrays()
+    cancelled = ORDER_STATUS.index('Cancelada')
+    active_items = np.flatnonzero(status_idx[item_order] != cancelled)
+    source_rows, bom_pos = _explode_bom(food_ids[active_items], counts, offsets)
+    usage_items = active_items[source_rows]
+    usage_orders = item_order[usage_items]
+
+    # Mermas: 30% de los días, 50% por platillo, 5-15% de la cantidad base
+    waste_day = rng.random(num_slots) < 0.3
+    waste_food = rng.random((num_slots, len(food_catalog))) < 0.5
+    waste_slots, waste_cols = np.nonzero(waste_day[:, None] & waste_food)
+    waste_source, waste_pos = _explode_bom(food_catalog[waste_cols], counts, offsets)
+    waste_slots = waste_slots[waste_source]
+    waste_amounts = bom_quantities[waste_pos] * rng.uniform(0.05, 0.15, size=len(waste_pos))
+
+    usage_slots = np.concatenate([order_slot[usage_orders], waste_slots])
+    missing = np.full(len(waste_pos), MISSING_ID, dtype=np.int64)
+    # Ordenar por día (estable) para que mermas y consumo del mismo día queden juntos
+    usage_order = np.argsort(slot_day[usage_slots], kind='stable')
+    usage_slots = usage_slots[usage_order]
+    num_usage_rows = len(usage_slots)
+
+    if id_start is None:
+        id_start = reserve_id_blocks(num_orders, num_items, num_orders, num_usage_rows)
+    order_id_start, order_item_id_start, customer_id_start, usage_id_start = id_start
+    order_ids = order_id_start + np.arange(num_orders, dtype=np.int64)
+    customer_ids = customer_id_start + np.arange(num_orders, dtype=np.int64)
+    order_item_ids = order_item_id_start + np.arange(num_items, dtype=np.int64)
+
+    orders = {
+        'order_id': order_ids,
+        'customer_id': customer_ids,
+        'order_date': order_dates,
+        'order_status': np.array(ORDER_STATUS)[status_idx],
+        'payment_method': np.array(PAYMENT_METHODS)[payment_idx],
+        'notes': np.array(NOTES, dtype=object)[note_idx],
+        'total_amount': total_amounts
+    }
+    order_items = {
+        'order_item_id': order_item_ids,
+        'order_id': order_ids[item_order],
+        'food_id': food_ids,
+        'quantity': quantities,
+        'price_per_unit': prices,
+        'total_price': total_prices
+    }
+    ingredient_usage = {
+        # IDs explícitos: reinsertar un bloque (reintento, --resume, replay) no duplica el uso
+        'id': usage_id_start + np.arange(num_usage_rows, dtype=np.int64),
+        'order_id': np.concatenate([order_ids[usage_orders], missing])[usage_order],
+        'order_item_id': np.concatenate([order_item_ids[usage_items], missing])[usage_order],
+        'food_id': np.concatenate([food_ids[usage_items], food_catalog[waste_cols][waste_source]])[usage_order],
+        'ingredient_id': bom_ingredients[np.concatenate([bom_pos, waste_pos])][usage_order],
+        'quantity_used': np.concatenate([
+            bom_quantities[bom_pos] * quantities[usage_items] * variations[usage_items],
+            waste_amounts
+        ])[usage_order],
+        'usage_date': days[slot_day[usage_slots]]
+    }
+
+    if location_ids is not None:
+        orders['location_id'] = location_ids[slot_location[order_slot]]
+        ingredient_usage['location_id'] = location_ids[slot_location[usage_slots]]
+
+    return orders, order_items, ingredient_usage
+
+def _column_to_list(values):
+    """Convierte una columna NumPy a valores nativos serializables a JSON"""
+    if values.dtype.kind == 'M':
+        return np.datetime_as_string(values).tolist()
+    if values.dtype.kind == 'i' and (values == MISSING_ID).any():
+        return [None if value == MISSING_ID else value for value in values.tolist()]
+    return values.tolist()
+
+def columns_to_records(columns):
+    """Convierte un diccionario de columnas en la lista de filas que espera Supabase"""
+    names = list(columns)
+    values = [_column_to_list(np.asarray(columns[name])) for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+def _iter_chunks(rows, chunk_size):
+    """Divide una lista de filas en lotes consecutivos de tamaño chunk_size"""
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+def _is_transient_error(error):
+    """Indica si un error de red o de PostgREST vale la pena reintentarlo"""
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return str(getattr(error, 'code', '')) in TRANSIENT_ERROR_CODES
+
+def with_retries(operation, attempts=DEFAULT_RETRIES, base_delay=1.0, max_delay=30.0):
+    """Ejecuta operation reintentando errores transitorios con backoff exponencial y jitter"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == attempts or not _is_transient_error(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            print(f"Error transitorio ({e}), reintento {attempt}/{attempts - 1} en {delay:.1f}s")
+            time.sleep(delay)
+
+def insert_rows_in_chunks(table, rows, chunk_size=DEFAULT_CHUNK_SIZE, on_conflict=None,
+                          retries=DEFAULT_RETRIES):
+    """
+    Inserta filas en lotes con una sola petición por lote.
+    Si se indica on_conflict, usa upsert ignorando duplicados en lugar de fallar.
+    Cada lote se reintenta ante errores transitorios; con on_conflict, reintentar un
+    lote que sí se confirmó (p. ej. tras un timeout) no duplica filas.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser mayor que 0")
+
+    total = len(rows)
+    if total == 0:
+        print(f"{table}: no hay filas para insertar")
+        return 0
+
+    num_chunks = (total + chunk_size - 1) // chunk_size
+    inserted = 0
+    for chunk_number, chunk in enumerate(_iter_chunks(rows, chunk_size), start=1):
+        query = supabase.table(table)
+        if on_conflict:
+            query = query.upsert(
+                chunk,
+                on_conflict=on_conflict,
+                ignore_duplicates=True,
+                returning=ReturnMethod.minimal
+            )
+        else:
+            query = query.insert(chunk, returning=ReturnMethod.minimal)
+        with_retries(query.execute, attempts=retries)
+
+        inserted += len(chunk)
+        print(f"{table}: lote {chunk_number}/{num_chunks} insertado ({inserted}/{total} filas)")
+
+    return inserted
+
+def insert_data_to_supabase(orders, order_items, ingredient_usage, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Inserta órdenes, items y uso de ingredientes en lotes (en ese orden por las claves foráneas)"""
     try:
-        print("Insertando órdenes...")
-        for order in orders:
-            try:
-                response = supabase.table('order_table').insert(order).execute()
-                print(f"Orden {order['order_id']} insertada")
-            except Exception as e:
-                if '23505' in str(e):  # Código de error para duplicados
-                    print(f"Orden {order['order_id']} ya existe, continuando...")
-                    continue
-                else:
-                    raise e
-        
-        print("\nInsertando items de órdenes...")
-        for item in order_items:
-            try:
-                response = supabase.table('order_items_table').insert(item).execute()
-                print(f"Item de orden {item['order_id']} (Item ID: {item['order_item_id']}) insertado")
-            except Exception as e:
-                if '23505' in str(e):
-                    print(f"Item {item['order_item_id']} ya existe, continuando...")
-                    continue
-                else:
-                    raise e
-        
-        print("\nInsertando uso de ingredientes...")
-        for usage in ingredient_usage:
-            try:
-                response = supabase.table('ingredient_usage_table').insert(usage).execute()
-                print(f"Uso de ingrediente para orden {usage.get('order_id', 'N/A')} (Item ID: {usage.get('order_item_id', 'N/A')}) insertado")
-            except Exception as e:
-                if '23505' in str(e):
-                    print(f"Uso de ingrediente para orden {usage.get('order_id', 'N/A')} ya existe, continuando...")
-                    continue
-                elif '23503' in str(e):  # Error de clave foránea
-                    print(f"Error de referencia para orden {usage.get('order_id', 'N/A')}, continuando...")
-                    continue
-                else:
-                    raise e
+        print(f"Insertando órdenes (lotes de {chunk_size})...")
+        insert_rows_in_chunks('order_table', orders, chunk_size, on_conflict=CONFLICT_KEYS['order_table'])
+
+        print(f"\nInsertando items de órdenes (lotes de {chunk_size})...")
+        insert_rows_in_chunks('order_items_table', order_items, chunk_size,
+                              on_conflict=CONFLICT_KEYS['order_items_table'])
+
+        print(f"\nInsertando uso de ingredientes (lotes de {chunk_size})...")
+        insert_rows_in_chunks('ingredient_usage_table', ingredient_usage, chunk_size,
+                              on_conflict=CONFLICT_KEYS['ingredient_usage_table'])
         
         print("\nDatos insertados exitosamente")
         
@@ -246,38 +477,332 @@ def clear_tables():
         print(f"Error borrando datos: {e}")
         raise e
 
+def iter_order_chunks(start_date, end_date, chunk_days=7, seed=None, id_start=None,
+                      locations=None, id_blocks=None, skip=None, chunk_sizes=None):
+    """
+    Genera los datos de forma perezosa en bloques de chunk_days días.
+    Cada bloque tiene su propia semilla derivada de seed, así que un mismo
+    bloque se puede regenerar de forma idéntica sin generar los anteriores.
+    Sin id_start, cada bloque reserva sus propios rangos de IDs, salvo que ya
+    tenga uno registrado en id_blocks ({chunk_index: (order, item, customer, uso)}).
+    Los bloques de skip no se generan; con id_start, saltarlos requiere su tamaño
+    en chunk_sizes ({chunk_index: (órdenes, items, usos)}) y si no está se regeneran.
+    Produce (chunk_index, inicio, fin, columnas, primeros IDs del bloque), con
+    columnas None en los bloques saltados.
+    """
+    if chunk_days <= 0:
+        raise ValueError("chunk_days debe ser mayor que 0")
+
+    root_seed = np.random.SeedSequence(seed)
+    next_ids = tuple(id_start) if id_start is not None else None
+    id_blocks = id_blocks or {}
+    skip = skip or set()
+    chunk_sizes = chunk_sizes or {}
+
+    chunk_index = 0
+    chunk_start = start_date
+    while chunk_start.date() <= end_date.date():
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        block_start = id_blocks.get(chunk_index, next_ids)
+
+        if chunk_index in skip and (next_ids is None or chunk_index in chunk_sizes):
+            yield chunk_index, chunk_start, chunk_end, None, id_blocks.get(chunk_index)
+            num_orders, num_items, num_usage_rows = chunk_sizes.get(chunk_index, (0, 0, 0))
+        else:
+            chunk_seed = np.random.SeedSequence(root_seed.entropy, spawn_key=(chunk_index,))
+            orders, order_items, ingredient_usage = generate_orders_vectorized(
+                chunk_start, chunk_end,
+                seed=chunk_seed,
+                id_start=block_start,
+                locations=locations
+            )
+            num_orders = len(orders['order_id'])
+            num_items = len(order_items['order_item_id'])
+            num_usage_rows = len(ingredient_usage['id'])
+            block = None
+            if num_orders:
+                # Un bloque sin registros de uso no usa su rango de uso: cualquier inicio sirve
+                block = (int(orders['order_id'][0]), int(order_items['order_item_id'][0]),
+                         int(orders['customer_id'][0]), int(ingredient_usage['id'][0]) if num_usage_rows else 0)
+            yield chunk_index, chunk_start, chunk_end, (orders, order_items, ingredient_usage), block
+
+        if next_ids is not None:
+            next_ids = (block_start[0] + num_orders, block_start[1] + num_items, block_start[2] + num_orders,
+                        block_start[3] + num_usage_rows)
+        chunk_index += 1
+        chunk_start = chunk_end + timedelta(days=1)
+
+class LoadCheckpoint:
+    """
+    Registro en disco de los bloques ya cargados de una ejecución en modo streaming.
+    Guarda también los parámetros de la ejecución (fechas, semilla), el rango de IDs
+    reservado por cada bloque y su tamaño, para poder saltar los bloques cargados y
+    regenerar exactamente los pendientes al reanudar.
+    """
+
+    def __init__(self, path, params, completed=None, id_blocks=None, chunk_sizes=None):
+        self.path = path
+        self.params = params
+        self.completed = set(completed or [])
+        self.id_blocks = dict(id_blocks or {})
+        self.chunk_sizes = dict(chunk_sizes or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        id_blocks = {int(index): tuple(block) for index, block in data.get('id_blocks', {}).items()}
+        chunk_sizes = {int(index): tuple(sizes) for index, sizes in data.get('chunk_sizes', {}).items()}
+        return cls(path, data['params'], data['completed'], id_blocks, chunk_sizes)
+
+    def is_completed(self, chunk_index):
+        with self._lock:
+            return chunk_index in self.completed
+
+    def record_chunk(self, chunk_index, block, sizes):
+        """Registra los primeros IDs (o None si el bloque está vacío) y el tamaño (órdenes, items, usos) de un bloque"""
+        with self._lock:
+            changed = self.chunk_sizes.get(chunk_index) != sizes
+            self.chunk_sizes[chunk_index] = sizes
+            if block is not None and self.id_blocks.get(chunk_index) != block:
+                self.id_blocks[chunk_index] = block
+                changed = True
+            if changed:
+                self._save()
+
+    def mark_completed(self, chunk_index):
+        with self._lock:
+            self.completed.add(chunk_index)
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        # Escritura atómica: un corte a mitad de escritura no corrompe el checkpoint
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'params': self.params,
+                'completed': sorted(self.completed),
+                'id_blocks': {str(index): list(block) for index, block in self.id_blocks.items()},
+                'chunk_sizes': {str(index): list(sizes) for index, sizes in self.chunk_sizes.items()}
+            }, f)
+        os.replace(tmp_path, self.path)
+
+def _load_chunk(chunk_index, orders, order_items, ingredient_usage, chunk_size, checkpoint):
+    """Carga un bloque completo y lo marca como terminado en el checkpoint"""
+    insert_data_to_supabase(orders, order_items, ingredient_usage, chunk_size)
+    if checkpoint is not None:
+        checkpoint.mark_completed(chunk_index)
+    print(f"Bloque {chunk_index} cargado")
+
+def populate_streaming(start_date, end_date, chunk_days=7, seed=None, export_dir=None,
+                       load=True, chunk_size=DEFAULT_CHUNK_SIZE, locations=None,
+                       id_start=None, workers=1, checkpoint=None, export_format='ndjson'):
+    """
+    Genera, exporta e inserta los datos bloque a bloque.
+    La generación ocurre en el hilo principal y la carga en un pool de workers hilos;
+    como mucho 2 * workers bloques esperan en memoria, así que el consumo no depende
+    de la longitud del rango de fechas. Los bloques ya marcados en checkpoint se saltan
+    sin regenerarlos.
+    """
+    totals = {'orders': 0, 'order_items': 0, 'ingredient_usage': 0, 'skipped_chunks': 0}
+    if not load and id_start is None:
+        id_start = LOCAL_ID_START
+    writer = ExportWriter(export_dir, export_format) if export_dir else None
+
+    chunks = iter_order_chunks(
+        start_date, end_date, chunk_days, seed=seed, id_start=id_start, locations=locations,
+        id_blocks=checkpoint.id_blocks if checkpoint is not None else None,
+        skip=set(checkpoint.completed) if checkpoint is not None else None,
+        chunk_sizes=checkpoint.chunk_sizes if checkpoint is not None else None
+    )
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for chunk_index, chunk_start, chunk_end, columns, block in chunks:
+                if checkpoint is not None and checkpoint.is_completed(chunk_index):
+                    totals['skipped_chunks'] += 1
+                    continue
+                if checkpoint is not None:
+                    orders, order_items, ingredient_usage = columns
+                    checkpoint.record_chunk(chunk_index, block, (
+                        len(orders['order_id']), len(order_items['order_item_id']), len(ingredient_usage['id'])
+                    ))
+
+                orders, order_items, ingredient_usage = (columns_to_records(table) for table in columns)
+                print(
+                    f"\nBloque {chunk_index} ({chunk_start.date()} a {chunk_end.date()}): "
+                    f"{len(orders)} órdenes, {len(order_items)} items, {len(ingredient_usage)} usos"
+                )
+
+                if writer is not None:
+                    writer.write_chunk(chunk_index, orders, order_items, ingredient_usage)
+
+                if load:
+                    pending.add(pool.submit(
+                        _load_chunk, chunk_index, orders, order_items, ingredient_usage,
+                        chunk_size, checkpoint
+                    ))
+                    # Contrapresión: no generar más bloques de los que el pool puede absorber
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                elif checkpoint is not None:
+                    checkpoint.mark_completed(chunk_index)
+
+                totals['orders'] += len(orders)
+                totals['order_items'] += len(order_items)
+                totals['ingredient_usage'] += len(ingredient_usage)
+
+            for future in wait(pending).done:
+                future.result()
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return totals
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Genera órdenes de prueba y las carga en Supabase")
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 11, 1),
+                        help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument('--end', type=datetime.fromisoformat, default=datetime(2025, 1, 4),
+                        help="Fecha final inclusive (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int,
+                        default=int(os.environ["POPULATE_SEED"]) if os.getenv("POPULATE_SEED") else None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Filas por petición de inserción")
+    parser.add_argument('--stream', action='store_true',
+                        help="Generar y cargar por bloques de días con memoria acotada")
+    parser.add_argument('--chunk-days', type=int, default=7,
+                        help="Días por bloque en modo --stream")
+    parser.add_argument('--no-export', action='store_true',
+                        help="No guardar los datos generados en 'generated_data'")
+    parser.add_argument('--export-format', choices=EXPORT_FORMATS, default='ndjson',
+                        help="Formato de exportación: NDJSON comprimido con gzip o Parquet")
+    parser.add_argument('--replay', metavar='DIR',
+                        help="Cargar una exportación existente en lugar de generar datos")
+    parser.add_argument('--no-load', action='store_true',
+                        help="Solo generar (y exportar), sin insertar en Supabase")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Bloques cargados en paralelo en modo --stream")
+    parser.add_argument('--checkpoint', default=os.path.join('generated_data', 'checkpoint.json'),
+                        help="Archivo de checkpoint del modo --stream")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanudar la carga registrada en --checkpoint sin borrar las tablas")
+    return parser.parse_args()
+
+def run_streaming(checkpoint, args):
+    """Ejecuta (o continúa) la carga en streaming descrita por un checkpoint"""
+    params = checkpoint.params
+    totals = populate_streaming(
+        datetime.fromisoformat(params['start_date']),
+        datetime.fromisoformat(params['end_date']),
+        chunk_days=params['chunk_days'],
+        seed=params['seed'],
+        export_dir=params['export_dir'],
+        load=params['load'],
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        checkpoint=checkpoint,
+        export_format=params.get('export_format', 'ndjson')
+    )
+    print(f"\nDatos generados:")
+    print(f"Órdenes: {totals['orders']}")
+    print(f"Items de órdenes: {totals['order_items']}")
+    print(f"Registros de uso de ingredientes: {totals['ingredient_usage']}")
+    if totals['skipped_chunks']:
+        print(f"Bloques ya cargados omitidos: {totals['skipped_chunks']}")
+    if params['export_dir']:
+        print(f"\nExportación generada en el directorio '{params['export_dir']}'")
+
+def resume_streaming(args):
+    """Reanuda una carga interrumpida a partir de su checkpoint"""
+    if not os.path.exists(args.checkpoint):
+        raise FileNotFoundError(f"No existe el checkpoint {args.checkpoint}")
+    checkpoint = LoadCheckpoint.load(args.checkpoint)
+    print(f"Reanudando carga: {len(checkpoint.completed)} bloques ya completados")
+    run_streaming(checkpoint, args)
+
+def replay(args):
+    """Carga en Supabase una exportación generada previamente"""
+    print(f"Cargando exportación desde {args.replay}...")
+    totals = replay_export(
+        args.replay,
+        lambda table, rows: insert_rows_in_chunks(
+            table, rows, args.chunk_size, on_conflict=CONFLICT_KEYS.get(table)
+        )
+    )
+    print(f"\nFilas cargadas: {totals}")
+
 def main():
+    args = parse_args()
+
+    if args.resume:
+        resume_streaming(args)
+        return
+    if args.replay:
+        replay(args)
+        return
+
     # Limpiar tablas primero
-    clear_tables()
+    if not args.no_load:
+        clear_tables()
     
-    # Generar datos desde noviembre 2024 hasta enero 2025
-    start_date = datetime(2024, 11, 1)
-    end_date = datetime(2025, 1, 4)
+    start_date = args.start
+    end_date = args.end
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     print(f"Generando datos desde {start_date.date()} hasta {end_date.date()}")
+
+    if args.stream:
+        # La semilla y los rangos de IDs de cada bloque quedan fijados en el checkpoint para poder reanudar
+        params = {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'chunk_days': args.chunk_days,
+            'seed': np.random.SeedSequence(args.seed).entropy,
+            'export_dir': None if args.no_export else os.path.join('generated_data', timestamp),
+            'export_format': args.export_format,
+            'load': not args.no_load
+        }
+        checkpoint = LoadCheckpoint(args.checkpoint, params)
+        checkpoint.save()
+        run_streaming(checkpoint, args)
+        return
     
-    orders, order_items, ingredient_usage = generate_orders(start_date, end_date)
+    # Los rangos de IDs solo se reservan en la base de datos si los datos se van a cargar
+    id_start = LOCAL_ID_START if args.no_load else None
+    columns = generate_orders_vectorized(start_date, end_date, seed=args.seed, id_start=id_start)
+    orders, order_items, ingredient_usage = (columns_to_records(table) for table in columns)
+    if orders and not args.no_load:
+        print(f"\nIDs reservados:")
+        print(f"Order ID inicial: {orders[0]['order_id']}")
+        print(f"Order Item ID inicial: {order_items[0]['order_item_id']}")
+        print(f"Customer ID inicial: {orders[0]['customer_id']}")
+        if ingredient_usage:
+            print(f"Usage ID inicial: {ingredient_usage[0]['id']}")
     
     print(f"\nDatos generados:")
     print(f"Órdenes: {len(orders)}")
     print(f"Items de órdenes: {len(order_items)}")
     print(f"Registros de uso de ingredientes: {len(ingredient_usage)}")
     
-    # Guardar datos en archivos JSON para referencia
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    os.makedirs('generated_data', exist_ok=True)
-    
-    with open(f'generated_data/orders_{timestamp}.json', 'w') as f:
-        json.dump(orders, f, indent=2)
-    with open(f'generated_data/order_items_{timestamp}.json', 'w') as f:
-        json.dump(order_items, f, indent=2)
-    with open(f'generated_data/ingredient_usage_{timestamp}.json', 'w') as f:
-        json.dump(ingredient_usage, f, indent=2)
-    
-    print("\nArchivos JSON generados en el directorio 'generated_data'")
+    if not args.no_export:
+        # Guardar datos para referencia (reproducibles con --replay)
+        export_dir = os.path.join('generated_data', timestamp)
+        ExportWriter(export_dir, args.export_format).write_chunk(0, orders, order_items, ingredient_usage)
+        print(f"\nExportación generada en el directorio '{export_dir}'")
     
     # Insertar datos en Supabase
-    insert_data_to_supabase(orders, order_items, ingredient_usage)
+    if not args.no_load:
+        insert_data_to_supabase(orders, order_items, ingredient_usage, args.chunk_size)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+
+# Trayectorias de demanda simuladas por ingrediente
+SIMULATION_PATHS = int(os.getenv("REORDER_SIMULATION_PATHS", "2000"))
+
+# Nivel de servicio objetivo (probabilidad de no quedarse sin stock durante el reabastecimiento)
+SERVICE_LEVEL = 0.95
+
+# Días entre pedir y recibir un ingrediente
+LEAD_TIME_DAYS = int(os.getenv("REORDER_LEAD_TIME_DAYS", "3"))
+
+# Horizonte de la probabilidad de desabastecimiento
+STOCKOUT_HORIZON_DAYS = 30
+
+# Días simulados para estimar cuándo se agota el stock
+MAX_SIMULATION_DAYS = 120
+
+# Tiempo de entrega máximo: más días no cambian los días simulados (ni la memoria de las trayectorias)
+MAX_LEAD_TIME_DAYS = MAX_SIMULATION_DAYS
+
+# Niveles de servicio aceptados; se redondean a centésimas (cada nivel es una entrada de caché)
+MIN_SERVICE_LEVEL = 0.5
+MAX_SERVICE_LEVEL = 0.99
+SERVICE_LEVEL_DECIMALS = 2
+
+# Días recientes de uso que forman la distribución empírica
+HISTORY_DAYS = 90
+
+# Ingredientes simulados a la vez (limita la memoria de las trayectorias)
+INGREDIENT_BLOCK_SIZE = 16
+
+def _empirical_history(usage_matrix, ingredient_ids):
+    """Últimos HISTORY_DAYS días de uso de cada ingrediente desde su primer uso (días sin uso = 0)"""
+    days = min(HISTORY_DAYS, usage_matrix.num_days)
+    history = np.vstack([usage_matrix.row(ingredient_id)[-days:] for ingredient_id in ingredient_ids]) \
+        if len(ingredient_ids) else np.zeros((0, days), dtype=np.float32)
+    # Los días anteriores al primer uso no cuentan como demanda 0
+    valid = np.zeros(history.shape, dtype=bool)
+    for position, ingredient_id in enumerate(ingredient_ids):
+        active_days = min(len(usage_matrix.active_row(ingredient_id)), days)
+        valid[position, days - active_days:] = True
+    return history, valid
+
+def simulate_reorder_points(usage_matrix, current_stock, ingredient_ids=None, lead_time=LEAD_TIME_DAYS,
+                            service_level=SERVICE_LEVEL, horizon=STOCKOUT_HORIZON_DAYS,
+                            paths=SIMULATION_PATHS, seed=42):
+    """
+    Simula `paths` trayectorias de demanda diaria por ingrediente remuestreando su
+    uso diario reciente (bootstrap; los mismos días para todos los ingredientes, así
+    que se conserva la correlación entre ingredientes). Con la semilla fija el
+    resultado es reproducible. Para cada ingrediente devuelve el punto de reorden y
+    el stock de seguridad al nivel de servicio, la probabilidad de desabastecimiento
+    en el horizonte y los días esperados hasta agotarse.
+    """
+    if ingredient_ids is None:
+        ingredient_ids = [int(ingredient_id) for ingredient_id in usage_matrix.ingredient_ids
+                          if len(usage_matrix.active_row(ingredient_id))]
+    ingredient_ids = [int(ingredient_id) for ingredient_id in ingredient_ids]
+    if not 0 <= lead_time <= MAX_LEAD_TIME_DAYS:
+        raise ValueError(f"lead_time debe estar entre 0 y {MAX_LEAD_TIME_DAYS} días")
+    if not 0 < service_level < 1:
+        raise ValueError("service_level debe estar entre 0 y 1")
+    if not ingredient_ids or usage_matrix.num_days == 0:
+        return {}
+
+    simulated_days = max(MAX_SIMULATION_DAYS, horizon, lead_time)
+    rng = np.random.default_rng(seed)
+    history, valid = _empirical_history(usage_matrix, ingredient_ids)
+    stock = np.array([float(current_stock.get(ingredient_id, 0.0)) for ingredient_id in ingredient_ids])
+
+    results = {}
+    for block_start in range(0, len(ingredient_ids), INGREDIENT_BLOCK_SIZE):
+        block = slice(block_start, block_start + INGREDIENT_BLOCK_SIZE)
+        block_history, block_valid = history[block], valid[block]
+        block_stock = stock[block]
+
+        # Por ingrediente se remuestrean solo sus días válidos: un cuantil uniforme
+        # común se traduce en una posición dentro de los días válidos de cada uno
+        valid_counts = block_valid.sum(axis=1)
+        uniforms = rng.random((paths, simulated_days), dtype=np.float32)
+        offsets = history.shape[1] - valid_counts
+        positions = offsets[:, None, None] + (uniforms[None] * valid_counts[:, None, None]).astype(np.int64)
+        positions = np.minimum(positions, history.shape[1] - 1)
+        demand = np.take_along_axis(
+            block_history[:, None, :].astype(np.float32),
+            positions.reshape(len(block_stock), 1, -1), axis=2
+        ).reshape(len(block_stock), paths, simulated_days)
+        cumulative = np.cumsum(demand, axis=2)
+
+        lead_time_demand = cumulative[:, :, lead_time - 1] if lead_time > 0 else np.zeros((len(block_stock), paths))
+        reorder_point = np.quantile(lead_time_demand, service_level, axis=1)
+        safety_stock = reorder_point - lead_time_demand.mean(axis=1)
+        stockout_probability = (cumulative[:, :, horizon - 1] > block_stock[:, None]).mean(axis=1)
+
+        exhausted = cumulative > block_stock[:, None, None]
+        ever_exhausted = exhausted.any(axis=2)
+        days_until_empty = np.where(ever_exhausted, exhausted.argmax(axis=2), simulated_days)
+
+        for position, ingredient_id in enumerate(ingredient_ids[block]):
+            if valid_counts[position] == 0:
+                continue
+            results[ingredient_id] = {
+                "current_stock": float(block_stock[position]),
+                "reorder_point": float(reorder_point[position]),
+                "safety_stock": float(safety_stock[position]),
+                "should_reorder": bool(block_stock[position] <= reorder_point[position]),
+                "stockout_probability": float(stockout_probability[position]),
+                "expected_days_until_empty": float(days_until_empty[position].mean()),
+                "p10_days_until_empty": float(np.percentile(days_until_empty[position], 10)),
+                "lead_time_days": lead_time,
+                "service_level": service_level,
+                "horizon_days": horizon,
+                "simulated_days": simulated_days
+            }
+    return results
@@ -0,0 +1,176 @@
+import numpy as np
+from demand_forecast import build_bom_matrix, calibration_factors, daily_food_sales
+from menu_catalog import FOOD_INGREDIENTS
+
+# Semanas recientes de ventas que forman el perfil base por platillo y día de la semana
+BASELINE_WEEKS = 8
+
+# Días simulados por defecto y máximo por petición
+DEFAULT_SIMULATION_DAYS = 30
+MAX_SIMULATION_DAYS = 180
+
+# Nombres aceptados para los días de la semana en los escenarios (0 = lunes)
+WEEKDAY_NAMES = {
+    'lunes': 0, 'martes': 1, 'miercoles': 2, 'miércoles': 2, 'jueves': 3,
+    'viernes': 4, 'sabado': 5, 'sábado': 5, 'domingo': 6
+}
+
+def weekdays(dates):
+    """Día de la semana (0 = lunes) de un array datetime64[D]"""
+    # 1970-01-01 fue jueves
+    return (dates.astype(np.int64) + 3) % 7
+
+def weekday_profile(dates, sales, weeks=BASELINE_WEEKS):
+    """
+    Venta promedio de cada platillo por día de la semana (platillos x 7) en las
+    últimas `weeks` semanas. El patrón semanal y la mezcla del menú quedan en el perfil.
+    """
+    profile = np.zeros((sales.shape[0], 7))
+    if len(dates) == 0:
+        return profile
+    recent = dates > dates[-1] - weeks * 7
+    recent_weekdays = weekdays(dates[recent])
+    for weekday in range(7):
+        days = recent_weekdays == weekday
+        if days.any():
+            profile[:, weekday] = sales[:, recent][:, days].mean(axis=1)
+    return profile
+
+def build_scenario_baseline(sales_pages, usage_matrix=None, food_ingredients=FOOD_INGREDIENTS,
+                            weeks=BASELINE_WEEKS):
+    """
+    Base de las simulaciones what-if: receta, perfil semanal de ventas por platillo y
+    calibración receta/uso real. Se calcula una vez por versión de los datos; cada
+    escenario después es solo aritmética sobre estos arrays.
+    """
+    bom, food_ids, ingredient_ids = build_bom_matrix(food_ingredients)
+    dates, sales = daily_food_sales(sales_pages, food_ids)
+    if len(dates) == 0:
+        raise ValueError("No hay ventas de platillos para simular")
+    return {
+        "bom": bom,
+        "food_ids": food_ids,
+        "ingredient_ids": ingredient_ids,
+        "profile": weekday_profile(dates, sales, weeks),
+        "calibration": calibration_factors(bom, ingredient_ids, dates, sales, usage_matrix),
+        "last_sales_date": dates[-1]
+    }
+
+def _multiplier(value, name):
+    if isinstance(value, bool):
+        raise ValueError(f"{name} debe ser un número")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} debe ser un número")
+    if not np.isfinite(value) or value < 0:
+        raise ValueError(f"{name} debe ser un número mayor o igual a 0")
+    return value
+
+def _mapping(scenario, name):
+    value = scenario.get(name)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} debe ser un objeto JSON")
+    return value
+
+def _food_id(key):
+    # Las claves de un objeto JSON son cadenas; remove_foods puede traer números
+    if isinstance(key, bool) or not isinstance(key, (int, str)):
+        raise ValueError(f"food_id no válido: {key}")
+    try:
+        return int(key)
+    except ValueError:
+        raise ValueError(f"food_id no válido: {key}")
+
+def parse_scenario(scenario, food_ids):
+    """
+    Valida un escenario y lo convierte en multiplicadores:
+    volume (global), weekday_multipliers ({día: factor}, día 0-6 o nombre),
+    food_multipliers ({food_id: factor}) y remove_foods (platillos que salen del menú).
+    Devuelve (volumen, multiplicadores por día [7], multiplicadores por platillo).
+    Lanza ValueError si el escenario no es válido.
+    """
+    scenario = scenario or {}
+    if not isinstance(scenario, dict):
+        raise ValueError("El escenario debe ser un objeto JSON")
+    volume = _multiplier(scenario.get('volume', 1.0), 'volume')
+
+    weekday_multipliers = np.ones(7)
+    for key, value in _mapping(scenario, 'weekday_multipliers').items():
+        weekday = WEEKDAY_NAMES.get(str(key).strip().lower())
+        if weekday is None:
+            try:
+                weekday = int(key)
+            except ValueError:
+                weekday = -1
+        if not 0 <= weekday <= 6:
+            raise ValueError(f"Día de la semana no válido: {key}")
+        weekday_multipliers[weekday] = _multiplier(value, f"weekday_multipliers[{key}]")
+
+    food_multipliers = np.ones(len(food_ids))
+    remove_foods = scenario.get('remove_foods')
+    if remove_foods is not None and not isinstance(remove_foods, list):
+        raise ValueError("remove_foods debe ser una lista de food_id")
+    changes = {_food_id(key): value for key, value in _mapping(scenario, 'food_multipliers').items()}
+    changes.update({_food_id(key): 0.0 for key in remove_foods or []})
+    for food_id, value in changes.items():
+        position = np.searchsorted(food_ids, food_id)
+        if position == len(food_ids) or food_ids[position] != food_id:
+            raise ValueError(f"El platillo {food_id} no está en el menú")
+        food_multipliers[position] = _multiplier(value, f"food_multipliers[{food_id}]")
+
+    return volume, weekday_multipliers, food_multipliers
+
+def _days_until(trajectories, levels):
+    """Primer día (1 = el primero simulado) en que cada trayectoria queda en o bajo su nivel; NaN si no llega"""
+    below = trajectories <= levels[:, None]
+    return np.where(below.any(axis=1), below.argmax(axis=1) + 1.0, np.nan)
+
+def simulate_scenario(baseline, current_stock, safe_thresholds, scenario=None, start_date=None,
+                      days=DEFAULT_SIMULATION_DAYS):
+    """
+    Proyecta el agotamiento de los ingredientes con y sin el escenario.
+    La venta diaria de cada platillo sale del perfil semanal, escalada por los
+    multiplicadores; ambas proyecciones se convierten en demanda de ingredientes con
+    un solo producto por la matriz de recetas. current_stock y safe_thresholds son
+    diccionarios por ingredient_id. Devuelve fechas, ingredient_ids y, por proyección,
+    demanda diaria, trayectoria de stock y días hasta el límite seguro y hasta agotarse.
+    """
+    food_ids, ingredient_ids = baseline['food_ids'], baseline['ingredient_ids']
+    volume, weekday_multipliers, food_multipliers = parse_scenario(scenario, food_ids)
+
+    start = np.datetime64(start_date, 'D') if start_date is not None else baseline['last_sales_date'] + 1
+    dates = start + np.arange(days)
+    day_weekdays = weekdays(dates)
+
+    base_sales = baseline['profile'][:, day_weekdays]
+    scenario_sales = base_sales * food_multipliers[:, None] * (weekday_multipliers[day_weekdays] * volume)[None, :]
+    demand = np.asarray(baseline['bom'].T @ np.hstack([base_sales, scenario_sales])) * baseline['calibration'][:, None]
+
+    stock = np.array([float(current_stock.get(int(ingredient_id), 0.0)) for ingredient_id in ingredient_ids])
+    thresholds = np.array([float(safe_thresholds.get(int(ingredient_id), 0.0)) for ingredient_id in ingredient_ids])
+
+    projections = {}
+    for name, projected_demand in (('baseline', demand[:, :days]), ('scenario', demand[:, days:])):
+        trajectories = stock[:, None] - np.cumsum(projected_demand, axis=1)
+        projections[name] = {
+            "demand": projected_demand,
+            "stock": trajectories,
+            "days_until_safe_threshold": _days_until(trajectories, thresholds),
+            "days_until_empty": _days_until(trajectories, np.zeros(len(stock)))
+        }
+
+    return {
+        "dates": dates,
+        "ingredient_ids": ingredient_ids,
+        "current_stock": stock,
+        "safe_threshold": thresholds,
+        "multipliers": {
+            "volume": volume,
+            "weekday": weekday_multipliers,
+            "food": dict(zip(food_ids.tolist(), food_multipliers.tolist()))
+        },
+        **projections
+    }
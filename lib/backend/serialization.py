@@ -0,0 +1,84 @@
+import gzip
+import json
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa json de la librería estándar
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+# Respuestas más pequeñas que esto (en bytes) se envían sin comprimir
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def _default(obj):
+    """Tipos que el serializador no maneja por sí solo"""
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+def dumps(obj, indent=False):
+    """
+    Serializa a JSON (bytes). Con orjson los arrays y escalares NumPy se serializan
+    de forma nativa, sin convertirlos antes a listas de Python.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False,
+        indent=2 if indent else None, separators=None if indent else (',', ':')
+    ).encode('utf-8')
+
+def dumps_text(obj, indent=False):
+    return dumps(obj, indent=indent).decode('utf-8')
+
+def _accepted_encodings(request):
+    encodings = set()
+    for part in request.headers.get('accept-encoding', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if name and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            encodings.add(name.lower())
+    return encodings
+
+def json_response(request: Request, payload, status_code=200):
+    """
+    Respuesta JSON comprimida según Accept-Encoding (brotli si está disponible,
+    si no gzip). Las respuestas pequeñas se envían tal cual.
+    """
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encodings = _accepted_encodings(request)
+        if brotli is not None and 'br' in encodings:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif 'gzip' in encodings:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,290 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+# Archivo SQLite compartido por los procesos de la API en el host (sin él, cada proceso usa su memoria)
+ANALYTICS_CACHE_PATH = os.getenv("ANALYTICS_CACHE_PATH")
+
+# Segundos que un proceso reserva un cálculo; si no termina antes, otro proceso puede retomarlo
+COMPUTE_LEASE_SECONDS = float(os.getenv("ANALYTICS_CACHE_LEASE_SECONDS", "600"))
+
+# Intervalo de consulta mientras otro proceso calcula la misma entrada
+POLL_SECONDS = 0.2
+
+# Segundos que se conservan los eventos publicados entre procesos
+EVENT_RETENTION_SECONDS = 600
+
+SCHEMA = """
+create table if not exists entries (
+    namespace text not null,
+    kind text not null,
+    scope text not null,
+    value blob not null,
+    updated_at real not null,
+    primary key (namespace, kind, scope)
+);
+create table if not exists claims (
+    namespace text not null,
+    kind text not null,
+    scope text not null,
+    owner text not null,
+    expires_at real not null,
+    primary key (namespace, kind, scope)
+);
+create table if not exists versions (
+    namespace text primary key,
+    version text
+);
+create table if not exists leases (
+    name text primary key,
+    owner text not null,
+    expires_at real not null
+);
+create table if not exists events (
+    id integer primary key autoincrement,
+    owner text not null,
+    payload blob not null,
+    created_at real not null
+);
+create table if not exists generations (
+    namespace text not null,
+    scope text not null,
+    generation integer not null,
+    primary key (namespace, scope)
+);
+"""
+
+# Scope de generations que cambia cuando se vacía el namespace completo
+ALL_SCOPES = '*'
+
+def _scope(ingredient_id):
+    """Las entradas globales (ingrediente None) se guardan con scope ''"""
+    return '' if ingredient_id is None else str(int(ingredient_id))
+
+def _version_key(version):
+    return json.dumps(version)
+
+class SQLiteCacheStore:
+    """
+    Almacén de la caché de análisis compartido entre procesos a través de un archivo
+    SQLite (modo WAL). Cada escritura es una transacción, así que los lectores ven la
+    entrada completa o ninguna. get_or_compute reserva el cálculo de una entrada: si
+    varios procesos piden a la vez la misma entrada, uno calcula y los demás esperan
+    su resultado, de modo que N procesos cuestan un solo cálculo.
+    Cada invalidación sube la generación de los scopes que borra; un cálculo que
+    empezó antes de una invalidación de su entrada no guarda su resultado.
+    publish_event/events_after forman un registro de eventos que los procesos
+    consultan para enterarse de lo que hicieron los demás.
+    Los valores se guardan serializados con pickle.
+    """
+
+    def __init__(self, path, lease_seconds=COMPUTE_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._local = threading.local()
+        # executescript confirma cualquier transacción abierta: el esquema se crea fuera de una
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            # isolation_level=None: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("pragma journal_mode=wal")
+            connection.execute("pragma synchronous=normal")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    class _Transaction:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def __enter__(self):
+            self.connection.execute("begin immediate")
+            return self.connection
+
+        def __exit__(self, exc_type, exc, traceback):
+            self.connection.execute("rollback" if exc_type else "commit")
+
+    def _transaction(self):
+        return self._Transaction(self._connection())
+
+    def get(self, namespace, kind, ingredient_id=None):
+        """Devuelve (encontrado, valor)"""
+        row = self._connection().execute(
+            "select value from entries where namespace = ? and kind = ? and scope = ?",
+            (namespace, kind, _scope(ingredient_id))
+        ).fetchone()
+        return (True, pickle.loads(row[0])) if row else (False, None)
+
+    def _generation(self, connection, namespace, scope):
+        """Generaciones (namespace completo, scope) de una entrada"""
+        rows = dict(connection.execute(
+            "select scope, generation from generations where namespace = ? and scope in (?, ?)",
+            (namespace, ALL_SCOPES, scope)
+        ).fetchall())
+        return rows.get(ALL_SCOPES, 0), rows.get(scope, 0)
+
+    def generation(self, namespace, ingredient_id=None):
+        """Generación actual de una entrada; pasarla a set descarta la escritura si se invalidó después"""
+        return self._generation(self._connection(), namespace, _scope(ingredient_id))
+
+    def _bump(self, connection, namespace, scopes):
+        connection.executemany(
+            "insert into generations (namespace, scope, generation) values (?, ?, 1) "
+            "on conflict (namespace, scope) do update set generation = generation + 1",
+            [(namespace, scope) for scope in scopes]
+        )
+
+    def set(self, namespace, kind, ingredient_id, value, generation=None):
+        """
+        Guarda una entrada. Con generation (leída con generation() antes de calcular el
+        valor), la escritura se descarta si la entrada se invalidó desde entonces.
+        Devuelve el valor en ambos casos.
+        """
+        scope = _scope(ingredient_id)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction() as connection:
+            if generation is not None and self._generation(connection, namespace, scope) != tuple(generation):
+                return value
+            connection.execute(
+                "insert or replace into entries (namespace, kind, scope, value, updated_at) values (?, ?, ?, ?, ?)",
+                (namespace, kind, scope, data, time.time())
+            )
+        return value
+
+    def _claim(self, namespace, kind, scope):
+        """Reserva el cálculo de una entrada; False si otro proceso tiene una reserva vigente"""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "delete from claims where namespace = ? and kind = ? and scope = ? and expires_at < ?",
+                (namespace, kind, scope, now)
+            )
+            cursor = connection.execute(
+                "insert or ignore into claims (namespace, kind, scope, owner, expires_at) values (?, ?, ?, ?, ?)",
+                (namespace, kind, scope, self.owner, now + self.lease_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, namespace, kind, scope):
+        with self._transaction() as connection:
+            connection.execute(
+                "delete from claims where namespace = ? and kind = ? and scope = ? and owner = ?",
+                (namespace, kind, scope, self.owner)
+            )
+
+    def get_or_compute(self, namespace, kind, ingredient_id, compute):
+        """
+        Devuelve la entrada guardada o la calcula con compute(). Si otro proceso ya la
+        está calculando, espera su resultado; si ese proceso falla o su reserva vence,
+        la calcula este. Si la entrada se invalida durante el cálculo, el resultado se
+        devuelve pero no se guarda.
+        """
+        scope = _scope(ingredient_id)
+        while True:
+            found, value = self.get(namespace, kind, ingredient_id)
+            if found:
+                return value
+            if self._claim(namespace, kind, scope):
+                try:
+                    # Otro proceso pudo guardarla entre la lectura y la reserva
+                    found, value = self.get(namespace, kind, ingredient_id)
+                    if found:
+                        return value
+                    generation = self.generation(namespace, ingredient_id)
+                    return self.set(namespace, kind, ingredient_id, compute(), generation)
+                finally:
+                    self._release(namespace, kind, scope)
+            time.sleep(POLL_SECONDS)
+
+    def invalidate(self, namespace, ingredient_ids=None, version=None):
+        """
+        Borra las entradas de los ingredientes indicados y todas las globales del
+        namespace (todas sin ingredient_ids). version registra la versión de los datos
+        a la que corresponden las entradas que quedan. Devuelve cuántas se borraron.
+        """
+        with self._transaction() as connection:
+            if ingredient_ids is None:
+                cursor = connection.execute("delete from entries where namespace = ?", (namespace,))
+                self._bump(connection, namespace, [ALL_SCOPES])
+            else:
+                scopes = [_scope(ingredient_id) for ingredient_id in ingredient_ids] + ['']
+                cursor = connection.execute(
+                    f"delete from entries where namespace = ? and scope in ({', '.join('?' * len(scopes))})",
+                    (namespace, *scopes)
+                )
+                self._bump(connection, namespace, scopes)
+            if version is not None:
+                connection.execute(
+                    "insert or replace into versions (namespace, version) values (?, ?)",
+                    (namespace, _version_key(version))
+                )
+            return cursor.rowcount
+
+    def sync_version(self, namespace, version):
+        """
+        Vacía el namespace si sus entradas son de otra versión de los datos. El primer
+        proceso que ve la versión nueva vacía la caché; los demás la encuentran ya al
+        día y conservan lo que se haya calculado desde entonces. Devuelve True si la vació.
+        """
+        with self._transaction() as connection:
+            row = connection.execute("select version from versions where namespace = ?", (namespace,)).fetchone()
+            if row and row[0] == _version_key(version):
+                return False
+            connection.execute("delete from entries where namespace = ?", (namespace,))
+            self._bump(connection, namespace, [ALL_SCOPES])
+            connection.execute(
+                "insert or replace into versions (namespace, version) values (?, ?)",
+                (namespace, _version_key(version))
+            )
+            return True
+
+    def publish_event(self, payload):
+        """Publica un evento para los demás procesos; los de más de EVENT_RETENTION_SECONDS se descartan"""
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("delete from events where created_at < ?", (now - EVENT_RETENTION_SECONDS,))
+            cursor = connection.execute(
+                "insert into events (owner, payload, created_at) values (?, ?, ?)",
+                (self.owner, data, now)
+            )
+            return cursor.lastrowid
+
+    def last_event_id(self):
+        row = self._connection().execute("select max(id) from events").fetchone()
+        return row[0] or 0
+
+    def events_after(self, event_id):
+        """Devuelve (último id leído, eventos de otros procesos posteriores a event_id, en orden)"""
+        rows = self._connection().execute(
+            "select id, owner, payload from events where id > ? order by id", (event_id,)
+        ).fetchall()
+        if not rows:
+            return event_id, []
+        return rows[-1][0], [pickle.loads(payload) for _, owner, payload in rows if owner != self.owner]
+
+    def acquire_lease(self, name, seconds):
+        """Toma o renueva la concesión `name` por `seconds` segundos; False si la tiene otro proceso"""
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "insert into leases (name, owner, expires_at) values (?, ?, ?) "
+                "on conflict (name) do update set owner = excluded.owner, expires_at = excluded.expires_at "
+                "where leases.owner = excluded.owner or leases.expires_at < ?",
+                (name, self.owner, now + seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, name):
+        with self._transaction() as connection:
+            connection.execute("delete from leases where name = ? and owner = ?", (name, self.owner))
+
+# Almacén compartido de la caché de análisis, o None si cada proceso usa su propia memoria
+shared_cache_store = SQLiteCacheStore(ANALYTICS_CACHE_PATH) if ANALYTICS_CACHE_PATH else None
@@ -0,0 +1,22 @@
+-- Columna location_id para operar varios locales con las mismas tablas.
+-- Ejecutar una vez en el editor SQL de Supabase.
+--
+-- Los datos existentes quedan en el local 1. Las consultas del backend filtran por
+-- location_id cuando la petición lo indica (parámetro location_id); sin él se leen
+-- las tablas completas, como en la instalación de un solo restaurante.
+
+alter table inventory_table add column if not exists location_id bigint not null default 1;
+alter table ingredient_usage_table add column if not exists location_id bigint not null default 1;
+alter table order_table add column if not exists location_id bigint not null default 1;
+
+-- Inventario de un local ordenado por nombre (get_inventory_items)
+create index if not exists inventory_table_location_name_idx
+    on inventory_table (location_id, ingredient_name);
+
+-- Paginación por clave (usage_date, id) dentro de un local (iter_usage_pages)
+create index if not exists ingredient_usage_location_date_id_idx
+    on ingredient_usage_table (location_id, usage_date, id);
+
+-- Ventas por platillo de un local (iter_food_sales_pages filtra por la orden)
+create index if not exists order_table_location_idx
+    on order_table (location_id, order_id);
@@ -0,0 +1,86 @@
+-- Reserva de bloques de IDs para los generadores de órdenes (populate_orders_2025.py).
+-- Ejecutar una vez en el editor SQL de Supabase.
+--
+-- Cada llamada a reserve_id_blocks reserva, en una sola transacción, rangos
+-- contiguos y no solapados de order_id, order_item_id, customer_id y del id de
+-- ingredient_usage_table. Varias ejecuciones del generador pueden cargar datos en
+-- paralelo sin colisiones, y los registros de uso con id explícito se pueden
+-- reinsertar (upsert que ignora duplicados) sin duplicar el consumo.
+
+create table if not exists id_block_allocator (
+    name text primary key,
+    next_id bigint not null
+);
+
+create or replace function reserve_id_blocks(
+    p_orders bigint,
+    p_order_items bigint,
+    p_customers bigint,
+    p_usage_rows bigint
+)
+returns table (order_id_start bigint, order_item_id_start bigint, customer_id_start bigint,
+               usage_id_start bigint)
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_min_order bigint;
+    v_min_item bigint;
+    v_min_customer bigint := 1;
+    v_min_usage bigint;
+    v_usage_sequence text := pg_get_serial_sequence('ingredient_usage_table', 'id');
+begin
+    if p_orders < 0 or p_order_items < 0 or p_customers < 0 or p_usage_rows < 0 then
+        raise exception 'Los tamaños de bloque deben ser >= 0';
+    end if;
+
+    -- Los inserts de uso sin id (p. ej. POST /usage-events) toman ids de la secuencia de la
+    -- columna: se esperan los que estén en curso y se bloquean los nuevos hasta el fin de la reserva
+    lock table ingredient_usage_table in share row exclusive mode;
+
+    -- Nunca entregar IDs por debajo de los datos existentes (max sobre la PK es un index scan)
+    select coalesce(max(order_id), 0) + 1 into v_min_order from order_table;
+    select coalesce(max(order_item_id), 0) + 1 into v_min_item from order_items_table;
+    select coalesce(max(id), 0) + 1 into v_min_usage from ingredient_usage_table;
+
+    -- customer_id no está indexado: solo se consulta al inicializar el contador
+    if not exists (select 1 from id_block_allocator where name = 'customer_id') then
+        select coalesce(max(customer_id), 0) + 1 into v_min_customer from order_table;
+    end if;
+
+    insert into id_block_allocator (name, next_id)
+    values ('order_id', v_min_order), ('order_item_id', v_min_item), ('customer_id', v_min_customer),
+           ('usage_id', v_min_usage)
+    on conflict (name) do nothing;
+
+    -- Cada UPDATE bloquea su fila hasta el fin de la transacción, así que las llamadas
+    -- concurrentes se serializan. Se bloquean siempre en el mismo orden (sin deadlocks).
+    update id_block_allocator
+       set next_id = greatest(next_id, v_min_order) + p_orders
+     where name = 'order_id'
+    returning next_id - p_orders into order_id_start;
+
+    update id_block_allocator
+       set next_id = greatest(next_id, v_min_item) + p_order_items
+     where name = 'order_item_id'
+    returning next_id - p_order_items into order_item_id_start;
+
+    update id_block_allocator
+       set next_id = greatest(next_id, v_min_customer) + p_customers
+     where name = 'customer_id'
+    returning next_id - p_customers into customer_id_start;
+
+    update id_block_allocator
+       set next_id = greatest(next_id, v_min_usage) + p_usage_rows
+     where name = 'usage_id'
+    returning next_id - p_usage_rows into usage_id_start;
+
+    -- La secuencia sigue después del bloque reservado
+    if v_usage_sequence is not null then
+        perform setval(v_usage_sequence, greatest(usage_id_start + p_usage_rows - 1, nextval(v_usage_sequence)));
+    end if;
+
+    return next;
+end;
+$$;
@@ -0,0 +1,82 @@
+-- Versión de los datos de uso mantenida por triggers (get_usage_data_version).
+-- Ejecutar una vez en el editor SQL de Supabase, después de location_id.sql.
+--
+-- Cada sentencia que inserta, actualiza o borra filas de ingredient_usage_table
+-- incrementa en 1 la versión global (scope 'all') y la de cada local afectado
+-- (scope = location_id). El backend lee una sola fila por clave primaria en lugar
+-- de contar la tabla, y la versión cambia también con updates y deletes.
+
+create table if not exists usage_data_version (
+    scope text primary key,
+    version bigint not null default 0
+);
+
+insert into usage_data_version (scope, version)
+select 'all', 1
+union all
+select distinct location_id::text, 1 from ingredient_usage_table
+on conflict (scope) do nothing;
+
+create or replace function bump_usage_data_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'TRUNCATE' then
+        update usage_data_version set version = version + 1;
+        return null;
+    end if;
+
+    insert into usage_data_version (scope, version) values ('all', 1)
+    on conflict (scope) do update set version = usage_data_version.version + 1;
+
+    -- Las tablas de transición solo existen para la operación del trigger;
+    -- plpgsql prepara cada consulta al ejecutarla, así que las otras ramas no fallan
+    if tg_op in ('INSERT', 'UPDATE') then
+        insert into usage_data_version (scope, version)
+        select distinct location_id::text, 1 from new_rows
+        on conflict (scope) do update set version = usage_data_version.version + 1;
+    end if;
+    if tg_op = 'DELETE' then
+        insert into usage_data_version (scope, version)
+        select distinct location_id::text, 1 from old_rows
+        on conflict (scope) do update set version = usage_data_version.version + 1;
+    end if;
+    if tg_op = 'UPDATE' then
+        -- Locales de los que salieron filas (un update que cambia location_id)
+        insert into usage_data_version (scope, version)
+        select distinct location_id::text, 1 from old_rows
+        where location_id not in (select location_id from new_rows)
+        on conflict (scope) do update set version = usage_data_version.version + 1;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists usage_data_version_insert on ingredient_usage_table;
+create trigger usage_data_version_insert
+    after insert on ingredient_usage_table
+    referencing new table as new_rows
+    for each statement execute function bump_usage_data_version();
+
+drop trigger if exists usage_data_version_update on ingredient_usage_table;
+create trigger usage_data_version_update
+    after update on ingredient_usage_table
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function bump_usage_data_version();
+
+drop trigger if exists usage_data_version_delete on ingredient_usage_table;
+create trigger usage_data_version_delete
+    after delete on ingredient_usage_table
+    referencing old table as old_rows
+    for each statement execute function bump_usage_data_version();
+
+drop trigger if exists usage_data_version_truncate on ingredient_usage_table;
+create trigger usage_data_version_truncate
+    after truncate on ingredient_usage_table
+    for each statement execute function bump_usage_data_version();
+
+-- La versión la lee el backend con la clave anónima
+grant select on usage_data_version to anon, authenticated;
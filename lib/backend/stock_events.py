@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+
+# Mensajes pendientes por cliente antes de considerarlo lento
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+HEARTBEAT_SECONDS = 15
+
+# Campos cuyo cambio provoca un evento
+TRACKED_FIELDS = ('stock_status', 'current_stock', 'forecast_daily_usage')
+
+# Mensaje interno que pide reenviar el estado completo a un cliente que se quedó atrás
+_RESYNC = None
+
+def format_sse(event, data):
+    """Formatea un evento server-sent events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+class StockBroadcaster:
+    """
+    Difunde por SSE los cambios de estado del stock. publish() compara cada estado
+    con el último publicado y solo emite los ingredientes que cambiaron; el evento
+    se serializa una vez y la misma cadena se encola para todos los clientes.
+    Un cliente cuya cola se llena no bloquea a los demás: pierde los eventos
+    pendientes y recibe un snapshot completo.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._last = {}
+        self._lock = threading.Lock()
+        self._loop = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._last.values())
+
+    def publish(self, states):
+        """Registra los estados y difunde los que cambiaron; devuelve la lista de cambios"""
+        with self._lock:
+            changed = []
+            for state in states:
+                previous = self._last.get(state['ingredient_id'])
+                if previous is None or any(previous.get(field) != state.get(field) for field in TRACKED_FIELDS):
+                    changed.append(state)
+                    self._last[state['ingredient_id']] = state
+
+        if changed and self._subscribers and self._loop is not None:
+            message = format_sse('stock', changed)
+            try:
+                in_loop = asyncio.get_running_loop() is self._loop
+            except RuntimeError:
+                in_loop = False
+            if in_loop:
+                self._fan_out(message)
+            else:
+                self._loop.call_soon_threadsafe(self._fan_out, message)
+        return changed
+
+    def _fan_out(self, message):
+        for queue in list(self._subscribers):
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_RESYNC)
+                continue
+            queue.put_nowait(message)
+
+    async def stream(self):
+        """Generador de eventos SSE para un cliente: un snapshot inicial y luego los cambios"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield format_sse('snapshot', self.snapshot())
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse('snapshot', self.snapshot()) if message is _RESYNC else message
+        finally:
+            self._subscribers.discard(queue)
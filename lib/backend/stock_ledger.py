@@ -0,0 +1,113 @@
+import threading
+from datetime import datetime
+
+# Diferencia absoluta a partir de la cual un total del libro se considera desviado
+DRIFT_TOLERANCE = 1e-6
+
+# Fracción del stock inicial por debajo de la cual el estado pasa a 'warning'
+WARNING_STOCK_RATIO = 0.3
+
+def stock_status(current_stock, total_stock, safe_threshold):
+    """Estado del stock: 'critical' bajo el límite seguro, 'warning' bajo el 30% del stock inicial"""
+    if current_stock < safe_threshold:
+        return 'critical'
+    if current_stock < total_stock * WARNING_STOCK_RATIO:
+        return 'warning'
+    return 'good'
+
+class StockLedger:
+    """
+    Libro de stock: uso acumulado por ingrediente mantenido de forma incremental.
+    El stock actual de un ingrediente (total_stock - uso acumulado) se lee en O(1)
+    sin volver a sumar el historial. reconcile() lo compara contra un recálculo
+    completo y reporta las diferencias.
+    """
+
+    def __init__(self):
+        self._usage = {}
+        self._total_stock = {}
+        self._safe_factor = {}
+        self._lock = threading.Lock()
+        self.version = None
+        self.last_reconciliation = None
+
+    @property
+    def initialized(self):
+        return self.version is not None
+
+    def load_inventory(self, items):
+        """Actualiza el stock inicial de cada ingrediente a partir de filas de inventory_table"""
+        with self._lock:
+            for item in items:
+                self._total_stock[item['ingredient_id']] = float(item['total_stock'] or 0)
+                self._safe_factor[item['ingredient_id']] = float(item.get('safe_factor') or 0)
+
+    def reset(self, usage_totals, version):
+        """Reemplaza los totales de uso por los de un recálculo completo"""
+        with self._lock:
+            self._usage = {ingredient_id: float(total) for ingredient_id, total in usage_totals.items()}
+            self.version = version
+
+    def record_usage(self, ingredient_id, quantity, version=None):
+        """Suma un uso registrado; version es la versión de los datos tras registrarlo"""
+        with self._lock:
+            self._usage[ingredient_id] = self._usage.get(ingredient_id, 0.0) + float(quantity)
+            if version is not None:
+                self.version = version
+
+    def total_usage(self, ingredient_id):
+        with self._lock:
+            return self._usage.get(ingredient_id, 0.0)
+
+    def current_stock(self, ingredient_id):
+        with self._lock:
+            return self._total_stock.get(ingredient_id, 0.0) - self._usage.get(ingredient_id, 0.0)
+
+    def status(self, ingredient_id):
+        """Stock actual, límite seguro y estado de un ingrediente, calculados en O(1)"""
+        with self._lock:
+            total_stock = self._total_stock.get(ingredient_id, 0.0)
+            current_stock = total_stock - self._usage.get(ingredient_id, 0.0)
+            safe_threshold = total_stock * (self._safe_factor.get(ingredient_id, 0.0) / 100)
+        return {
+            "ingredient_id": ingredient_id,
+            "current_stock": current_stock,
+            "safe_threshold": safe_threshold,
+            "stock_status": stock_status(current_stock, total_stock, safe_threshold)
+        }
+
+    @property
+    def ingredient_ids(self):
+        with self._lock:
+            return list(self._total_stock)
+
+    def usage_totals(self):
+        with self._lock:
+            return dict(self._usage)
+
+    def reconcile(self, usage_totals, version, tolerance=DRIFT_TOLERANCE):
+        """
+        Compara los totales del libro con un recálculo completo, adopta el recálculo
+        y devuelve el reporte de desviaciones por ingrediente.
+        """
+        with self._lock:
+            drift = {}
+            for ingredient_id in set(self._usage) | set(usage_totals):
+                ledger_total = self._usage.get(ingredient_id, 0.0)
+                recomputed_total = float(usage_totals.get(ingredient_id, 0.0))
+                if abs(ledger_total - recomputed_total) > tolerance:
+                    drift[ingredient_id] = {
+                        "ledger_usage": ledger_total,
+                        "recomputed_usage": recomputed_total,
+                        "drift": ledger_total - recomputed_total
+                    }
+
+            self._usage = {ingredient_id: float(total) for ingredient_id, total in usage_totals.items()}
+            self.version = version
+            self.last_reconciliation = {
+                "reconciled_at": datetime.now().isoformat(),
+                "ingredients_checked": len(usage_totals),
+                "ingredients_with_drift": len(drift),
+                "drift": drift
+            }
+            return self.last_reconciliation
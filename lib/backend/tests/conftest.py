@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Los módulos del backend se importan como en producción, desde lib/backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Los clientes de Supabase y Gemini se crean al importar; las pruebas no hacen consultas
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "x" * 40)
+os.environ.setdefault("GOOGLE_API_KEY", "test")
@@ -0,0 +1,94 @@
+import pytest
+
+from analytics_cache import AnalyticsCache
+from shared_cache import SQLiteCacheStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.db")) if request.param == "sqlite" else None
+    return AnalyticsCache(1, store)
+
+def test_invalidate_removes_ingredient_and_global_entries(cache):
+    cache.set("forecast", 1, "uno")
+    cache.set("forecast", 2, "dos")
+    cache.set("global_analysis", None, "global")
+    cache.invalidate([1], version=2)
+    assert cache.get("forecast", 1) is None
+    assert cache.get("global_analysis") is None
+    assert cache.get("forecast", 2) == "dos"
+
+def test_sync_version_clears_only_on_change(cache):
+    assert cache.sync_version(1)
+    cache.set("forecast", 1, "uno")
+    assert not cache.sync_version(1)
+    assert cache.get("forecast", 1) == "uno"
+    assert cache.sync_version(2)
+    assert cache.get("forecast", 1) is None
+
+def test_get_or_compute_caches_result(cache):
+    calls = []
+    compute = lambda: calls.append(1) or "valor"
+    assert cache.get_or_compute("forecast", 1, compute) == "valor"
+    assert cache.get_or_compute("forecast", 1, compute) == "valor"
+    assert len(calls) == 1
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate([1], version=2),
+    lambda cache: cache.invalidate(version=2),
+    lambda cache: cache.sync_version(2),
+])
+def test_result_computed_before_invalidation_is_not_stored(cache, invalidate):
+    cache.sync_version(1)
+
+    def compute():
+        # Llega uso nuevo mientras se calcula con los datos anteriores
+        invalidate(cache)
+        return "viejo"
+
+    assert cache.get_or_compute("forecast", 1, compute) == "viejo"
+    assert cache.get("forecast", 1) is None
+    assert cache.get_or_compute("forecast", 1, lambda: "nuevo") == "nuevo"
+    assert cache.get("forecast", 1) == "nuevo"
+
+def test_invalidation_of_other_ingredient_keeps_result(cache):
+    def compute():
+        cache.invalidate([2])
+        return "valor"
+
+    cache.get_or_compute("forecast", 1, compute)
+    assert cache.get("forecast", 1) == "valor"
+
+def test_global_entry_dropped_by_any_invalidation(cache):
+    def compute():
+        cache.invalidate([5])
+        return "global"
+
+    cache.get_or_compute("global_analysis", None, compute)
+    assert cache.get("global_analysis") is None
+
+def test_shared_store_is_visible_to_other_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = AnalyticsCache(1, SQLiteCacheStore(path)), AnalyticsCache(1, SQLiteCacheStore(path))
+    first.set("forecast", 1, {"yhat": [1.0]})
+    assert second.get("forecast", 1) == {"yhat": [1.0]}
+    second.invalidate([1])
+    assert first.get("forecast", 1) is None
+
+def test_events_are_delivered_to_other_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SQLiteCacheStore(path), SQLiteCacheStore(path)
+    start = second.last_event_id()
+    first.publish_event((7, [{"ingredient_id": 1}], 5, 6))
+    after, events = second.events_after(start)
+    assert events == [(7, [{"ingredient_id": 1}], 5, 6)]
+    assert first.events_after(start)[1] == []
+    assert second.events_after(after) == (after, [])
+
+def test_lease_has_a_single_owner(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SQLiteCacheStore(path), SQLiteCacheStore(path)
+    assert first.acquire_lease("scheduler", 30)
+    assert first.acquire_lease("scheduler", 30)
+    assert not second.acquire_lease("scheduler", 30)
+    first.release_lease("scheduler")
+    assert second.acquire_lease("scheduler", 30)
@@ -0,0 +1,59 @@
+import pytest
+from postgrest import ReturnMethod
+
+import populate_orders_2025 as populate
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+
+    def insert(self, rows, returning=None):
+        self.request = ('insert', rows, {'returning': returning})
+        return self
+
+    def upsert(self, rows, **options):
+        self.request = ('upsert', rows, options)
+        return self
+
+    def execute(self):
+        method, rows, options = self.request
+        self.client.requests.append((self.table, method, list(rows), options))
+
+class FakeSupabase:
+    def __init__(self):
+        self.requests = []
+
+    def table(self, table):
+        return FakeQuery(self, table)
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    client = FakeSupabase()
+    monkeypatch.setattr(populate, "supabase", client)
+    return client
+
+def _rows(count):
+    return [{'order_id': order_id} for order_id in range(count)]
+
+def test_one_request_per_chunk(fake_supabase):
+    assert populate.insert_rows_in_chunks('order_table', _rows(5), chunk_size=2) == 5
+    assert [len(rows) for _, _, rows, _ in fake_supabase.requests] == [2, 2, 1]
+    assert all(method == 'insert' for _, method, _, _ in fake_supabase.requests)
+    assert fake_supabase.requests[0][3] == {'returning': ReturnMethod.minimal}
+
+def test_on_conflict_upserts_ignoring_duplicates(fake_supabase):
+    populate.insert_rows_in_chunks('order_table', _rows(3), chunk_size=10, on_conflict='order_id')
+    [(table, method, rows, options)] = fake_supabase.requests
+    assert (table, method, len(rows)) == ('order_table', 'upsert', 3)
+    assert options == {'on_conflict': 'order_id', 'ignore_duplicates': True, 'returning': ReturnMethod.minimal}
+
+def test_empty_and_invalid_chunk_size(fake_supabase):
+    assert populate.insert_rows_in_chunks('order_table', [], chunk_size=10) == 0
+    assert fake_supabase.requests == []
+    with pytest.raises(ValueError):
+        populate.insert_rows_in_chunks('order_table', _rows(1), chunk_size=0)
+
+def test_tables_are_loaded_in_foreign_key_order(fake_supabase):
+    populate.insert_data_to_supabase(_rows(2), _rows(3), _rows(4), chunk_size=2)
+    tables = [table for table, _, _, _ in fake_supabase.requests]
+    assert tables == ['order_table'] + ['order_items_table'] * 2 + ['ingredient_usage_table'] * 2
@@ -0,0 +1,79 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+for module in ("fastapi", "prophet", "plotly", "phi"):
+    pytest.importorskip(module)
+
+import inventory_analytics
+
+INGREDIENTS = {
+    ingredient_id: {
+        "ingredient_name": name, "unit": "kg", "total_stock": 100.0, "current_stock": 40.0, "safe_factor": 15,
+        "average_daily_usage": 2.0, "max_daily_usage": 5.0, "stock_status": "normal"
+    }
+    for ingredient_id, name in [(1, "Tomate"), (2, "Queso")]
+}
+
+@pytest.fixture
+def dashboard_html(monkeypatch):
+    monkeypatch.setattr(inventory_analytics, "get_global_analysis",
+                        lambda *args, **kwargs: {"analysis": "**Resumen**\nTodo bien"})
+    monkeypatch.setattr(inventory_analytics, "get_reorder_analysis", lambda *args, **kwargs: {
+        1: {"reorder_point": 12.5, "stockout_probability": 0.25, "expected_days_until_empty": 4.0}
+    })
+    monkeypatch.setattr(inventory_analytics, "get_safety_coefficients", lambda *args, **kwargs: {1: 30.0, 2: 12.0})
+    monkeypatch.setattr(inventory_analytics, "_usage_frame", lambda *args, **kwargs: pd.DataFrame(
+        {"ds": pd.date_range("2024-01-01", periods=3), "y": [1.0, 2.0, 3.0]}))
+    monkeypatch.setattr(inventory_analytics, "_ingredient_forecast", lambda *args, **kwargs: pd.DataFrame(
+        {"ds": pd.date_range("2024-01-04", periods=3), "yhat": [1.0, 2.0, 3.0]}))
+    return inventory_analytics.generate_dashboard_html(INGREDIENTS)
+
+def test_ai_predictions_table_is_rendered(dashboard_html):
+    assert "{ai_predictions_table}" not in dashboard_html
+    assert "ai-predictions-section" in dashboard_html
+    for column in ("Punto de Reorden", "Prob. Desabasto (30 días)"):
+        assert column in dashboard_html
+    assert "12.50 kg" in dashboard_html and "25%" in dashboard_html
+    assert "Tomate" in dashboard_html and "Queso" in dashboard_html
+
+def test_ai_predictions_table_precedes_ingredient_sections(dashboard_html):
+    assert dashboard_html.index('ai-predictions-section">') < dashboard_html.index('ingredient-section">')
+
+def test_predictions_table_styles_are_included(dashboard_html):
+    assert ".status-critical {" in dashboard_html
+
+@pytest.mark.parametrize("params", [
+    {"lead_time": 100000}, {"lead_time": 0}, {"service_level": 0.9999}, {"service_level": 0.1}
+])
+def test_reorder_points_rejects_out_of_range_parameters(params):
+    with pytest.raises(inventory_analytics.HTTPException) as error:
+        asyncio.run(inventory_analytics.get_reorder_points(**params))
+    assert error.value.status_code == 400
+
+def test_reorder_analysis_rounds_service_level_for_cache(monkeypatch):
+    calls = []
+    monkeypatch.setattr(inventory_analytics, "get_inventory_ids", lambda location_id=None: [1])
+    monkeypatch.setattr(inventory_analytics, "get_stock_ledger", lambda location_id=None: type(
+        "Ledger", (), {"current_stock": lambda self, ingredient_id: 5.0})())
+    monkeypatch.setattr(inventory_analytics, "simulate_reorder_points",
+                        lambda *args, **kwargs: calls.append(kwargs["service_level"]) or {})
+    analytics = inventory_analytics.LocationAnalytics()
+    monkeypatch.setattr(inventory_analytics, "location_analytics", lambda location_id=None: analytics)
+    for service_level in (0.951, 0.9504, 0.95):
+        inventory_analytics.get_reorder_analysis(object(), service_level=service_level)
+    assert calls == [0.95]
+
+def test_global_analysis_context_includes_simulated_reorder(monkeypatch):
+    monkeypatch.setattr(inventory_analytics, "get_reorder_analysis", lambda *args, **kwargs: {
+        1: {"reorder_point": 12.5, "safety_stock": 2.5, "stockout_probability": 0.25,
+            "expected_days_until_empty": 4.0, "p10_days_until_empty": 2.0}
+    })
+    rollup = type("Rollup", (), {"labeled": lambda self, ingredient_id: {}})()
+    monkeypatch.setattr(inventory_analytics, "get_usage_rollups", lambda usage_matrix: {"week": rollup})
+    context = inventory_analytics._global_analysis_context(INGREDIENTS, usage_matrix=object())
+    reorder = {item["ingredient_id"]: item["reorder"] for item in context["ingredients"]}
+    assert reorder[1] == {"reorder_point": 12.5, "safety_stock": 2.5, "stockout_probability": 0.25,
+                          "expected_days_until_empty": 4.0}
+    assert reorder[2] is None
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("prophet")
+
+from demand_forecast import build_bom_matrix, daily_food_sales, forecast_ingredient_demand
+from usage_matrix import DailyUsageMatrix
+
+RECIPES = {1: [(1, 100.0), (2, 10.0)], 2: [(2, 20.0)]}
+
+PAGES = [
+    [{"food_id": 1, "quantity": 2, "order_date": "2024-01-01T12:00:00", "order_status": "Completada"},
+     {"food_id": 2, "quantity": 1, "order_date": "2024-01-01", "order_status": "Completada"},
+     {"food_id": 1, "quantity": 5, "order_date": "2024-01-02", "order_status": "Cancelada"}],
+    [{"food_id": 1, "quantity": 1, "order_date": "2024-01-03", "order_status": "Completada"},
+     {"food_id": 99, "quantity": 1, "order_date": "2024-01-03", "order_status": "Completada"},
+     {"food_id": 2, "quantity": 3, "order_date": None, "order_status": "Completada"}],
+]
+
+def mean_forecaster(dates, values, horizon):
+    return np.full(horizon, values.mean())
+
+def test_bom_matrix():
+    bom, food_ids, ingredient_ids = build_bom_matrix(RECIPES)
+    assert food_ids.tolist() == [1, 2] and ingredient_ids.tolist() == [1, 2]
+    assert bom.toarray().tolist() == [[100.0, 10.0], [0.0, 20.0]]
+
+def test_daily_sales_skip_cancelled_unknown_and_undated():
+    dates, sales = daily_food_sales(PAGES, np.array([1, 2]))
+    assert dates.astype(str).tolist() == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert sales.tolist() == [[2.0, 0.0, 1.0], [1.0, 0.0, 0.0]]
+    assert daily_food_sales([], np.array([1]))[1].shape == (1, 0)
+
+def test_shared_ingredients_add_up_across_dishes():
+    result = forecast_ingredient_demand(PAGES, horizon=2, food_ingredients=RECIPES, forecaster=mean_forecaster)
+    assert result["dates"].astype(str).tolist() == ["2024-01-04", "2024-01-05"]
+    assert np.allclose(result["food_forecast"], [[1.0, 1.0], [1 / 3, 1 / 3]])
+    assert np.allclose(result["ingredient_forecast"][:, 0], [100.0, 10.0 + 20.0 / 3])
+    assert result["calibration"].tolist() == [1.0, 1.0]
+
+def test_calibration_uses_actual_usage():
+    usage = DailyUsageMatrix.from_usage_rows([
+        {"ingredient_id": 1, "usage_date": "2024-01-01", "quantity_used": 330.0},
+        {"ingredient_id": 1, "usage_date": "2024-01-03", "quantity_used": 0.0},
+    ])
+    result = forecast_ingredient_demand(PAGES, usage_matrix=usage, horizon=1, food_ingredients=RECIPES,
+                                        forecaster=mean_forecaster)
+    assert result["calibration"][0] == pytest.approx(1.1)
+    assert result["calibration"][1] == 1.0
+
+def test_no_sales_raises():
+    with pytest.raises(ValueError):
+        forecast_ingredient_demand([], food_ingredients=RECIPES, forecaster=mean_forecaster)
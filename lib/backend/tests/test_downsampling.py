@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import MIN_CHART_POINTS, downsample_frame, lttb_indices
+
+def test_lttb_keeps_endpoints_and_size():
+    x = np.arange(1000)
+    y = np.sin(x / 25.0)
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(500)
+    y[123] = 100.0
+    y[377] = -100.0
+    indices = lttb_indices(np.arange(500), y, 20)
+    assert 123 in indices and 377 in indices
+
+def test_lttb_short_series_is_unchanged():
+    assert lttb_indices(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+@pytest.mark.parametrize("threshold", [-1, 0, 1, 2])
+def test_lttb_rejects_thresholds_below_minimum(threshold):
+    with pytest.raises(ValueError):
+        lttb_indices(np.arange(100), np.arange(100), threshold)
+
+def test_downsample_frame_with_dates():
+    df = pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=400), "y": np.random.default_rng(1).random(400)})
+    reduced = downsample_frame(df, max_points=40)
+    assert len(reduced) == 40
+    assert reduced["ds"].iloc[0] == df["ds"].iloc[0] and reduced["ds"].iloc[-1] == df["ds"].iloc[-1]
+    assert downsample_frame(df, max_points=None) is df
+
+def test_downsample_frame_rejects_small_budget():
+    df = pd.DataFrame({"ds": np.arange(10), "y": np.arange(10.0)})
+    with pytest.raises(ValueError):
+        downsample_frame(df, max_points=MIN_CHART_POINTS - 1)
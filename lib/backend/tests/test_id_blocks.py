@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+import populate_orders_2025 as populate
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 21)
+
+class FakeRpc:
+    def __init__(self, data):
+        self.data = data
+
+    def execute(self):
+        return self
+
+class FakeSupabase:
+    def __init__(self, data):
+        self.data, self.calls = data, []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return FakeRpc(self.data)
+
+@pytest.fixture
+def allocator(monkeypatch):
+    """reserve_id_blocks en memoria: rangos consecutivos por tipo de ID"""
+    next_ids = [1000, 2000, 3000, 4000]
+    calls = []
+    def reserve(*sizes):
+        calls.append(sizes)
+        block = tuple(next_ids)
+        for position, size in enumerate(sizes):
+            next_ids[position] += size
+        return block
+    monkeypatch.setattr(populate, "reserve_id_blocks", reserve)
+    return calls
+
+def test_reserve_id_blocks_calls_the_database_function(monkeypatch):
+    client = FakeSupabase([{'order_id_start': 5, 'order_item_id_start': 6, 'customer_id_start': 7,
+                            'usage_id_start': 8}])
+    monkeypatch.setattr(populate, "supabase", client)
+    assert populate.reserve_id_blocks(1, 2, 1, 3) == (5, 6, 7, 8)
+    assert client.calls == [('reserve_id_blocks', {'p_orders': 1, 'p_order_items': 2, 'p_customers': 1,
+                                                   'p_usage_rows': 3})]
+
+    monkeypatch.setattr(populate, "supabase", FakeSupabase([]))
+    with pytest.raises(RuntimeError):
+        populate.reserve_id_blocks(1, 1, 1, 1)
+
+def test_generator_reserves_exactly_what_it_uses(allocator):
+    orders, order_items, usage = populate.generate_orders_vectorized(START, END, seed=1)
+    assert allocator == [(len(orders['order_id']), len(order_items['order_item_id']),
+                          len(orders['order_id']), len(usage['id']))]
+    assert orders['order_id'][0] == 1000 and order_items['order_item_id'][0] == 2000
+    assert orders['customer_id'][0] == 3000 and usage['id'][0] == 4000
+
+def test_each_chunk_reserves_its_own_block(allocator, tmp_path, monkeypatch):
+    monkeypatch.setattr(populate, "insert_data_to_supabase", lambda *args: None)
+    checkpoint = populate.LoadCheckpoint(str(tmp_path / "checkpoint.json"), {})
+    populate.populate_streaming(START, END, chunk_days=7, seed=2, checkpoint=checkpoint)
+    assert len(allocator) == 3
+    assert checkpoint.id_blocks[0] == (1000, 2000, 3000, 4000)
+    assert checkpoint.id_blocks[1][0] == 1000 + allocator[0][0]
+
+def test_resume_reuses_recorded_blocks(allocator, tmp_path, monkeypatch):
+    checkpoint = populate.LoadCheckpoint(str(tmp_path / "checkpoint.json"), {})
+    first_run = []
+    def interrupted(orders, order_items, usage, chunk_size):
+        if first_run:
+            raise KeyboardInterrupt
+        first_run.append(orders[0]['order_id'])
+    monkeypatch.setattr(populate, "insert_data_to_supabase", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        populate.populate_streaming(START, END, chunk_days=7, seed=2, checkpoint=checkpoint)
+    reserved, recorded = len(allocator), dict(checkpoint.id_blocks)
+
+    resumed = []
+    monkeypatch.setattr(populate, "insert_data_to_supabase",
+                        lambda orders, order_items, usage, chunk_size: resumed.append(orders[0]['order_id']))
+    populate.populate_streaming(START, END, chunk_days=7, seed=2,
+                                checkpoint=populate.LoadCheckpoint.load(checkpoint.path))
+    # Los bloques pendientes con rango registrado se regeneran con él; solo los demás reservan uno nuevo
+    assert resumed[0] == recorded[1][0]
+    assert len(allocator) == reserved + 3 - len(recorded)
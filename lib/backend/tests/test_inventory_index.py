@@ -0,0 +1,42 @@
+import inventory_index
+from inventory_index import InventoryIndex
+
+ITEMS = [{"ingredient_id": 1, "ingredient_name": "Tomate"}, {"ingredient_id": 2, "ingredient_name": "Queso"}]
+
+class CountingLoader:
+    def __init__(self, items):
+        self.items, self.calls = items, 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.items
+
+def test_lookups_read_the_table_once():
+    loader = CountingLoader(ITEMS)
+    index = InventoryIndex(loader)
+    assert index.get(2) == ITEMS[1]
+    assert index.get(3) is None
+    assert 1 in index and index.ids() == {1, 2}
+    assert loader.calls == 1
+
+def test_returned_rows_are_copies():
+    index = InventoryIndex(CountingLoader(ITEMS))
+    index.get(1)["ingredient_name"] = "Cebolla"
+    index.items()[1]["ingredient_name"] = "Cebolla"
+    assert index.get(1)["ingredient_name"] == "Tomate" and index.get(2)["ingredient_name"] == "Queso"
+
+def test_ttl_and_invalidate_reload(monkeypatch):
+    now = {"value": 100.0}
+    monkeypatch.setattr(inventory_index.time, "monotonic", lambda: now["value"])
+    loader = CountingLoader(ITEMS)
+    index = InventoryIndex(loader, ttl=60)
+    index.ids()
+    now["value"] += 59
+    index.ids()
+    assert loader.calls == 1
+    now["value"] += 1
+    index.ids()
+    assert loader.calls == 2
+    index.invalidate()
+    index.ids()
+    assert loader.calls == 3
@@ -0,0 +1,64 @@
+import base64
+import json
+
+import pytest
+
+for module in ("fastapi", "prophet", "plotly", "phi"):
+    pytest.importorskip(module)
+
+import inventory_analytics
+from inventory_analytics import _decode_cursor, _encode_cursor, paginate_ingredients, project_history
+
+ITEMS = [{"ingredient_id": ingredient_id} for ingredient_id in (5, 1, 3, 2, 4)]
+
+def _cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def test_pages_cover_every_ingredient_once():
+    seen, after = [], None
+    while True:
+        page, cursor = paginate_ingredients(ITEMS, after, limit=2)
+        seen += [item["ingredient_id"] for item in page]
+        if cursor is None:
+            break
+        after = _decode_cursor(cursor)
+    assert seen == [1, 2, 3, 4, 5]
+
+def test_cursor_is_stable_when_ingredients_are_added():
+    page, cursor = paginate_ingredients(ITEMS, limit=2)
+    assert [item["ingredient_id"] for item in page] == [1, 2]
+    grown = ITEMS + [{"ingredient_id": 0}, {"ingredient_id": 6}]
+    page, _ = paginate_ingredients(grown, _decode_cursor(cursor), limit=2)
+    assert [item["ingredient_id"] for item in page] == [3, 4]
+
+def test_last_page_has_no_cursor():
+    page, cursor = paginate_ingredients(ITEMS, limit=5)
+    assert len(page) == 5 and cursor is None
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!", _cursor({}), _cursor({"after": "3"}), _cursor({"after": True}),
+    _cursor({"after": [1]}), _cursor({"after": None}), _cursor([1])
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor)
+    with pytest.raises(inventory_analytics.HTTPException) as error:
+        inventory_analytics.get_inventory_report_endpoint(None, cursor=cursor)
+    assert error.value.status_code == 400
+
+def test_cursor_round_trip():
+    assert _decode_cursor(_encode_cursor(42)) == 42
+
+def test_project_history_fields_and_since():
+    history = {
+        "ingredient_id": 1, "ingredient_name": "Tomate", "total_usage": 6.0,
+        "usage_history": {"2024-01-01": 1.0, "2024-01-02": 2.0, "2024-01-03": 3.0}
+    }
+    assert project_history(history, ["summary"]) == {"ingredient_id": 1, "ingredient_name": "Tomate",
+                                                     "total_usage": 6.0}
+    assert project_history(history, ["total_usage"]) == {"ingredient_id": 1, "ingredient_name": "Tomate",
+                                                         "total_usage": 6.0}
+    recent = project_history(history, since="2024-01-02")
+    assert recent["usage_history"] == {"2024-01-02": 2.0, "2024-01-03": 3.0}
+    assert recent["total_usage"] == 6.0
+    assert len(history["usage_history"]) == 3
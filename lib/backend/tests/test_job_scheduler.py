@@ -0,0 +1,92 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import job_scheduler
+from job_scheduler import CronSchedule, JobScheduler
+from shared_cache import SQLiteCacheStore
+
+def test_cron_next_after_daily():
+    schedule = CronSchedule("0 3 * * *")
+    assert schedule.next_after(datetime(2025, 1, 1, 2, 59, 30)) == datetime(2025, 1, 1, 3, 0)
+    assert schedule.next_after(datetime(2025, 1, 1, 3, 0)) == datetime(2025, 1, 2, 3, 0)
+
+def test_cron_lists_ranges_and_steps():
+    schedule = CronSchedule("*/15 8-10 * * 1,3")
+    assert schedule.minutes == {0, 15, 30, 45}
+    assert schedule.hours == {8, 9, 10}
+    # 2025-01-06 es lunes
+    assert schedule.matches(datetime(2025, 1, 6, 9, 30))
+    assert not schedule.matches(datetime(2025, 1, 7, 9, 30))
+    assert schedule.next_after(datetime(2025, 1, 6, 10, 45)) == datetime(2025, 1, 8, 8, 0)
+
+def test_cron_day_of_month_or_weekday():
+    # Con ambos campos restringidos basta con que coincida uno, como en cron
+    schedule = CronSchedule("0 0 1 * 0")
+    assert schedule.matches(datetime(2025, 1, 1))
+    assert schedule.matches(datetime(2025, 1, 5))
+    assert not schedule.matches(datetime(2025, 1, 6))
+
+def test_cron_skips_months():
+    schedule = CronSchedule("30 12 29 2 *")
+    assert schedule.next_after(datetime(2025, 3, 1)) == datetime(2028, 2, 29, 12, 30)
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-2 * * * *",
+                                        "x * * * *", "0 0 31 2 *"])
+def test_cron_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression).next_after(datetime(2025, 1, 1))
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_scheduler_runs_startup_and_usage_jobs():
+    runs = []
+    scheduler = JobScheduler(locations=[None], usage_delay=0)
+    scheduler.add_job("warmup", lambda location_id: runs.append(("warmup", location_id)), on_startup=True)
+    scheduler.add_job("refresh", lambda location_id: runs.append(("refresh", location_id)), on_usage=True)
+    scheduler.start()
+    try:
+        assert _wait_for(lambda: ("warmup", None) in runs)
+        scheduler.notify_usage(7)
+        assert _wait_for(lambda: ("refresh", 7) in runs)
+    finally:
+        scheduler.stop()
+
+def test_only_the_leader_runs_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_scheduler, "LEADER_CHECK_SECONDS", 0.05)
+    path = str(tmp_path / "cache.db")
+    runs = {"a": [], "b": []}
+
+    def make(name):
+        store = SQLiteCacheStore(path)
+        scheduler = JobScheduler(locations=[None], usage_delay=0,
+                                 leader=lambda: store.acquire_lease("scheduler", 0.5))
+        scheduler.add_job("warmup", lambda location_id: runs[name].append("warmup"), on_startup=True)
+        scheduler.add_job("refresh", lambda location_id: runs[name].append("refresh"), on_usage=True)
+        return store, scheduler
+
+    store_a, scheduler_a = make("a")
+    store_b, scheduler_b = make("b")
+    scheduler_a.start()
+    try:
+        assert _wait_for(lambda: runs["a"] == ["warmup"])
+        scheduler_b.start()
+        scheduler_a.notify_usage(None)
+        scheduler_b.notify_usage(None)
+        assert _wait_for(lambda: runs["a"] == ["warmup", "refresh"])
+        time.sleep(0.2)
+        assert runs["b"] == [] and not scheduler_b.leading
+
+        # Al caer el líder, el otro proceso toma la concesión y corre los trabajos de arranque
+        scheduler_a.stop()
+        store_a.release_lease("scheduler")
+        assert _wait_for(lambda: runs["b"] == ["warmup"])
+        assert scheduler_b.leading
+    finally:
+        scheduler_a.stop()
+        scheduler_b.stop()
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+import populate_orders_2025 as populate
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 21)
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+
+    def upsert(self, rows, on_conflict, **options):
+        self.rows, self.key = rows, on_conflict
+        return self
+
+    def execute(self):
+        stored = self.client.tables.setdefault(self.table, {})
+        for row in self.rows:
+            stored.setdefault(row[self.key], row)
+        # Timeout ambiguo: la petición se confirmó pero la respuesta no llegó
+        if self.client.timeouts:
+            self.client.timeouts -= 1
+            raise httpx.ReadTimeout("timeout")
+
+class FakeSupabase:
+    def __init__(self, timeouts=0):
+        self.tables = {}
+        self.timeouts = timeouts
+
+    def table(self, table):
+        return FakeQuery(self, table)
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(populate.time, "sleep", lambda seconds: None)
+
+def test_with_retries_retries_transient_errors():
+    attempts = []
+    def operation():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("sin conexión")
+        return "ok"
+    assert populate.with_retries(operation, attempts=5) == "ok"
+    assert len(attempts) == 3
+
+def test_with_retries_gives_up():
+    attempts = []
+    def transient():
+        attempts.append(1)
+        raise TimeoutError()
+    with pytest.raises(TimeoutError):
+        populate.with_retries(transient, attempts=3)
+    assert len(attempts) == 3
+
+    def permanent():
+        attempts.append(1)
+        raise ValueError("dato inválido")
+    with pytest.raises(ValueError):
+        populate.with_retries(permanent, attempts=3)
+    assert len(attempts) == 4
+
+def test_retried_chunks_are_not_duplicated(monkeypatch):
+    client = FakeSupabase(timeouts=3)
+    monkeypatch.setattr(populate, "supabase", client)
+    orders, order_items, usage = (
+        populate.columns_to_records(columns)
+        for columns in populate.generate_orders_vectorized(START, END, seed=1, id_start=(1, 1, 1, 1))
+    )
+    populate.insert_data_to_supabase(orders, order_items, usage, chunk_size=50)
+    populate.insert_data_to_supabase(orders, order_items, usage, chunk_size=50)
+    assert len(client.tables['order_table']) == len(orders)
+    assert len(client.tables['order_items_table']) == len(order_items)
+    assert len(client.tables['ingredient_usage_table']) == len(usage)
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = populate.LoadCheckpoint(path, {'seed': 1})
+    checkpoint.record_chunk(0, (10, 20, 30, 40), (3, 5, 7))
+    checkpoint.mark_completed(0)
+    loaded = populate.LoadCheckpoint.load(path)
+    assert loaded.params == {'seed': 1}
+    assert loaded.is_completed(0) and not loaded.is_completed(1)
+    assert loaded.chunk_sizes == {0: (3, 5, 7)}
+    assert loaded.id_blocks == {0: (10, 20, 30, 40)}
+
+def test_resume_skips_loaded_chunks_and_keeps_ids(tmp_path, monkeypatch):
+    loaded = {}
+    def load_chunk(orders, order_items, usage, chunk_size):
+        loaded.setdefault(orders[0]['order_date'][:10], []).append([row['id'] for row in usage])
+    monkeypatch.setattr(populate, "insert_data_to_supabase", load_chunk)
+    params = dict(chunk_days=7, seed=5, id_start=(1, 1, 1, 1))
+    populate.populate_streaming(START, END, **params)
+    full_run = dict(loaded)
+
+    # Primera ejecución interrumpida al cargar el segundo bloque
+    loaded.clear()
+    checkpoint = populate.LoadCheckpoint(str(tmp_path / "checkpoint.json"), {})
+    def interrupted(orders, order_items, usage, chunk_size):
+        if len(loaded) == 1:
+            raise KeyboardInterrupt
+        load_chunk(orders, order_items, usage, chunk_size)
+    monkeypatch.setattr(populate, "insert_data_to_supabase", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        populate.populate_streaming(START, END, checkpoint=checkpoint, **params)
+    assert checkpoint.completed == {0}
+
+    generated = []
+    generate = populate.generate_orders_vectorized
+    monkeypatch.setattr(populate, "generate_orders_vectorized",
+                        lambda start, *args, **kwargs: generated.append(start) or generate(start, *args, **kwargs))
+    monkeypatch.setattr(populate, "insert_data_to_supabase", load_chunk)
+    totals = populate.populate_streaming(START, END, checkpoint=populate.LoadCheckpoint.load(checkpoint.path),
+                                         **params)
+    assert totals['skipped_chunks'] == 1
+    assert START not in generated
+    assert loaded == full_run
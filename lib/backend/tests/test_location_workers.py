@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import location_workers
+from location_workers import LocationWorkerPool, in_worker_process, location_shard
+
+def test_shard_is_stable_and_in_range():
+    shards = [location_shard(location_id, 4) for location_id in range(50)]
+    assert shards == [location_shard(location_id, 4) for location_id in range(50)]
+    assert set(shards) <= {0, 1, 2, 3} and len(set(shards)) > 1
+    assert location_shard(None, 3) == location_shard(None, 3)
+
+def test_without_workers_tasks_run_in_the_api_process():
+    pool = LocationWorkerPool(workers=0)
+    assert asyncio.run(pool.run(1, divmod, 7, 2)) == (3, 1)
+    assert pool.submit(1, divmod, 9, 4) == (2, 1)
+    assert not in_worker_process()
+    pool.shutdown()
+
+def test_locations_run_in_their_shard_process():
+    pool = LocationWorkerPool(workers=2)
+    try:
+        pids = {location_id: asyncio.run(pool.run(location_id, os.getpid)) for location_id in range(6)}
+        assert os.getpid() not in pids.values()
+        for location_id, pid in pids.items():
+            same_shard = [other for other in pids if location_shard(other, 2) == location_shard(location_id, 2)]
+            assert {pids[other] for other in same_shard} == {pid}
+        assert asyncio.run(pool.run(0, location_workers.in_worker_process)) is True
+        assert pool.submit(0, divmod, 9, 4).result(timeout=30) == (2, 1)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import numpy as np
+
+import populate_orders_2025 as populate
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 14)
+ID_START = (100, 200, 300, 400)
+
+def _generate(seed=7, **kwargs):
+    return populate.generate_orders_vectorized(START, END, seed=seed, id_start=ID_START, **kwargs)
+
+def test_same_seed_same_data():
+    first, second = _generate(), _generate()
+    for a, b in zip(first, second):
+        assert a.keys() == b.keys()
+        assert all(np.array_equal(a[name], b[name]) for name in a)
+    assert not np.array_equal(first[0]['order_status'], _generate(seed=8)[0]['order_status'])
+
+def test_ids_and_totals_are_consistent():
+    orders, order_items, usage = _generate()
+    num_orders, num_items = len(orders['order_id']), len(order_items['order_item_id'])
+    assert orders['order_id'].tolist() == list(range(100, 100 + num_orders))
+    assert orders['customer_id'].tolist() == list(range(300, 300 + num_orders))
+    assert order_items['order_item_id'].tolist() == list(range(200, 200 + num_items))
+    assert set(order_items['order_id'].tolist()) <= set(orders['order_id'].tolist())
+    assert usage['id'].tolist() == list(range(400, 400 + len(usage['id'])))
+    assert np.allclose(order_items['total_price'], order_items['price_per_unit'] * order_items['quantity'])
+    totals = {order_id: 0.0 for order_id in orders['order_id'].tolist()}
+    for order_id, total in zip(order_items['order_id'].tolist(), order_items['total_price'].tolist()):
+        totals[order_id] += total
+    assert np.allclose(orders['total_amount'], [totals[order_id] for order_id in orders['order_id'].tolist()])
+
+def test_daily_order_counts_follow_weekday_pattern():
+    orders, _, _ = _generate()
+    days = orders['order_date'].astype('datetime64[D]')
+    for day, count in zip(*np.unique(days, return_counts=True)):
+        factor = populate.WEEKDAY_PATTERNS[day.item().weekday()]
+        assert int(8 * factor) <= count <= int(15 * factor)
+
+def test_usage_matches_recipes_and_skips_cancelled_orders():
+    orders, order_items, usage = _generate()
+    cancelled = set(orders['order_id'][orders['order_status'] == 'Cancelada'].tolist())
+    items = {item_id: food_id for item_id, food_id in zip(order_items['order_item_id'].tolist(),
+                                                         order_items['food_id'].tolist())}
+    rows = populate.columns_to_records(usage)
+    waste = [row for row in rows if row['order_id'] is None]
+    assert waste and all(row['order_item_id'] is None for row in waste)
+    for row in rows:
+        recipe = dict(populate.FOOD_INGREDIENTS[row['food_id']])
+        assert row['ingredient_id'] in recipe
+        if row['order_id'] is not None:
+            assert row['order_id'] not in cancelled
+            assert items[row['order_item_id']] == row['food_id']
+    assert [row['usage_date'] for row in rows] == sorted(row['usage_date'] for row in rows)
+
+def test_locations_generate_orders_per_location():
+    orders, order_items, usage = _generate(locations=[1, 2])
+    assert set(orders['location_id'].tolist()) == {1, 2}
+    assert set(usage['location_id'].tolist()) == {1, 2}
+    records = populate.columns_to_records(orders)
+    assert isinstance(records[0]['order_date'], str) and isinstance(records[0]['order_id'], int)
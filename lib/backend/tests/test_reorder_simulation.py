@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+import pytest
+
+from reorder_simulation import MAX_LEAD_TIME_DAYS, simulate_reorder_points
+from usage_matrix import DailyUsageMatrix
+
+def _matrix(usage_by_ingredient, days=60):
+    start = date(2024, 1, 1)
+    rows = [
+        {"ingredient_id": ingredient_id, "usage_date": (start + timedelta(days=day)).isoformat(),
+         "quantity_used": usage(day)}
+        for ingredient_id, usage in usage_by_ingredient.items()
+        for day in range(days)
+    ]
+    return DailyUsageMatrix.from_usage_rows(rows)
+
+def test_constant_usage_is_deterministic():
+    matrix = _matrix({1: lambda day: 2.0})
+    result = simulate_reorder_points(matrix, {1: 10.0}, lead_time=3, paths=200)[1]
+    assert result["reorder_point"] == pytest.approx(6.0)
+    assert result["safety_stock"] == pytest.approx(0.0)
+    assert not result["should_reorder"]
+    # 10 unidades a 2 por día: se supera el stock el sexto día (índice 5)
+    assert result["expected_days_until_empty"] == pytest.approx(5.0)
+    assert result["stockout_probability"] == 1.0
+
+def test_variable_usage_needs_safety_stock():
+    matrix = _matrix({1: lambda day: 10.0 if day % 4 == 0 else 1.0})
+    result = simulate_reorder_points(matrix, {1: 5.0}, lead_time=5, paths=500)[1]
+    assert result["safety_stock"] > 0
+    assert result["should_reorder"]
+    assert 0 < result["stockout_probability"] <= 1
+
+def test_same_seed_same_result_and_unused_ingredients_skipped():
+    matrix = _matrix({1: lambda day: float(day % 3), 2: lambda day: 1.0})
+    stock = {1: 20.0, 2: 50.0}
+    first = simulate_reorder_points(matrix, stock, ingredient_ids=[1, 2, 3], paths=100)
+    assert first == simulate_reorder_points(matrix, stock, ingredient_ids=[1, 2, 3], paths=100)
+    assert set(first) == {1, 2}
+
+@pytest.mark.parametrize("kwargs", [
+    {"lead_time": MAX_LEAD_TIME_DAYS + 1},
+    {"lead_time": -1},
+    {"service_level": 1.0},
+    {"service_level": 0},
+])
+def test_rejects_out_of_range_parameters(kwargs):
+    matrix = _matrix({1: lambda day: 1.0})
+    with pytest.raises(ValueError):
+        simulate_reorder_points(matrix, {1: 5.0}, paths=10, **kwargs)
@@ -0,0 +1,63 @@
+import pytest
+
+import inventory_queries
+from inventory_queries import ReportContext
+from stock_ledger import StockLedger
+from usage_matrix import DailyUsageMatrix
+
+ITEMS = [
+    {"ingredient_id": 1, "ingredient_name": "Tomate", "unit": "kg", "total_stock": 10, "safe_factor": 10},
+    {"ingredient_id": 2, "ingredient_name": "Queso", "unit": "kg", "total_stock": 100, "safe_factor": 10},
+    {"ingredient_id": 3, "ingredient_name": "Tortilla", "unit": "pz", "total_stock": 50, "safe_factor": 10},
+]
+
+ROWS = [
+    {"ingredient_id": 1, "usage_date": "2024-01-01", "quantity_used": 6.0},
+    {"ingredient_id": 1, "usage_date": "2024-01-03", "quantity_used": 3.5},
+    {"ingredient_id": 2, "usage_date": "2024-01-02", "quantity_used": 10.0},
+]
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    ledger = StockLedger()
+    ledger.reset({1: 9.5, 2: 10.0}, version=1)
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS, version=1)
+    monkeypatch.setattr(inventory_queries, "_location_states", {})
+    monkeypatch.setattr(inventory_queries, "get_inventory_items",
+                        lambda location_id=None: calls.append(("items", location_id)) or ITEMS)
+    monkeypatch.setattr(inventory_queries, "get_stock_ledger",
+                        lambda location_id=None: calls.append(("ledger", location_id)) or ledger)
+    monkeypatch.setattr(inventory_queries, "get_usage_matrix",
+                        lambda location_id=None: calls.append(("matrix", location_id)) or matrix)
+    return calls
+
+def test_each_query_runs_once_per_request(calls):
+    context = ReportContext()
+    assert context.ingredient_usage == {1: 9.5, 2: 10.0, 3: 0.0}
+    assert context.item(2)["ingredient_name"] == "Queso"
+    assert [item["ingredient_id"] for item in context.by_unit["kg"]] == [1, 2]
+    assert context.history(1) is context.history(1)
+    assert context.rollups is context.rollups
+    assert sorted(calls) == [("items", None), ("ledger", None), ("matrix", None)]
+
+def test_queries_are_scoped_to_the_location(calls):
+    context = ReportContext(4)
+    assert context.history(1)["total_usage"] == 9.5 and context.ingredient_usage[2] == 10.0
+    assert sorted(calls) == [("items", 4), ("ledger", 4), ("matrix", 4)]
+    assert inventory_queries.location_state(4).usage_rollups_cache["rollups"] is context.rollups
+
+def test_histories_and_status_index(calls):
+    context = ReportContext()
+    history = context.history(1)
+    assert history["usage_history"] == {"2024-01-01": 6.0, "2024-01-03": 3.5}
+    assert history["current_stock"] == 0.5 and history["stock_status"] == "critical"
+    assert context.history(3) is None and context.history(99) is None
+    assert context.by_status == {"critical": [1], "good": [2]}
+
+def test_preloaded_values_are_not_queried(calls):
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS[:1], version=2)
+    context = ReportContext(usage_matrix=matrix, items=ITEMS[:1])
+    assert context.usage_matrix is matrix
+    assert context.history(1)["total_usage"] == 6.0
+    assert calls == []
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("prophet")
+
+from scenario_simulation import build_scenario_baseline, parse_scenario, simulate_scenario, weekday_profile
+
+FOOD_INGREDIENTS = {1: [(10, 2.0)], 2: [(10, 1.0), (20, 0.5)]}
+
+def _sales_pages(weeks=2):
+    # 2024-01-01 es lunes: cada platillo vende 1 unidad por día, 3 los sábados
+    dates = np.datetime64('2024-01-01') + np.arange(7 * weeks)
+    return [[
+        {"food_id": food_id, "quantity": 3 if (date.astype(np.int64) + 3) % 7 == 5 else 1,
+         "order_date": f"{date}T12:00:00", "order_status": "Completada"}
+        for date in dates for food_id in (1, 2)
+    ]]
+
+@pytest.fixture
+def baseline():
+    return build_scenario_baseline(_sales_pages(), food_ingredients=FOOD_INGREDIENTS)
+
+def test_weekday_profile_averages_recent_weeks():
+    dates = np.datetime64('2024-01-01') + np.arange(14)
+    sales = np.tile(np.arange(14.0), (2, 1))
+    profile = weekday_profile(dates, sales, weeks=2)
+    assert profile[0, 0] == (0 + 7) / 2 and profile[1, 6] == (6 + 13) / 2
+
+def test_parse_scenario_accepts_names_and_ids():
+    volume, weekdays, foods = parse_scenario(
+        {"volume": 1.1, "weekday_multipliers": {"sábado": 1.2, "0": 0.5}, "food_multipliers": {"1": 2},
+         "remove_foods": [2]},
+        np.array([1, 2])
+    )
+    assert volume == 1.1
+    assert weekdays.tolist() == [0.5, 1, 1, 1, 1, 1.2, 1]
+    assert foods.tolist() == [2.0, 0.0]
+
+def test_parse_scenario_defaults():
+    volume, weekdays, foods = parse_scenario(None, np.array([1, 2]))
+    assert volume == 1.0 and weekdays.tolist() == [1.0] * 7 and foods.tolist() == [1.0, 1.0]
+
+@pytest.mark.parametrize("scenario", [
+    "volumen",
+    {"volume": -1},
+    {"volume": True},
+    {"volume": "mucho"},
+    {"weekday_multipliers": [1.2]},
+    {"weekday_multipliers": {"feriado": 1.2}},
+    {"weekday_multipliers": {"7": 1.2}},
+    {"weekday_multipliers": {"lunes": float("nan")}},
+    {"food_multipliers": [[1, 2]]},
+    {"food_multipliers": {"x": 2}},
+    {"food_multipliers": {"99": 2}},
+    {"remove_foods": 4},
+    {"remove_foods": [[1]]},
+    {"remove_foods": [True]},
+])
+def test_parse_scenario_rejects_malformed_scenarios(scenario):
+    with pytest.raises(ValueError):
+        parse_scenario(scenario, np.array([1, 2]))
+
+def test_simulate_without_changes_matches_baseline(baseline):
+    result = simulate_scenario(baseline, {10: 100.0, 20: 10.0}, {10: 20.0, 20: 0.0}, days=14)
+    assert result['ingredient_ids'].tolist() == [10, 20]
+    np.testing.assert_allclose(result['scenario']['stock'], result['baseline']['stock'])
+    # Lunes a viernes: ingrediente 10 usa 2 + 1 = 3 por día
+    assert result['dates'][0] == np.datetime64('2024-01-15')
+    np.testing.assert_allclose(result['baseline']['demand'][0, :5], 3.0)
+
+def test_simulate_scenario_changes_depletion(baseline):
+    stock, thresholds = {10: 100.0, 20: 10.0}, {10: 20.0, 20: 0.0}
+    result = simulate_scenario(baseline, stock, thresholds, {"volume": 2, "remove_foods": [1]}, days=30)
+    # Sin el platillo 1 y con el doble de volumen, el ingrediente 10 usa 2 por día de semana
+    np.testing.assert_allclose(result['scenario']['demand'][0, :5], 2.0)
+    np.testing.assert_allclose(result['scenario']['demand'][1], 2 * result['baseline']['demand'][1])
+    assert result['multipliers']['food'] == {1: 0.0, 2: 1.0}
+    base_days, scenario_days = result['baseline']['days_until_empty'], result['scenario']['days_until_empty']
+    assert scenario_days[1] < base_days[1]
+
+def test_days_until_is_nan_when_stock_lasts(baseline):
+    result = simulate_scenario(baseline, {10: 1e6, 20: 1e6}, {10: 0.0, 20: 0.0}, days=10)
+    assert np.isnan(result['baseline']['days_until_empty']).all()
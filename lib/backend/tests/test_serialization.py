@@ -0,0 +1,55 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("fastapi")
+
+import serialization
+from serialization import dumps, dumps_text, json_response
+
+class FakeRequest:
+    def __init__(self, accept_encoding=""):
+        self.headers = {"accept-encoding": accept_encoding}
+
+PAYLOAD = {
+    "values": np.arange(3, dtype=np.float32),
+    "count": np.int64(4),
+    "ratio": np.float64(0.5),
+    "flag": np.bool_(True),
+    "day": pd.Timestamp("2024-01-02"),
+    "frame": pd.DataFrame({"ds": ["2024-01-01"], "y": [1.5]}),
+    "nombre": "Jalapeño",
+}
+
+EXPECTED = {
+    "values": [0.0, 1.0, 2.0], "count": 4, "ratio": 0.5, "flag": True,
+    "day": "2024-01-02T00:00:00", "frame": [{"ds": "2024-01-01", "y": 1.5}], "nombre": "Jalapeño",
+}
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_numpy_and_pandas(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(dumps(PAYLOAD)) == EXPECTED
+    assert "\n  " in dumps_text({"a": 1}, indent=True)
+
+def test_unsupported_type_raises():
+    with pytest.raises(TypeError):
+        dumps({"valor": object()})
+
+def test_large_responses_are_gzipped():
+    payload = {"rows": list(range(1000))}
+    response = json_response(FakeRequest("gzip, deflate"), payload)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.body)) == payload
+
+def test_small_or_refused_encodings_are_not_compressed():
+    small = json_response(FakeRequest("gzip"), {"ok": True})
+    assert "Content-Encoding" not in small.headers and json.loads(small.body) == {"ok": True}
+    refused = json_response(FakeRequest("gzip;q=0"), {"rows": list(range(1000))})
+    assert "Content-Encoding" not in refused.headers
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from shared_cache import SQLiteCacheStore
+
+def test_concurrent_requests_compute_once(tmp_path):
+    path = str(tmp_path / "cache.db")
+    stores = [SQLiteCacheStore(path), SQLiteCacheStore(path)]
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"yhat": [1.0, 2.0]}
+
+    threads = [threading.Thread(target=lambda store=store: results.append(
+        store.get_or_compute("1", "forecast", 3, compute))) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(calls) == 1
+    assert results == [{"yhat": [1.0, 2.0]}] * 2
+
+def test_expired_claim_is_taken_over(tmp_path):
+    path = str(tmp_path / "cache.db")
+    crashed = SQLiteCacheStore(path, lease_seconds=0)
+    assert crashed._claim("1", "forecast", "3")
+    # El proceso que reservó el cálculo murió sin liberarlo: su reserva ya venció
+    assert SQLiteCacheStore(path).get_or_compute("1", "forecast", 3, lambda: "nuevo") == "nuevo"
+
+def test_write_after_invalidation_is_discarded(tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.db"))
+    generation = store.generation("1", 3)
+    store.invalidate("1", [3])
+    store.set("1", "forecast", 3, "viejo", generation)
+    assert store.get("1", "forecast", 3) == (False, None)
+    store.set("1", "forecast", 3, "nuevo", store.generation("1", 3))
+    assert store.get("1", "forecast", 3) == (True, "nuevo")
+
+def test_namespaces_are_independent(tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.db"))
+    store.set("1", "forecast", 3, "local 1")
+    store.set("2", "forecast", 3, "local 2")
+    assert store.sync_version("1", 4)
+    assert store.get("1", "forecast", 3) == (False, None)
+    assert store.get("2", "forecast", 3) == (True, "local 2")
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import stock_events
+from stock_events import StockBroadcaster, format_sse
+from stock_ledger import StockLedger, stock_status
+
+def state(ingredient_id, current_stock, status='good'):
+    return {"ingredient_id": ingredient_id, "current_stock": current_stock, "stock_status": status}
+
+def parse(message):
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+def test_stock_status_thresholds():
+    assert stock_status(5, 100, 10) == 'critical'
+    assert stock_status(20, 100, 10) == 'warning'
+    assert stock_status(50, 100, 10) == 'good'
+
+def test_ledger_status():
+    ledger = StockLedger()
+    ledger.load_inventory([{"ingredient_id": 1, "total_stock": 100, "safe_factor": 10}])
+    ledger.record_usage(1, 95)
+    assert ledger.status(1) == {"ingredient_id": 1, "current_stock": 5.0, "safe_threshold": 10.0,
+                                "stock_status": 'critical'}
+    assert ledger.ingredient_ids == [1]
+
+def test_publish_returns_only_changes():
+    broadcaster = StockBroadcaster()
+    assert broadcaster.publish([state(1, 10), state(2, 5)]) == [state(1, 10), state(2, 5)]
+    assert broadcaster.publish([state(1, 10), state(2, 4)]) == [state(2, 4)]
+    assert broadcaster.publish([dict(state(1, 10), safe_threshold=3)]) == []
+    assert broadcaster.snapshot() == [state(1, 10), state(2, 4)]
+
+def test_stream_sends_snapshot_then_changes():
+    async def scenario():
+        broadcaster = StockBroadcaster()
+        broadcaster.publish([state(1, 10)])
+        stream = broadcaster.stream()
+        assert parse(await stream.__anext__()) == ('snapshot', [state(1, 10)])
+        broadcaster.publish([state(1, 2, 'critical')])
+        assert parse(await stream.__anext__()) == ('stock', [state(1, 2, 'critical')])
+        await stream.aclose()
+        assert broadcaster.subscriber_count == 0
+    asyncio.run(scenario())
+
+def test_slow_client_gets_a_resync_snapshot(monkeypatch):
+    monkeypatch.setattr(stock_events, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def scenario():
+        broadcaster = StockBroadcaster()
+        stream = broadcaster.stream()
+        await stream.__anext__()
+        for stock in (9, 8, 7):
+            broadcaster.publish([state(1, stock)])
+        assert parse(await stream.__anext__()) == ('snapshot', [state(1, 7)])
+        await stream.aclose()
+    asyncio.run(scenario())
+
+def test_format_sse_keeps_unicode():
+    assert format_sse('stock', {"nombre": "Jalapeño"}) == 'event: stock\ndata: {"nombre":"Jalapeño"}\n\n'
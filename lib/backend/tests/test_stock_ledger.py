@@ -0,0 +1,43 @@
+import inventory_queries
+from stock_ledger import StockLedger
+
+ITEMS = [{"ingredient_id": 1, "total_stock": 10}, {"ingredient_id": 2, "total_stock": None}]
+
+def test_current_stock_is_updated_incrementally():
+    ledger = StockLedger()
+    ledger.load_inventory(ITEMS)
+    ledger.reset({1: 2.0}, version=1)
+    ledger.record_usage(1, 1.5, version=2)
+    ledger.record_usage(2, 3)
+    assert ledger.current_stock(1) == 6.5
+    assert ledger.current_stock(2) == -3.0
+    assert ledger.version == 2 and ledger.initialized
+
+def test_reconcile_reports_drift_and_adopts_recompute():
+    ledger = StockLedger()
+    ledger.reset({1: 2.0, 2: 1.0}, version=1)
+    report = ledger.reconcile({1: 2.0, 3: 4.0}, version=5)
+    assert set(report["drift"]) == {2, 3}
+    assert report["drift"][3] == {"ledger_usage": 0.0, "recomputed_usage": 4.0, "drift": -4.0}
+    assert report["ingredients_checked"] == 2
+    assert ledger.usage_totals() == {1: 2.0, 3: 4.0} and ledger.version == 5
+    assert ledger.last_reconciliation is report
+
+def test_ledger_is_recomputed_only_when_the_version_changes(monkeypatch):
+    version = {"value": 1}
+    recomputes = []
+    monkeypatch.setattr(inventory_queries, "_location_states", {})
+    monkeypatch.setattr(inventory_queries, "get_usage_data_version", lambda location_id=None: version["value"])
+    monkeypatch.setattr(inventory_queries, "compute_usage_totals",
+                        lambda location_id=None: recomputes.append(location_id) or {1: 3.0})
+
+    ledger = inventory_queries.get_stock_ledger()
+    inventory_queries.get_stock_ledger()
+    assert recomputes == [None] and ledger.total_usage(1) == 3.0
+
+    version["value"] = 2
+    inventory_queries.get_stock_ledger()
+    assert recomputes == [None, None] and ledger.version == 2
+
+    assert inventory_queries.get_stock_ledger(location_id=3) is not ledger
+    assert recomputes == [None, None, 3]
@@ -0,0 +1,54 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import populate_orders_2025 as populate
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 17)
+
+def _chunks(**kwargs):
+    return list(populate.iter_order_chunks(START, END, chunk_days=7, seed=3, id_start=(1, 1, 1, 1), **kwargs))
+
+def test_chunks_cover_the_range_with_contiguous_ids():
+    chunks = _chunks()
+    assert [(start.date().isoformat(), end.date().isoformat()) for _, start, end, _, _ in chunks] == [
+        ("2024-01-01", "2024-01-07"), ("2024-01-08", "2024-01-14"), ("2024-01-15", "2024-01-17")
+    ]
+    order_ids = np.concatenate([columns[0]['order_id'] for _, _, _, columns, _ in chunks])
+    item_ids = np.concatenate([columns[1]['order_item_id'] for _, _, _, columns, _ in chunks])
+    usage_ids = np.concatenate([columns[2]['id'] for _, _, _, columns, _ in chunks])
+    assert order_ids.tolist() == list(range(1, len(order_ids) + 1))
+    assert item_ids.tolist() == list(range(1, len(item_ids) + 1))
+    assert usage_ids.tolist() == list(range(1, len(usage_ids) + 1))
+
+def test_chunks_are_reproducible():
+    for (_, _, _, first, _), (_, _, _, second, _) in zip(_chunks(), _chunks()):
+        assert all(np.array_equal(first[0][name], second[0][name]) for name in first[0])
+
+def test_invalid_chunk_days():
+    with pytest.raises(ValueError):
+        next(populate.iter_order_chunks(START, END, chunk_days=0))
+
+def test_no_load_exports_without_touching_the_database(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("no debe consultar la base de datos")
+    monkeypatch.setattr(populate, "reserve_id_blocks", fail)
+    monkeypatch.setattr(populate, "insert_data_to_supabase", fail)
+
+    totals = populate.populate_streaming(START, END, chunk_days=7, seed=3, export_dir=str(tmp_path), load=False)
+    assert sorted(os.listdir(tmp_path / "orders")) == [f"part-{index:05d}.ndjson.gz" for index in range(3)]
+    with gzip.open(tmp_path / "orders" / "part-00000.ndjson.gz", "rt") as f:
+        assert json.loads(f.readline())['order_id'] == 1
+    assert totals['orders'] == sum(len(columns[0]['order_id']) for _, _, _, columns, _ in _chunks())
+
+def test_streaming_loads_every_chunk(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(populate, "insert_data_to_supabase",
+                        lambda orders, order_items, usage, chunk_size: loaded.append(len(orders)))
+    monkeypatch.setattr(populate, "reserve_id_blocks", lambda *sizes: (1, 1, 1, 1))
+    totals = populate.populate_streaming(START, END, chunk_days=7, seed=3)
+    assert len(loaded) == 3 and sum(loaded) == totals['orders']
@@ -0,0 +1,196 @@
+import threading
+
+import pytest
+
+import inventory_queries
+from inventory_queries import (
+    apply_usage_events, get_stock_ledger, get_usage_matrix, ingest_usage_events, validate_usage_events
+)
+
+ITEMS = [
+    {"ingredient_id": 1, "ingredient_name": "Tomate", "unit": "kg", "total_stock": 100, "safe_factor": 10},
+    {"ingredient_id": 2, "ingredient_name": "Queso", "unit": "kg", "total_stock": 50, "safe_factor": 10},
+]
+
+class FakeUsageTable:
+    """ingredient_usage_table en memoria; cada insert sube la versión como el trigger"""
+
+    def __init__(self, rows):
+        self.rows = [dict(row, id=position + 1) for position, row in enumerate(rows)]
+        self.version = 1
+        self.scans = 0
+        self.during_scan = None
+        self.after_insert = None
+
+    def insert(self, rows):
+        self.rows.extend(dict(row, id=len(self.rows) + position + 1) for position, row in enumerate(rows))
+        self.version += 1
+        if self.after_insert is not None:
+            self.after_insert()
+
+    def pages(self, *args, location_id=None, **kwargs):
+        self.scans += 1
+        rows = [row for row in self.rows if location_id is None or row.get('location_id') == location_id]
+        position = 0
+        while position < len(rows):
+            yield rows[position:position + 2]
+            position += 2
+            if self.during_scan is not None:
+                during_scan, self.during_scan = self.during_scan, None
+                during_scan()
+
+    def total(self, ingredient_id=None):
+        return sum(row['quantity_used'] for row in self.rows
+                   if ingredient_id is None or row['ingredient_id'] == ingredient_id)
+
+    def table(self, name):
+        table = self
+
+        class Insert:
+            def insert(self, rows, returning=None):
+                self.rows = rows
+                return self
+
+            def execute(self):
+                table.insert(self.rows)
+
+        return Insert()
+
+@pytest.fixture
+def usage_table(monkeypatch):
+    table = FakeUsageTable([
+        {"ingredient_id": 1, "quantity_used": 1.0, "usage_date": "2024-01-01"},
+        {"ingredient_id": 2, "quantity_used": 2.0, "usage_date": "2024-01-01"},
+        {"ingredient_id": 1, "quantity_used": 3.0, "usage_date": "2024-01-02"},
+    ])
+    monkeypatch.setattr(inventory_queries, "_location_states", {})
+    monkeypatch.setattr(inventory_queries, "supabase", table)
+    monkeypatch.setattr(inventory_queries, "get_usage_data_version", lambda location_id=None: table.version)
+    monkeypatch.setattr(inventory_queries, "iter_usage_pages", table.pages)
+    monkeypatch.setattr(inventory_queries, "get_inventory_items", lambda location_id=None: ITEMS)
+    return table
+
+def test_validate_normalizes_rows():
+    rows, errors = validate_usage_events([
+        {"ingredient_id": "1", "quantity_used": "2.5", "usage_date": "2024-01-03T10:00:00", "order_id": 7},
+        {"ingredient_id": 2, "quantity_used": 1, "usage_date": "2024-01-04"},
+    ])
+    assert errors == []
+    assert rows[0] == {"order_id": 7, "ingredient_id": 1, "quantity_used": 2.5, "usage_date": "2024-01-03"}
+    assert rows[1]["order_id"] is None and rows[1]["quantity_used"] == 1.0
+
+def test_validate_reports_every_invalid_row():
+    rows, errors = validate_usage_events([
+        {"ingredient_id": 1, "quantity_used": 1, "usage_date": "2024-01-01"},
+        {"ingredient_id": 1.5, "quantity_used": 1, "usage_date": "2024-01-01"},
+        {"ingredient_id": 1, "quantity_used": -1, "usage_date": "2024-01-01"},
+        {"ingredient_id": 1, "quantity_used": 1, "usage_date": "ayer"},
+        {"ingredient_id": 9, "quantity_used": 1},
+        {"ingredient_id": 1, "quantity_used": 1, "usage_date": "2024-01-01", "order_id": "x"},
+    ], known_ingredient_ids={1, 2})
+    assert rows == []
+    assert [error["index"] for error in errors] == [1, 2, 3, 4, 5]
+    assert "usage_date" in errors[3]["error"]
+
+@pytest.mark.parametrize("body", [{"ingredient_id": 1}, [1, 2], "x"])
+def test_validate_rejects_non_list_bodies(body):
+    assert validate_usage_events(body) == ([], [{"index": None, "error": "Se esperaba una lista de registros"}])
+
+def test_ingest_updates_ledger_and_matrix_in_place(usage_table):
+    assert get_stock_ledger().total_usage(1) == 4.0
+    assert get_usage_matrix().values.sum() == 6.0
+    scans = usage_table.scans
+
+    result = ingest_usage_events([
+        {"ingredient_id": 1, "quantity_used": 5.0, "usage_date": "2024-01-03"},
+        {"ingredient_id": 2, "quantity_used": 1.0, "usage_date": "2024-01-03"},
+    ], chunk_size=1)
+    assert result == {"accepted": 2, "errors": [], "version": 3}
+    assert usage_table.version == 3
+
+    assert get_stock_ledger().total_usage(1) == 9.0
+    matrix = get_usage_matrix()
+    assert matrix.version == 3 and matrix.row(1).tolist() == [1.0, 3.0, 5.0]
+    assert usage_table.scans == scans
+
+def test_invalid_batch_inserts_nothing(usage_table):
+    result = ingest_usage_events([
+        {"ingredient_id": 1, "quantity_used": 5.0, "usage_date": "2024-01-03"},
+        {"ingredient_id": 3, "quantity_used": 1.0, "usage_date": "2024-01-03"},
+    ])
+    assert result["accepted"] == 0 and result["errors"][0]["index"] == 1
+    assert usage_table.version == 1 and len(usage_table.rows) == 3
+
+def test_ingest_for_a_location_tags_rows_and_updates_only_its_state(usage_table):
+    assert get_stock_ledger().total_usage(2) == 2.0
+    assert get_stock_ledger(location_id=7).total_usage(2) == 0.0
+    get_usage_matrix(location_id=7)
+    scans = usage_table.scans
+
+    ingest_usage_events([
+        {"ingredient_id": 2, "quantity_used": 4.0, "usage_date": "2024-01-03"}
+    ], location_id=7)
+    assert usage_table.rows[-1]["location_id"] == 7
+    assert get_stock_ledger(location_id=7).total_usage(2) == 4.0
+    assert get_usage_matrix(location_id=7).values.sum() == 4.0
+    assert usage_table.scans == scans
+    assert inventory_queries.location_state(None).stock_ledger.total_usage(2) == 2.0
+
+def test_apply_usage_events_only_updates_aggregates_at_the_previous_version(usage_table):
+    get_stock_ledger()
+    get_usage_matrix()
+    scans = usage_table.scans
+    # Lote insertado por otro proceso (p. ej. la API, visto desde un worker)
+    batch = [{"ingredient_id": 1, "quantity_used": 5.0, "usage_date": "2024-01-03"}]
+    usage_table.insert(batch)
+    apply_usage_events(batch, 1, 2)
+    apply_usage_events(batch, 1, 2)
+
+    assert get_stock_ledger().total_usage(1) == 9.0
+    matrix = get_usage_matrix()
+    assert matrix.version == 2 and matrix.values.sum() == 11.0
+    assert usage_table.scans == scans
+
+def _concurrent_ingest(usage_table):
+    """
+    Ingesta en otro hilo que confirma su lote en la base durante un recorrido del historial
+    y aplica el lote a los agregados en memoria cuando el recorrido ya terminó
+    """
+    inserted, resume = threading.Event(), threading.Event()
+    usage_table.after_insert = lambda: (inserted.set(), resume.wait(5))
+    ingest = threading.Thread(target=ingest_usage_events, args=([
+        {"ingredient_id": 1, "quantity_used": 5.0, "usage_date": "2024-01-05"}
+    ],))
+
+    def during_scan():
+        usage_table.during_scan = None
+        ingest.start()
+        assert inserted.wait(5)
+        usage_table.after_insert = None
+
+    usage_table.during_scan = during_scan
+
+    def finish_ingest():
+        resume.set()
+        ingest.join(5)
+    return finish_ingest
+
+def test_matrix_built_during_an_ingest_is_not_counted_twice(usage_table):
+    get_stock_ledger()
+    finish_ingest = _concurrent_ingest(usage_table)
+    matrix = get_usage_matrix()
+    assert matrix.version is None
+    finish_ingest()
+
+    matrix = get_usage_matrix()
+    assert matrix.version == usage_table.version == 2
+    assert matrix.values.sum() == usage_table.total() == 11.0
+
+def test_ledger_built_during_an_ingest_is_not_counted_twice(usage_table):
+    finish_ingest = _concurrent_ingest(usage_table)
+    assert get_stock_ledger().version is None
+    finish_ingest()
+
+    ledger = get_stock_ledger()
+    assert ledger.version == 2
+    assert ledger.total_usage(1) == usage_table.total(1) == 9.0
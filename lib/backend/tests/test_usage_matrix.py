@@ -0,0 +1,70 @@
+import numpy as np
+
+from usage_matrix import DailyUsageMatrix
+
+ROWS = [
+    {"ingredient_id": 2, "usage_date": "2024-01-03", "quantity_used": 1.5},
+    {"ingredient_id": 1, "usage_date": "2024-01-01", "quantity_used": 2.0},
+    {"ingredient_id": 1, "usage_date": "2024-01-01T18:30:00", "quantity_used": 1.0},
+    {"ingredient_id": 1, "usage_date": "2024-01-04", "quantity_used": 4.0},
+]
+
+def test_matrix_is_calendar_aligned():
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS, ingredient_ids=[3], version=7)
+    assert matrix.ingredient_ids.tolist() == [1, 2, 3]
+    assert matrix.num_days == 4 and matrix.version == 7
+    assert matrix.row(1).tolist() == [3.0, 0.0, 0.0, 4.0]
+    assert matrix.row(2).tolist() == [0.0, 0.0, 1.5, 0.0]
+    assert matrix.row(3).tolist() == [0.0] * 4
+    assert matrix.row(99).tolist() == [0.0] * 4
+    assert 3 in matrix and 99 not in matrix
+    assert not matrix.values.flags.writeable
+
+def test_explicit_calendar_drops_rows_outside_it():
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS, start_date="2024-01-02", end_date="2024-01-05")
+    assert matrix.row(1).tolist() == [0.0, 0.0, 4.0, 0.0]
+
+def test_series_frame_and_history():
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS)
+    assert matrix.active_row(2).tolist() == [1.5, 0.0]
+    series = matrix.series(2, trim_leading=True)
+    assert series.tolist() == [1.5, 0.0]
+    assert str(series.index[0].date()) == "2024-01-03"
+    frame = matrix.to_frame(trim_leading=True)
+    assert np.isnan(frame[2].iloc[0]) and frame[1].iloc[1] == 0.0
+    assert matrix.usage_history(1) == {"2024-01-01": 3.0, "2024-01-04": 4.0}
+
+def test_save_and_load(tmp_path):
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS, version=3)
+    path = str(tmp_path / "usage")
+    matrix.save(path)
+    loaded = DailyUsageMatrix.load(path)
+    assert np.array_equal(loaded.values, matrix.values)
+    assert loaded.ingredient_ids.tolist() == [1, 2]
+    assert loaded.start_date == matrix.start_date and loaded.version == 3
+
+def test_shared_matrix_is_rebuilt_only_when_the_version_changes(monkeypatch):
+    import inventory_queries
+
+    version = {"value": 4}
+    fetches = []
+    monkeypatch.setattr(inventory_queries, "get_usage_data_version", lambda location_id=None: version["value"])
+    monkeypatch.setattr(inventory_queries, "iter_usage_pages",
+                        lambda location_id=None: fetches.append(location_id) or [ROWS])
+    monkeypatch.setattr(inventory_queries, "_location_states", {})
+
+    first = inventory_queries.get_usage_matrix()
+    assert inventory_queries.get_usage_matrix() is first
+    version["value"] = 5
+    assert inventory_queries.get_usage_matrix() is not first
+    assert fetches == [None, None]
+
+    # Cada local tiene su propia matriz
+    assert inventory_queries.get_usage_matrix(location_id=2) is not inventory_queries.get_usage_matrix()
+    assert fetches == [None, None, 2]
+
+def test_series_date_range():
+    matrix = DailyUsageMatrix.from_usage_rows(ROWS)
+    series = matrix.series(1, start="2024-01-02", end="2024-01-04")
+    assert series.tolist() == [0.0, 0.0, 4.0]
+    assert str(series.index[0].date()) == "2024-01-02"
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import pytest
+
+from usage_matrix import DailyUsageMatrix
+from usage_monitor import UsageMonitor
+
+START = date(2024, 1, 1)
+
+def _rows(usage_by_day, ingredient_id=1):
+    return [
+        {"ingredient_id": ingredient_id, "usage_date": (START + timedelta(days=day)).isoformat(),
+         "quantity_used": quantity}
+        for day, quantity in usage_by_day
+    ]
+
+# Diez días alternando 1 y 3 (media 2, desviación ~1.05), el primero sin uso
+HISTORY = [(day, 1.0 if day % 2 else 3.0) for day in range(1, 11)]
+
+def test_seed_matches_recording_day_by_day():
+    rows = _rows(HISTORY + [(13, 2.0)]) + _rows([(4, 5.0), (13, 1.0)], ingredient_id=2)
+    recorded = UsageMonitor()
+    recorded.record_many(sorted(rows, key=lambda row: row["usage_date"]))
+    seeded = UsageMonitor()
+    seeded.seed_from_matrix(DailyUsageMatrix.from_usage_rows(rows))
+
+    for ingredient_id in (1, 2):
+        expected, actual = recorded.state(ingredient_id), seeded.state(ingredient_id)
+        assert actual.keys() == expected.keys()
+        for key, value in expected.items():
+            assert actual[key] == (pytest.approx(value) if isinstance(value, float) else value), key
+
+def test_alerts_once_per_level_and_day():
+    monitor = UsageMonitor()
+    monitor.record_many(_rows(HISTORY))
+    assert monitor.record(1, "2024-01-12", 4.5)["level"] == "warning"
+    assert monitor.record(1, "2024-01-12", 0.1) is None
+    assert monitor.record(1, "2024-01-12", 1.0)["level"] == "critical"
+    assert monitor.record(1, "2024-01-12", 5.0) is None
+    assert [alert["level"] for alert in monitor.alerts()] == ["warning", "critical"]
+    assert [alert["level"] for alert in monitor.alerts(level="critical")] == ["critical"]
+
+def test_no_alerts_before_enough_history():
+    monitor = UsageMonitor()
+    assert monitor.record_many(_rows([(0, 1.0), (1, 1.0), (2, 50.0)])) == []
+
+def test_late_rows_are_counted_and_ignored():
+    monitor = UsageMonitor()
+    monitor.record_many(_rows([(0, 1.0), (2, 1.0)]))
+    monitor.record(1, "2024-01-02", 9.0)
+    assert monitor.late_rows == 1
+    assert monitor.state(1)["days_observed"] == 2
+
+def test_seeded_day_still_alerts_when_usage_grows():
+    monitor = UsageMonitor()
+    monitor.seed_from_matrix(DailyUsageMatrix.from_usage_rows(_rows(HISTORY + [(11, 2.0)])))
+    assert monitor.alerts() == []
+    assert monitor.record(1, "2024-01-12", 2.5)["level"] == "warning"
+    assert monitor.record(1, "2024-01-12", 1.0)["level"] == "critical"
+
+def test_seeded_anomalous_day_is_not_alerted_again():
+    monitor = UsageMonitor()
+    monitor.seed_from_matrix(DailyUsageMatrix.from_usage_rows(_rows(HISTORY + [(11, 4.5)])))
+    assert monitor.record(1, "2024-01-12", 0.1) is None
+    assert monitor.record(1, "2024-01-12", 1.0)["level"] == "critical"
+    assert monitor.record(1, "2024-01-13", 2.0) is None
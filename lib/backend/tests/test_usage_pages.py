@@ -0,0 +1,94 @@
+import re
+
+import numpy as np
+import pytest
+
+import inventory_queries
+from inventory_queries import iter_usage_pages
+from usage_matrix import DailyUsageMatrix
+
+KEYSET = re.compile(r"usage_date\.gt\.(.+),and\(usage_date\.eq\.(.+),id\.gt\.(\d+)\)")
+
+class FakeUsageQuery:
+    """Consulta de PostgREST sobre filas en memoria, con el límite max-rows del servidor"""
+
+    def __init__(self, rows, max_rows, queries):
+        self.rows, self.max_rows, self.queries = rows, max_rows, queries
+        self.filters, self.row_limit = [], None
+
+    def select(self, columns):
+        self.columns = [column.strip() for column in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def or_(self, condition):
+        date, same_date, row_id = KEYSET.fullmatch(condition).groups()
+        self.filters.append(lambda row: row['usage_date'] > date
+                            or (row['usage_date'] == same_date and row['id'] > int(row_id)))
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, row_limit):
+        self.row_limit = row_limit
+        return self
+
+    def execute(self):
+        self.queries.append(self)
+        rows = sorted((row for row in self.rows if all(check(row) for check in self.filters)),
+                      key=lambda row: (row['usage_date'], row['id']))
+        rows = rows[:min(self.row_limit, self.max_rows)]
+        return type("Response", (), {"data": [{column: row[column] for column in self.columns} for row in rows]})
+
+class FakeSupabase:
+    def __init__(self, rows, max_rows=1000):
+        self.rows, self.max_rows, self.queries = rows, max_rows, []
+
+    def table(self, name):
+        return FakeUsageQuery(self.rows, self.max_rows, self.queries)
+
+ROWS = [
+    {"id": row_id, "ingredient_id": 1 + row_id % 3, "quantity_used": float(row_id),
+     "usage_date": f"2024-01-{1 + row_id // 4:02d}", "location_id": 1 + row_id % 2}
+    for row_id in (7, 1, 2, 9, 4, 3, 8, 5, 6, 10, 11)
+]
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeSupabase(ROWS)
+    monkeypatch.setattr(inventory_queries, "supabase", client)
+    return client
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_pages_cover_every_row_in_key_order(client, prefetch):
+    pages = list(iter_usage_pages(page_size=3, prefetch=prefetch))
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    ids = [row['id'] for page in pages for row in page]
+    assert ids == sorted(ids, key=lambda row_id: (f"2024-01-{1 + row_id // 4:02d}", row_id))
+    assert set(ids) == {row['id'] for row in ROWS}
+
+def test_short_pages_from_max_rows_do_not_end_the_scan(client):
+    client.max_rows = 2
+    pages = list(iter_usage_pages(page_size=5))
+    assert sum(len(page) for page in pages) == len(ROWS)
+    assert all(len(page) == 2 for page in pages[:-1])
+
+def test_ingredient_filter_and_columns(client):
+    rows = [row for page in iter_usage_pages(columns="quantity_used", ingredient_id=2, page_size=2)
+            for row in page]
+    assert {row['id'] for row in rows} == {row['id'] for row in ROWS if row['ingredient_id'] == 2}
+    assert set(rows[0]) == {'quantity_used', 'usage_date', 'id'}
+
+def test_location_filter(client):
+    rows = [row for page in iter_usage_pages(page_size=2, location_id=2) for row in page]
+    assert {row['id'] for row in rows} == {row['id'] for row in ROWS if row['location_id'] == 2}
+
+def test_matrix_from_pages_matches_rows(client):
+    by_pages = DailyUsageMatrix.from_usage_pages(iter_usage_pages(page_size=4))
+    by_rows = DailyUsageMatrix.from_usage_rows(ROWS)
+    assert np.array_equal(by_pages.values, by_rows.values)
+    assert DailyUsageMatrix.from_usage_pages([]).values.shape[1] == 1
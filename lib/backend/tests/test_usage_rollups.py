@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from usage_matrix import DailyUsageMatrix
+from usage_rollups import UsageRollups, period_label, period_starts
+
+ROWS = [
+    {"ingredient_id": 1, "usage_date": "2024-12-30", "quantity_used": 1.0},
+    {"ingredient_id": 1, "usage_date": "2025-01-02", "quantity_used": 2.0},
+    {"ingredient_id": 1, "usage_date": "2025-01-06", "quantity_used": 4.0},
+    {"ingredient_id": 2, "usage_date": "2025-02-01", "quantity_used": 3.0},
+]
+
+def rollups(rows=ROWS, version=1):
+    return UsageRollups.from_matrix(DailyUsageMatrix.from_usage_rows(rows, version=version))
+
+def test_period_starts_and_labels():
+    dates = np.array(["2025-01-01", "2025-01-05", "2025-01-06"], dtype="datetime64[D]")
+    assert period_starts(dates, "week").astype(str).tolist() == ["2024-12-30", "2024-12-30", "2025-01-06"]
+    assert period_starts(dates, "month").astype(str).tolist() == ["2025-01-01"] * 3
+    assert period_label("2024-12-30", "week") == "2025-W01"
+    assert period_label("2025-01-06", "month") == "2025-01"
+    with pytest.raises(ValueError):
+        period_starts(dates, "year")
+
+def test_iso_weeks_and_months():
+    built = rollups()
+    assert built["week"].labeled(1) == {"2025-W01": 3.0, "2025-W02": 4.0}
+    assert built["month"].labeled(1) == {"2024-12": 1.0, "2025-01": 6.0}
+    assert built["month"].labeled(2) == {"2025-02": 3.0}
+    assert built.daily_usage(1).tolist() == [1.0, 2.0, 4.0]
+    with pytest.raises(ValueError):
+        built["year"]
+
+def test_incremental_update_matches_rebuild():
+    new_rows = [
+        {"ingredient_id": 3, "usage_date": "2025-03-03", "quantity_used": 5.0},
+        {"ingredient_id": 1, "usage_date": "2025-01-07", "quantity_used": 1.0},
+        {"ingredient_id": 1, "usage_date": "2024-11-15", "quantity_used": 2.0},
+    ]
+    updated = rollups().with_usage_rows(new_rows, version=2)
+    rebuilt = rollups(ROWS + new_rows, version=2)
+    assert updated.version == 2
+    for granularity in ("day", "week", "month"):
+        for ingredient_id in (1, 2, 3):
+            assert updated[granularity].labeled(ingredient_id) == rebuilt[granularity].labeled(ingredient_id)
+
+def test_series_range():
+    series = rollups()["week"].series(1, start="2025-01-01", end="2025-01-12")
+    assert series.tolist() == [3.0, 4.0]
+    assert str(series.index[0].date()) == "2024-12-30"
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from statsmodels.tsa.seasonal import seasonal_decompose
+
+from usage_statistics import compute_usage_statistics, usage_frame_from_histories
+
+def reference_statistics(series):
+    """Cálculo original, ingrediente por ingrediente, con scipy y statsmodels."""
+    decomposition = seasonal_decompose(series, period=7, model='additive')
+    return {
+        "mean": series.mean(),
+        "median": series.median(),
+        "std": series.std(),
+        "cv": series.std() / series.mean() * 100,
+        "skewness": stats.skew(series),
+        "kurtosis": stats.kurtosis(series),
+        "trend_slope": np.polyfit(range(len(series)), series, 1)[0],
+        "seasonality_strength": np.std(decomposition.seasonal) / np.std(series),
+        "autocorrelation": series.autocorr(),
+        "anomalies_count": int((np.abs(stats.zscore(series)) > 3).sum()),
+    }
+
+def usage_frame(days=60, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days, freq="D")
+    weekly = np.tile([5, 3, 3, 4, 6, 9, 8], days // 7 + 1)[:days]
+    frame = pd.DataFrame({
+        "harina": weekly * 2 + rng.normal(0, 1, days) + np.arange(days) * 0.05,
+        "queso": rng.gamma(2.0, 3.0, days),
+        "salsa": weekly + rng.normal(0, 0.5, days),
+    }, index=dates)
+    frame.iloc[10, 2] = 80  # Anomalía
+    # Días sin registro para algunos ingredientes
+    frame.iloc[[3, 17, 18, 40], 1] = np.nan
+    return frame
+
+def test_matches_per_ingredient_reference():
+    frame = usage_frame()
+    statistics = compute_usage_statistics(frame)
+    for column in frame.columns:
+        expected = reference_statistics(frame[column].dropna())
+        for name, value in expected.items():
+            assert statistics[column][name] == pytest.approx(value, rel=1e-9, abs=1e-9), (column, name)
+    assert statistics["salsa"]["anomalies_count"] == 1
+
+def test_short_histories_are_left_empty():
+    frame = usage_frame().iloc[:30].copy()
+    frame.iloc[:20, 0] = np.nan
+    statistics = compute_usage_statistics(frame)
+    assert statistics["harina"] == {}
+    assert statistics["queso"]
+
+def test_empty_frame():
+    assert compute_usage_statistics(pd.DataFrame(columns=["harina"], dtype=float)) == {"harina": {}}
+
+def test_frame_from_histories():
+    frame = usage_frame_from_histories({
+        "harina": [{"created_at": "2024-01-02", "quantity": 2.0}, {"created_at": "2024-01-01", "quantity": 1.0}],
+        "queso": [{"created_at": "2024-01-02", "quantity": 3.0}],
+        "salsa": [],
+    })
+    assert list(frame.index) == list(pd.to_datetime(["2024-01-01", "2024-01-02"]))
+    assert frame["harina"].tolist() == [1.0, 2.0]
+    assert np.isnan(frame["queso"].iloc[0])
+    assert frame["salsa"].isna().all()
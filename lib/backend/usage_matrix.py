@@ -0,0 +1,166 @@
+import json
+import numpy as np
+import pandas as pd
+
+def _rows_to_arrays(rows):
+    """Columnas ingredient_id, usage_date y quantity_used de las filas como arrays NumPy"""
+    row_ids = np.fromiter((row['ingredient_id'] for row in rows), dtype=np.int64, count=len(rows))
+    row_dates = np.array([str(row['usage_date'])[:10] for row in rows], dtype='datetime64[D]')
+    row_quantities = np.fromiter((row['quantity_used'] for row in rows), dtype=np.float64, count=len(rows))
+    return row_ids, row_dates, row_quantities
+
+class DailyUsageMatrix:
+    """
+    Uso diario de ingredientes como matriz densa float32 ingredientes x días calendario.
+    Los días sin registros valen 0, así que todas las series quedan alineadas al
+    mismo calendario. La matriz es de solo lectura: se construye una vez por versión
+    de los datos y se comparte entre el dashboard, las estadísticas y los modelos.
+    """
+
+    def __init__(self, values, start_date, ingredient_ids, version=None):
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2 or values.shape[0] != len(ingredient_ids):
+            raise ValueError("values debe tener forma (ingredientes, días)")
+        if values.flags.writeable:
+            values.flags.writeable = False
+
+        self.values = values
+        self.start_date = np.datetime64(start_date, 'D')
+        self.ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        self.version = version
+        self._positions = {int(ingredient_id): position
+                           for position, ingredient_id in enumerate(self.ingredient_ids)}
+
+    @classmethod
+    def from_usage_rows(cls, rows, ingredient_ids=None, start_date=None, end_date=None, version=None):
+        """
+        Construye la matriz a partir de filas de ingredient_usage_table
+        (ingredient_id, usage_date, quantity_used). ingredient_ids permite incluir
+        ingredientes sin uso; start_date/end_date fijan el calendario.
+        """
+        row_ids, row_dates, row_quantities = _rows_to_arrays(rows)
+        return cls._from_arrays(row_ids, row_dates, row_quantities, ingredient_ids, start_date, end_date, version)
+
+    @classmethod
+    def from_usage_pages(cls, pages, ingredient_ids=None, start_date=None, end_date=None, version=None):
+        """
+        Como from_usage_rows, pero a partir de páginas de filas (p. ej. iter_usage_pages).
+        Cada página se convierte a arrays al llegar, así que nunca se guardan las filas completas.
+        """
+        arrays = [_rows_to_arrays(page) for page in pages]
+        if not arrays:
+            arrays = [_rows_to_arrays([])]
+        row_ids, row_dates, row_quantities = (np.concatenate(parts) for parts in zip(*arrays))
+        return cls._from_arrays(row_ids, row_dates, row_quantities, ingredient_ids, start_date, end_date, version)
+
+    @classmethod
+    def _from_arrays(cls, row_ids, row_dates, row_quantities, ingredient_ids, start_date, end_date, version):
+        ids = np.unique(row_ids) if ingredient_ids is None else np.union1d(row_ids, ingredient_ids)
+        if start_date is None:
+            start_date = row_dates.min() if len(row_dates) else np.datetime64('today', 'D')
+        if end_date is None:
+            end_date = row_dates.max() if len(row_dates) else start_date
+        start = np.datetime64(start_date, 'D')
+        num_days = int((np.datetime64(end_date, 'D') - start).astype(np.int64)) + 1
+
+        in_range = (row_dates >= start) & (row_dates < start + num_days)
+        rows_idx = np.searchsorted(ids, row_ids[in_range])
+        days_idx = (row_dates[in_range] - start).astype(np.int64)
+
+        # Acumular en float64 y guardar en float32
+        totals = np.zeros(len(ids) * num_days)
+        np.add.at(totals, rows_idx * num_days + days_idx, row_quantities[in_range])
+        return cls(totals.reshape(len(ids), num_days), start, ids, version=version)
+
+    def with_usage_rows(self, rows, version=None):
+        """
+        Nueva matriz con el uso de rows sumado a esta. Amplía los ingredientes y el
+        calendario si las filas los exceden; solo se copia la matriz una vez.
+        """
+        if not rows:
+            return DailyUsageMatrix(self.values, self.start_date, self.ingredient_ids, version=version)
+
+        delta = DailyUsageMatrix.from_usage_rows(rows)
+        ids = np.union1d(self.ingredient_ids, delta.ingredient_ids)
+        start = min(self.start_date, delta.start_date)
+        end = max(self.start_date + self.num_days, delta.start_date + delta.num_days)
+        values = np.zeros((len(ids), int((end - start).astype(np.int64))))
+        for matrix in (self, delta):
+            offset = int((matrix.start_date - start).astype(np.int64))
+            values[np.searchsorted(ids, matrix.ingredient_ids), offset:offset + matrix.num_days] += matrix.values
+        return DailyUsageMatrix(values, start, ids, version=version)
+
+    @property
+    def num_days(self):
+        return self.values.shape[1]
+
+    @property
+    def dates(self):
+        return self.start_date + np.arange(self.num_days)
+
+    def __contains__(self, ingredient_id):
+        return int(ingredient_id) in self._positions
+
+    def row(self, ingredient_id):
+        """Uso diario de un ingrediente (vista de solo lectura, sin copia)"""
+        position = self._positions.get(int(ingredient_id))
+        if position is None:
+            return np.zeros(self.num_days, dtype=np.float32)
+        return self.values[position]
+
+    def active_row(self, ingredient_id):
+        """Uso diario desde el primer día con uso del ingrediente"""
+        row = self.row(ingredient_id)
+        used = np.flatnonzero(row > 0)
+        return row[used[0]:] if len(used) else row[:0]
+
+    def series(self, ingredient_id, trim_leading=False, start=None, end=None):
+        """Uso diario de un ingrediente como pd.Series indexada por fecha, opcionalmente entre start y end"""
+        row = self.active_row(ingredient_id) if trim_leading else self.row(ingredient_id)
+        dates = self.dates[self.num_days - len(row):]
+        if start is not None or end is not None:
+            lower = np.searchsorted(dates, np.datetime64(start, 'D')) if start is not None else 0
+            upper = np.searchsorted(dates, np.datetime64(end, 'D'), side='right') if end is not None else len(dates)
+            row, dates = row[lower:upper], dates[lower:upper]
+        return pd.Series(row.astype(np.float64), index=pd.to_datetime(dates))
+
+    def to_frame(self, ingredient_ids=None, trim_leading=False):
+        """
+        DataFrame ancho fechas x ingredientes. Con trim_leading, los días previos al
+        primer uso de cada ingrediente quedan como NaN en lugar de 0.
+        """
+        if ingredient_ids is None:
+            ingredient_ids = self.ingredient_ids
+        values = np.vstack([self.row(ingredient_id) for ingredient_id in ingredient_ids]).astype(np.float64) \
+            if len(ingredient_ids) else np.zeros((0, self.num_days))
+        if trim_leading and len(values):
+            first = np.where((values > 0).any(axis=1), (values > 0).argmax(axis=1), self.num_days)
+            values[np.arange(self.num_days)[None, :] < first[:, None]] = np.nan
+        return pd.DataFrame(values.T, index=pd.to_datetime(self.dates), columns=list(ingredient_ids))
+
+    def usage_history(self, ingredient_id):
+        """Historial {"YYYY-MM-DD": uso} con los días con uso, como en los reportes"""
+        row = self.row(ingredient_id)
+        used = np.flatnonzero(row > 0)
+        dates = np.datetime_as_string(self.dates[used])
+        return dict(zip(dates.tolist(), row[used].astype(np.float64).tolist()))
+
+    def save(self, path):
+        """
+        Guarda la matriz en <path>.npy (datos) y <path>.json (índices).
+        load(path) la abre con memoria mapeada, sin copiar los datos.
+        """
+        np.save(f"{path}.npy", self.values)
+        with open(f"{path}.json", 'w') as f:
+            json.dump({
+                'start_date': str(self.start_date),
+                'ingredient_ids': self.ingredient_ids.tolist(),
+                'version': self.version
+            }, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        values = np.load(f"{path}.npy", mmap_mode='r' if mmap else None)
+        return cls(values, meta['start_date'], meta['ingredient_ids'], version=meta.get('version'))
@@ -0,0 +1,286 @@
+import logging
+import math
+import threading
+from collections import deque
+from datetime import date, datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Umbrales de alerta en desviaciones estándar
+WARNING_SIGMA = 2
+CRITICAL_SIGMA = 3
+
+# Ventanas móviles de uso diario (en días)
+ROLLING_WINDOWS = (7, 30)
+
+# Factor de suavizado de la media móvil exponencial del uso diario
+EWMA_ALPHA = 0.2
+
+# Días mínimos de historia antes de emitir alertas
+MIN_DAYS_FOR_ALERTS = 7
+
+# Alertas recientes que se conservan en memoria
+MAX_ALERTS = 500
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+class RollingWindow:
+    """Suma y media de los últimos `size` días, actualizadas en O(1)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else 0.0
+
+class UsageAccumulator:
+    """
+    Estadísticas en línea del uso diario de un ingrediente.
+    Cada registro suma al día en curso; al llegar un día posterior, el día cerrado
+    se incorpora a la media/varianza de Welford, las ventanas móviles y la EWMA.
+    Los días intermedios sin registros cuentan como uso 0.
+    """
+
+    def __init__(self, ingredient_id):
+        self.ingredient_id = ingredient_id
+        self.current_day = None
+        self.current_total = 0.0
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.ewma = None
+        self.windows = {size: RollingWindow(size) for size in ROLLING_WINDOWS}
+        self._alerted_level = 0
+        # Registros de días ya cerrados: no entran en las estadísticas hasta la próxima reinicialización
+        self.late_rows = 0
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def _close_day(self, value):
+        # Welford
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        for window in self.windows.values():
+            window.push(value)
+        self.ewma = value if self.ewma is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * self.ewma
+
+    def _close_zero_days(self, days):
+        """Incorpora `days` días sin uso en O(1) (combinación de Welford con un bloque de ceros)"""
+        total = self.count + days
+        delta = -self.mean
+        self._m2 += delta * delta * self.count * days / total
+        self.mean += delta * days / total
+        self.count = total
+
+        for window in self.windows.values():
+            for _ in range(min(days, window.size)):
+                window.push(0.0)
+        if self.ewma is not None:
+            self.ewma *= (1 - EWMA_ALPHA) ** days
+
+    def _advance_to(self, day):
+        if self.current_day is None:
+            self.current_day = day
+            return
+        gap = (day - self.current_day).days
+        if gap <= 0:
+            return
+        self._close_day(self.current_total)
+        if gap > 1:
+            self._close_zero_days(gap - 1)
+        self.current_day = day
+        self.current_total = 0.0
+        self._alerted_level = 0
+
+    def z_score(self, value=None):
+        value = self.current_total if value is None else value
+        std = self.std
+        return (value - self.mean) / std if std > 0 else 0.0
+
+    def alert_level(self):
+        """Nivel de alerta del día en curso: 0, 1 (>2σ) o 2 (>3σ); 0 sin historia suficiente"""
+        if self.count < MIN_DAYS_FOR_ALERTS:
+            return 0
+        z_score = self.z_score()
+        return 2 if z_score > CRITICAL_SIGMA else 1 if z_score > WARNING_SIGMA else 0
+
+    def record(self, usage_date, quantity):
+        """
+        Registra un uso. Devuelve el nivel de alerta alcanzado por el día en curso
+        (None, 'warning' >2σ o 'critical' >3σ) solo la primera vez que lo alcanza.
+        Los registros de días ya cerrados se cuentan en late_rows y se ignoran.
+        """
+        day = _to_date(usage_date)
+        if self.current_day is not None and day < self.current_day:
+            self.late_rows += 1
+            return None
+        self._advance_to(day)
+        self.current_total += float(quantity)
+
+        level = self.alert_level()
+        if level > self._alerted_level:
+            self._alerted_level = level
+            return 'critical' if level == 2 else 'warning'
+        return None
+
+    def snapshot(self):
+        return {
+            "ingredient_id": self.ingredient_id,
+            "days_observed": self.count,
+            "mean_daily_usage": self.mean,
+            "std_daily_usage": self.std,
+            "ewma_daily_usage": self.ewma,
+            "rolling_7d_mean": self.windows[7].mean,
+            "rolling_30d_mean": self.windows[30].mean,
+            "current_day": self.current_day.isoformat() if self.current_day else None,
+            "current_day_usage": self.current_total,
+            "current_z_score": self.z_score(),
+            "late_rows": self.late_rows
+        }
+
+class UsageMonitor:
+    """
+    Registro de acumuladores por ingrediente con detección de anomalías al vuelo.
+    Consultar el estado o las alertas no recalcula nada sobre el historial.
+    """
+
+    def __init__(self):
+        self._accumulators = {}
+        self._alerts = deque(maxlen=MAX_ALERTS)
+        self.late_rows = 0
+        self._lock = threading.Lock()
+
+    def _accumulator(self, ingredient_id):
+        accumulator = self._accumulators.get(ingredient_id)
+        if accumulator is None:
+            accumulator = self._accumulators[ingredient_id] = UsageAccumulator(ingredient_id)
+        return accumulator
+
+    def record(self, ingredient_id, usage_date, quantity):
+        """Registra un uso en O(1); devuelve la alerta generada, si la hay"""
+        ingredient_id = int(ingredient_id)
+        with self._lock:
+            accumulator = self._accumulator(ingredient_id)
+            late_rows = accumulator.late_rows
+            level = accumulator.record(usage_date, quantity)
+            self.late_rows += accumulator.late_rows - late_rows
+            if level is None:
+                return None
+            alert = {
+                "ingredient_id": ingredient_id,
+                "level": level,
+                "usage_date": accumulator.current_day.isoformat(),
+                "daily_usage": accumulator.current_total,
+                "mean_daily_usage": accumulator.mean,
+                "z_score": accumulator.z_score(),
+                "detected_at": datetime.now().isoformat()
+            }
+            self._alerts.append(alert)
+            return alert
+
+    def record_many(self, rows):
+        """Registra filas con ingredient_id, usage_date y quantity_used; devuelve las alertas"""
+        alerts = []
+        late_rows = self.late_rows
+        for row in rows:
+            alert = self.record(row['ingredient_id'], row['usage_date'], row['quantity_used'])
+            if alert:
+                alerts.append(alert)
+        if self.late_rows > late_rows:
+            logger.warning(
+                f"{self.late_rows - late_rows} registros de uso de días ya cerrados no se incorporaron "
+                f"a las estadísticas en línea (total: {self.late_rows})"
+            )
+        return alerts
+
+    def seed_from_matrix(self, usage_matrix):
+        """
+        Inicializa los acumuladores a partir de la historia de una DailyUsageMatrix.
+        Equivale a registrar la historia día a día, pero la media, la varianza, la EWMA
+        y las ventanas se calculan de una vez sobre los ejes de la matriz. El último día
+        queda como día en curso; los anteriores, desde el primer uso, como días cerrados.
+        """
+        values = np.asarray(usage_matrix.values, dtype=np.float64)
+        num_ingredients, num_days = values.shape
+        closed_days = max(num_days - 1, 0)
+        closed = values[:, :closed_days]
+        positions = np.arange(closed_days)
+
+        used = values > 0
+        has_usage = used.any(axis=1)
+        first = np.where(has_usage, used.argmax(axis=1), num_days)
+        active = positions[None, :] >= first[:, None]
+        counts = np.clip(closed_days - first, 0, None)
+
+        safe_counts = np.maximum(counts, 1)
+        means = np.where(active, closed, 0.0).sum(axis=1) / safe_counts
+        m2 = np.where(active, (closed - means[:, None]) ** 2, 0.0).sum(axis=1)
+
+        # EWMA: el primer día cerrado entra con peso completo y los siguientes con EWMA_ALPHA
+        decay = (1 - EWMA_ALPHA) ** (closed_days - 1 - positions)
+        weights = np.where(positions[None, :] > first[:, None], EWMA_ALPHA * decay, 0.0)
+        weights += np.where(positions[None, :] == first[:, None], decay, 0.0)
+        ewmas = (weights * closed).sum(axis=1)
+
+        current_day = usage_matrix.dates[-1].item() if num_days else None
+        with self._lock:
+            self._accumulators = {}
+            self.late_rows = 0
+            for position, ingredient_id in enumerate(usage_matrix.ingredient_ids.tolist()):
+                accumulator = self._accumulator(ingredient_id)
+                if not has_usage[position]:
+                    continue
+                count = int(counts[position])
+                accumulator.current_day = current_day
+                accumulator.current_total = float(values[position, -1])
+                accumulator.count = count
+                accumulator.mean = float(means[position]) if count else 0.0
+                accumulator._m2 = float(m2[position])
+                accumulator.ewma = float(ewmas[position]) if count else None
+                for size, window in accumulator.windows.items():
+                    for value in closed[position, closed_days - min(count, size):].tolist():
+                        window.push(value)
+                # La historia cargada no genera alertas: el día en curso parte del nivel
+                # que ya alcanzó y solo alerta si lo supera con los usos siguientes
+                accumulator._alerted_level = accumulator.alert_level()
+
+    def state(self, ingredient_id=None):
+        with self._lock:
+            if ingredient_id is not None:
+                accumulator = self._accumulators.get(int(ingredient_id))
+                return accumulator.snapshot() if accumulator else None
+            return {key: accumulator.snapshot() for key, accumulator in self._accumulators.items()}
+
+    def alerts(self, since=None, level=None):
+        with self._lock:
+            alerts = list(self._alerts)
+        if since:
+            alerts = [alert for alert in alerts if alert['detected_at'] >= since]
+        if level:
+            alerts = [alert for alert in alerts if alert['level'] == level]
+        return alerts
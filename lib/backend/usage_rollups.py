@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from usage_matrix import DailyUsageMatrix
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Lunes de referencia para calcular el inicio de la semana ISO
+_REFERENCE_MONDAY = np.datetime64('1970-01-05', 'D')
+
+def period_starts(dates, granularity):
+    """Fecha de inicio del periodo (día, semana ISO desde el lunes o mes) de cada fecha"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if granularity == 'day':
+        return dates
+    if granularity == 'week':
+        return dates - ((dates - _REFERENCE_MONDAY).astype(np.int64) % 7)
+    if granularity == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Granularidad no soportada: {granularity}")
+
+def period_label(start, granularity):
+    """Etiqueta legible de un periodo: 2025-01-15, 2025-W03 o 2025-01"""
+    start = pd.Timestamp(start)
+    if granularity == 'week':
+        iso = start.isocalendar()
+        return f"{iso[0]}-W{iso[1]:02d}"
+    if granularity == 'month':
+        return start.strftime('%Y-%m')
+    return start.strftime('%Y-%m-%d')
+
+class UsageRollup:
+    """Uso total por ingrediente y periodo (ingredientes x periodos) para una granularidad"""
+
+    def __init__(self, granularity, periods, ingredient_ids, values):
+        self.granularity = granularity
+        self.periods = np.asarray(periods, dtype='datetime64[D]')
+        self.ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._positions = {int(ingredient_id): position
+                           for position, ingredient_id in enumerate(self.ingredient_ids)}
+
+    @classmethod
+    def from_matrix(cls, usage_matrix, granularity):
+        """Agrega una DailyUsageMatrix sumando los días contiguos de cada periodo"""
+        starts = period_starts(usage_matrix.dates, granularity)
+        if len(starts) == 0:
+            return cls(granularity, starts, usage_matrix.ingredient_ids,
+                       np.zeros((len(usage_matrix.ingredient_ids), 0)))
+        boundaries = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        values = np.add.reduceat(usage_matrix.values.astype(np.float64), boundaries, axis=1) \
+            if len(usage_matrix.ingredient_ids) else np.zeros((0, len(boundaries)))
+        return cls(granularity, starts[boundaries], usage_matrix.ingredient_ids, values)
+
+    def merged(self, other):
+        """Nuevo rollup con los totales de other sumados (une ingredientes y periodos)"""
+        ids = np.union1d(self.ingredient_ids, other.ingredient_ids)
+        periods = np.union1d(self.periods, other.periods)
+        values = np.zeros((len(ids), len(periods)))
+        for rollup in (self, other):
+            rows = np.searchsorted(ids, rollup.ingredient_ids)
+            columns = np.searchsorted(periods, rollup.periods)
+            values[np.ix_(rows, columns)] += rollup.values
+        return UsageRollup(self.granularity, periods, ids, values)
+
+    def __contains__(self, ingredient_id):
+        return int(ingredient_id) in self._positions
+
+    def row(self, ingredient_id):
+        position = self._positions.get(int(ingredient_id))
+        if position is None:
+            return np.zeros(len(self.periods))
+        return self.values[position]
+
+    def series(self, ingredient_id, start=None, end=None, nonzero=False):
+        """Uso por periodo como pd.Series indexada por inicio del periodo"""
+        row, periods = self.row(ingredient_id), self.periods
+        mask = np.ones(len(periods), dtype=bool)
+        if start is not None:
+            mask &= periods >= period_starts([start], self.granularity)[0]
+        if end is not None:
+            mask &= periods <= np.datetime64(end, 'D')
+        if nonzero:
+            mask &= row > 0
+        return pd.Series(row[mask], index=pd.to_datetime(periods[mask]))
+
+    def labeled(self, ingredient_id, start=None, end=None):
+        """{etiqueta del periodo: uso} con los periodos con uso"""
+        series = self.series(ingredient_id, start, end, nonzero=True)
+        return {period_label(period, self.granularity): float(usage) for period, usage in series.items()}
+
+class UsageRollups:
+    """
+    Rollups de uso por ingrediente a nivel día, semana ISO y mes. Se construyen una
+    vez desde la DailyUsageMatrix y se actualizan de forma incremental con cada lote
+    de uso (solo se agregan las filas nuevas y se suman a los periodos afectados).
+    """
+
+    def __init__(self, levels, version=None):
+        self.levels = levels
+        self.version = version
+
+    @classmethod
+    def from_matrix(cls, usage_matrix):
+        return cls(
+            {granularity: UsageRollup.from_matrix(usage_matrix, granularity) for granularity in GRANULARITIES},
+            version=usage_matrix.version
+        )
+
+    def with_usage_rows(self, rows, version=None):
+        """Nuevos rollups con las filas de uso sumadas"""
+        if not rows:
+            return UsageRollups(dict(self.levels), version=version)
+        delta = DailyUsageMatrix.from_usage_rows(rows)
+        return UsageRollups(
+            {granularity: rollup.merged(UsageRollup.from_matrix(delta, granularity))
+             for granularity, rollup in self.levels.items()},
+            version=version
+        )
+
+    def __getitem__(self, granularity):
+        if granularity not in self.levels:
+            raise ValueError(f"Granularidad no soportada: {granularity}")
+        return self.levels[granularity]
+
+    def daily_usage(self, ingredient_id):
+        """Uso de los días con registros de un ingrediente (equivale a agrupar las filas por fecha)"""
+        return self.levels['day'].series(ingredient_id, nonzero=True)
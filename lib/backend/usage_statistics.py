@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+# Periodo de la estacionalidad semanal (en observaciones)
+SEASONAL_PERIOD = 7
+
+# Umbral de z-score para contar anomalías
+ANOMALY_Z_THRESHOLD = 3
+
+def usage_frame_from_histories(histories):
+    """
+    Construye el DataFrame ancho fechas x ingredientes a partir de historiales
+    en formato [{"created_at": fecha, "quantity": uso}, ...] indexados por columna.
+    Los días sin registro quedan como NaN.
+    """
+    series = {}
+    for column, history in histories.items():
+        if not history:
+            series[column] = pd.Series(dtype=float)
+            continue
+        series[column] = pd.Series(
+            [entry['quantity'] for entry in history],
+            index=pd.to_datetime([entry['created_at'] for entry in history])
+        )
+    return pd.DataFrame(series).sort_index()
+
+def _pack_columns(values):
+    """
+    Mueve los valores válidos de cada columna al inicio conservando su orden.
+    Equivale a descartar los NaN columna por columna, pero sin salir de NumPy.
+    """
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=0, kind='stable')
+    packed = np.take_along_axis(values, order, axis=0)
+    counts = valid.sum(axis=0)
+    mask = np.arange(values.shape[0])[:, None] < counts
+    return packed, counts, mask
+
+def _seasonality_strength(packed, counts, mean, std_pop):
+    """
+    std(componente estacional) / std(serie), con la misma descomposición aditiva
+    que seasonal_decompose(period=7): tendencia por media móvil centrada y
+    promedios por fase de la serie sin tendencia.
+    """
+    rows, columns = packed.shape
+    period = SEASONAL_PERIOD
+    half = period // 2
+
+    # Media móvil centrada de 7 observaciones vía sumas acumuladas
+    filled = np.where(np.isnan(packed), 0.0, packed)
+    cumulative = np.vstack([np.zeros((1, columns)), np.cumsum(filled, axis=0)])
+    positions = np.arange(rows)[:, None]
+    window_ok = (positions >= half) & (positions + half < counts)
+    upper = np.clip(positions + half + 1, 0, rows)
+    lower = np.clip(positions - half, 0, rows)
+    moving_sum = (
+        np.take_along_axis(cumulative, np.broadcast_to(upper, (rows, columns)), axis=0)
+        - np.take_along_axis(cumulative, np.broadcast_to(lower, (rows, columns)), axis=0)
+    )
+    trend = np.where(window_ok, moving_sum / period, np.nan)
+    detrended = packed - trend
+
+    # Promedio por fase (posición módulo 7) ignorando los bordes sin tendencia
+    phase = np.arange(rows) % period
+    phase_sums = np.zeros((period, columns))
+    phase_counts = np.zeros((period, columns))
+    detrended_ok = ~np.isnan(detrended)
+    np.add.at(phase_sums, phase, np.where(detrended_ok, detrended, 0.0))
+    np.add.at(phase_counts, phase, detrended_ok)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        phase_means = phase_sums / phase_counts
+    phase_means -= phase_means.mean(axis=0)
+
+    # La componente estacional repite phase_means en las n observaciones de cada columna
+    phase_weights = (counts // period) + (np.arange(period)[:, None] < counts % period)
+    seasonal_mean = (phase_weights * phase_means).sum(axis=0) / counts
+    seasonal_var = (phase_weights * (phase_means - seasonal_mean) ** 2).sum(axis=0) / counts
+    return np.sqrt(seasonal_var) / std_pop
+
+def compute_usage_statistics(usage_frame):
+    """
+    Calcula en una sola pasada vectorizada las estadísticas de uso de todas las
+    columnas (ingredientes) de un DataFrame ancho fechas x ingredientes.
+    Cada columna se analiza sobre sus días con datos, en orden cronológico.
+    Devuelve {columna: estadísticas}; las columnas con menos de dos semanas de
+    observaciones (insuficientes para la descomposición semanal) quedan vacías.
+    """
+    frame = usage_frame.sort_index()
+    values = frame.to_numpy(dtype=float, na_value=np.nan)
+    if values.size == 0:
+        return {column: {} for column in frame.columns}
+
+    packed, counts, mask = _pack_columns(values)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(packed, axis=0) / counts
+        deviations = packed - mean
+        m2 = np.nanmean(deviations ** 2, axis=0)
+        m3 = np.nanmean(deviations ** 3, axis=0)
+        m4 = np.nanmean(deviations ** 4, axis=0)
+        std_pop = np.sqrt(m2)
+        std = np.sqrt(m2 * counts / (counts - 1))
+
+        # Pendiente de la regresión lineal contra la posición (polyfit grado 1)
+        positions = np.arange(values.shape[0])[:, None]
+        centered_positions = np.where(mask, positions - (counts - 1) / 2, np.nan)
+        trend_slope = (
+            np.nansum(centered_positions * deviations, axis=0)
+            / np.nansum(centered_positions ** 2, axis=0)
+        )
+
+        # Autocorrelación de lag 1 (Pearson entre x[t] y x[t-1])
+        current, previous = packed[1:], packed[:-1]
+        pair_ok = mask[1:]
+        current = np.where(pair_ok, current, np.nan)
+        previous = np.where(pair_ok, previous, np.nan)
+        current_dev = current - np.nanmean(current, axis=0)
+        previous_dev = previous - np.nanmean(previous, axis=0)
+        autocorrelation = (
+            np.nansum(current_dev * previous_dev, axis=0)
+            / np.sqrt(np.nansum(current_dev ** 2, axis=0) * np.nansum(previous_dev ** 2, axis=0))
+        )
+
+        anomalies = (np.abs(deviations) / std_pop > ANOMALY_Z_THRESHOLD).sum(axis=0)
+
+        results = {
+            "mean": mean,
+            "median": np.nanmedian(packed, axis=0),
+            "std": std,
+            "cv": std / mean * 100,
+            "skewness": m3 / m2 ** 1.5,
+            "kurtosis": m4 / m2 ** 2 - 3,
+            "trend_slope": trend_slope,
+            "seasonality_strength": _seasonality_strength(packed, counts, mean, std_pop),
+            "autocorrelation": autocorrelation,
+            "anomalies_count": anomalies,
+        }
+
+    statistics = {}
+    enough_data = counts >= 2 * SEASONAL_PERIOD
+    for index, column in enumerate(frame.columns):
+        if not enough_data[index]:
+            statistics[column] = {}
+            continue
+        column_stats = {name: float(stat[index]) for name, stat in results.items()}
+        column_stats["anomalies_count"] = int(results["anomalies_count"][index])
+        statistics[column] = column_stats
+    return statistics